@@ -0,0 +1,203 @@
+'''
+Fake OpenMaya 1, only the raw points access used by silhouettepolisher.points
+'''
+
+import array
+import ctypes
+
+from maya._scene import (
+    scene, split_plug, evaluate_mesh_plug, get_plug_value, set_plug_value)
+
+
+class MFn(object):
+    kTransform = 'transform'
+    kMesh = 'mesh'
+    kDagNode = 'dagNode'
+    kMeshData = 'meshData'
+
+
+class MSpace(object):
+    kObject = 'object'
+
+
+class MObject(object):
+    def __init__(self, node=None, points=None, data=None):
+        self.node = node
+        self.points = points
+        # the value of a data plug (pointArray...)
+        self.data = data
+
+    def isNull(self):
+        return self.node is None and self.points is None and self.data is None
+
+
+class MDagPath(object):
+    def __init__(self):
+        self.node = None
+
+    def hasFn(self, fn):
+        return self.node.type == fn or (fn == MFn.kDagNode and self.node.is_dag)
+
+    def extendToShape(self):
+        self.node = scene.get_mesh(self.node.name)
+
+
+class MTime(object):
+    kFilm = 6
+
+    def __init__(self, value=0.0, unit=kFilm):
+        self.value = float(value)
+        self.unit = unit
+
+    @staticmethod
+    def uiUnit():
+        return MTime.kFilm
+
+
+class MDGContext(object):
+    def __init__(self, time=None):
+        self.time = time
+
+
+class MPlug(object):
+    def __init__(self):
+        self.plug = None
+
+    def asMObject(self, context=None):
+        value = get_plug_value(self.plug)
+        if isinstance(value, list):
+            return MObject(data=value)
+        if value is None and 'inputPointsTarget' in self.plug:
+            return MObject()
+        return MObject(points=evaluate_mesh_plug(self.plug))
+
+    def setMObject(self, mobject):
+        set_plug_value(self.plug, mobject.data)
+
+
+class MSelectionList(object):
+    def __init__(self):
+        self._items = []
+
+    def add(self, name):
+        scene.get_node(name)
+        self._items.append(str(name))
+
+    def getDagPath(self, index, dagpath):
+        dagpath.node = scene.get_node(self._items[index])
+
+    def getPlug(self, index, plug):
+        plug.plug = self._items[index]
+
+
+class _Pointer(object):
+    '''
+    swig pointer stand-in, int() return the address
+    '''
+    def __init__(self, buffer):
+        self.buffer = buffer
+
+    def __int__(self):
+        return ctypes.addressof(self.buffer)
+
+
+class MScriptUtil(object):
+    def __init__(self):
+        self._values = []
+        # {typecode: (array, ctypes buffer)}, a buffer per pointer type.
+        self._buffers = {}
+
+    def createFromList(self, values, length):
+        self._values = values[:length]
+        self._buffers = {}
+
+    def _pointer(self, typecode, ctype):
+        if typecode not in self._buffers:
+            data = array.array(typecode, self._values)
+            self._buffers[typecode] = (
+                data, (ctype * len(data)).from_buffer(data))
+        return _Pointer(self._buffers[typecode][1])
+
+    def asFloatPtr(self):
+        return self._pointer('f', ctypes.c_float)
+
+    def asFloat4Ptr(self):
+        return self._pointer('f', ctypes.c_float)
+
+    def asDoublePtr(self):
+        return self._pointer('d', ctypes.c_double)
+
+    def asDouble4Ptr(self):
+        return self._pointer('d', ctypes.c_double)
+
+
+class MPointArray(object):
+    def __init__(self, pointer=None, count=0):
+        # (x, y, z, w) doubles copied from the pointer
+        self._data = array.array('d', bytes(count * 32))
+        if count:
+            ctypes.memmove(
+                self._data.buffer_info()[0], int(pointer), count * 32)
+
+    def length(self):
+        return len(self._data) // 4
+
+    def get(self, pointer):
+        ctypes.memmove(
+            int(pointer), self._data.buffer_info()[0], len(self._data) * 8)
+
+
+class MFnPointArrayData(object):
+    def __init__(self, mobject=None):
+        self._mobject = mobject
+
+    def array(self):
+        points = self._mobject.data or []
+        array_ = MPointArray()
+        array_._data = array.array('d', [
+            value for point in points
+            for value in tuple(point[:3]) + (1.0, )])
+        return array_
+
+    def create(self, points):
+        data = points._data
+        return MObject(data=list(zip(
+            data[0::4], data[1::4], data[2::4], data[3::4])))
+
+
+class MFloatPointArray(object):
+    def __init__(self, pointer=None, count=0):
+        # (x, y, z, w) floats copied from the pointer
+        self._data = array.array('f', bytes(count * 16))
+        if count:
+            ctypes.memmove(
+                self._data.buffer_info()[0], int(pointer), count * 16)
+
+    def __len__(self):
+        return len(self._data) // 4
+
+
+class MFnMesh(object):
+    def __init__(self, target):
+        self._node = None
+        if isinstance(target, MDagPath):
+            self._node = scene.get_mesh(target.node.name)
+            self._points = self._node.points
+        else:
+            self._points = target.points
+
+    def setPoints(self, points, space=MSpace.kObject):
+        values = array.array('f', bytes(len(points) * 12))
+        for axis in range(3):
+            values[axis::3] = points._data[axis::4]
+        self._node.points = (ctypes.c_float * len(values)).from_buffer(values)
+        self._points = self._node.points
+
+    def updateSurface(self):
+        return None
+
+    def numVertices(self):
+        return len(self._points) // 3
+
+    def getRawPoints(self):
+        return ctypes.addressof(self._points)
@@ -0,0 +1,339 @@
+'''
+In memory scene of the fake maya modules. It keeps just enough of the
+dependency graph (nodes, attributes values, connections, dag hierarchy,
+mesh points, callbacks) to run the silhouettepolisher operations outside of
+a maya session. Nothing is evaluated: a mesh output is its stored points and
+a blendshape input geometry is the points of the base mesh at creation time.
+'''
+
+import ctypes
+import itertools
+import re
+
+
+STATIC_ATTRIBUTES = {
+    'transform': ('message', 'visibility', 'lodVisibility'),
+    'mesh': (
+        'message', 'inMesh', 'outMesh', 'worldMesh', 'intermediateObject',
+        'overrideEnabled', 'overrideDisplayType', 'frozen', 'nodeState'),
+    'blendShape': (
+        'message', 'weight', 'envelope', 'input', 'inputTarget',
+        'outputGeometry', 'frozen', 'nodeState'),
+    'blinn': ('message', 'color', 'transparency', 'outColor'),
+    'lambert': ('message', 'color', 'transparency', 'outColor'),
+    'shadingEngine': ('message', 'dagSetMembers', 'surfaceShader'),
+    'animCurveTU': ('message', 'output', 'input'),
+}
+DEFAULT_VALUES = {
+    'visibility': True, 'lodVisibility': True, 'intermediateObject': False,
+    'overrideEnabled': False, 'overrideDisplayType': 0, 'envelope': 1.0,
+    'frozen': False, 'nodeState': 0, 'color': (0.5, 0.5, 0.5),
+    'transparency': (0.0, 0.0, 0.0)}
+DAG_TYPES = ('transform', 'mesh')
+INHERITED_TYPES = {
+    'blendShape': ('geometryFilter', ),
+    'mesh': ('dagNode', 'shape'),
+    'transform': ('dagNode', ),
+    'animCurveTU': ('animCurve', )}
+ATTRIBUTE_SHORT_NAMES = {'w': 'weight'}
+
+
+class Node(object):
+    def __init__(self, name, type, parent=None):
+        self.name = name
+        self.type = type
+        self.parent = parent
+        self.children = []
+        self.values = {}
+        self.dynamic_attributes = {}
+        self.aliases = {}
+        self.alive = True
+        # mesh data
+        self.points = None
+        self.history = []
+        # blendshape data
+        self.input_points = None
+        # shading engine data
+        self.members = []
+        # anim curve data, sorted [(time, value)]
+        self.keys = []
+        if parent is not None:
+            parent.children.append(self)
+
+    def is_type(self, types):
+        return (
+            self.type in types or
+            any(t in types for t in INHERITED_TYPES.get(self.type, ())))
+
+    @property
+    def is_dag(self):
+        return self.type in DAG_TYPES
+
+    def full_path(self):
+        if not self.is_dag:
+            return self.name
+        path = '|' + self.name
+        parent = self.parent
+        while parent is not None:
+            path = '|' + parent.name + path
+            parent = parent.parent
+        return path
+
+    def has_attribute(self, attribute):
+        root = re.split(r'[\[.]', attribute)[0]
+        root = ATTRIBUTE_SHORT_NAMES.get(root, root)
+        return (
+            root in STATIC_ATTRIBUTES.get(self.type, ('message', )) or
+            root in self.dynamic_attributes or root in self.aliases)
+
+    def normalize(self, attribute):
+        root = re.split(r'[\[.]', attribute)[0]
+        if root in self.aliases:
+            return self.aliases[root] + attribute[len(root):]
+        if root in ATTRIBUTE_SHORT_NAMES:
+            return ATTRIBUTE_SHORT_NAMES[root] + attribute[len(root):]
+        return attribute
+
+    def get_value(self, attribute):
+        attribute = self.normalize(attribute)
+        if attribute in self.values:
+            return self.values[attribute]
+        if attribute in self.dynamic_attributes:
+            return self.dynamic_attributes[attribute]
+        root = re.split(r'[\[.]', attribute)[0]
+        if root == 'weight':
+            return 0.0
+        return DEFAULT_VALUES.get(root)
+
+
+class Scene(object):
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        self.nodes = {}
+        # {destination plug: source plug}
+        self.connections = {}
+        self.selection = []
+        self.time = 1.0
+        self.start_frame = 1.0
+        self.end_frame = 24.0
+        self.filepath = ''
+        self.callbacks = {}
+        self._callback_ids = itertools.count(1)
+
+    # nodes
+    def create_node(self, type, name=None, parent=None):
+        name = self.unique_name(name or type + '1')
+        node = Node(name, type, parent)
+        self.nodes[name] = node
+        self.fire('nodeAdded', node)
+        return node
+
+    def unique_name(self, name):
+        name = name.split('|')[-1].replace('.', '_')
+        if name not in self.nodes:
+            return name
+        base = name.rstrip('0123456789')
+        for i in itertools.count(1):
+            candidate = '{}{}'.format(base, i)
+            if candidate not in self.nodes:
+                return candidate
+
+    def get_node(self, name):
+        name = str(name).split('.')[0].split('|')[-1]
+        node = self.nodes.get(name)
+        if node is None:
+            raise ValueError('No object matches name: {}'.format(name))
+        return node
+
+    def exists(self, name):
+        try:
+            self.get_node(name)
+            return True
+        except ValueError:
+            return False
+
+    def delete_node(self, node):
+        if not node.alive:
+            return
+        for child in list(node.children):
+            self.delete_node(child)
+        self.fire('nodeRemoved', node)
+        for destination, source in list(self.connections.items()):
+            if split_plug(destination)[0] == node.name:
+                del self.connections[destination]
+            elif split_plug(source)[0] == node.name:
+                del self.connections[destination]
+        for other in self.nodes.values():
+            if node in other.members:
+                other.members.remove(node)
+            if node in other.history:
+                other.history.remove(node)
+        if node.parent is not None:
+            node.parent.children.remove(node)
+        node.alive = False
+        del self.nodes[node.name]
+
+    def rename_node(self, node, name):
+        name = self.unique_name(name)
+        renamed_connections = {}
+        for destination, source in self.connections.items():
+            renamed_connections[_rename_plug(destination, node.name, name)] = (
+                _rename_plug(source, node.name, name))
+        self.connections = renamed_connections
+        del self.nodes[node.name]
+        node.name = name
+        self.nodes[name] = node
+        return name
+
+    def get_shapes(self, node, intermediates=True):
+        if node.type != 'transform':
+            return [node]
+        return [
+            child for child in node.children if child.type == 'mesh' and
+            (intermediates or not child.get_value('intermediateObject'))]
+
+    def get_mesh(self, name):
+        '''
+        return the first non intermediate mesh of a transform or the mesh
+        '''
+        shapes = self.get_shapes(self.get_node(name), intermediates=False)
+        if not shapes:
+            raise RuntimeError('{} is not a mesh'.format(name))
+        return shapes[0]
+
+    # connections
+    def connect(self, source, destination):
+        source = self.normalize_plug(source)
+        destination = self.normalize_plug(destination)
+        if destination in self.connections:
+            raise RuntimeError('{} is already connected'.format(destination))
+        self.connections[destination] = source
+        self.fire('connection', source, destination, True)
+        self.fire('dirtyPlug', destination)
+
+    def disconnect(self, source, destination):
+        source = self.normalize_plug(source)
+        destination = self.normalize_plug(destination)
+        if self.connections.get(destination) != source:
+            raise RuntimeError(
+                'There is no connection from {} to {}'.format(
+                    source, destination))
+        del self.connections[destination]
+        self.fire('connection', source, destination, False)
+        self.fire('dirtyPlug', destination)
+
+    def normalize_plug(self, plug):
+        node, attribute = split_plug(plug)
+        node = self.get_node(node)
+        return '{}.{}'.format(node.name, node.normalize(attribute))
+
+    # callbacks
+    def add_callback(self, kind, function):
+        callback_id = next(self._callback_ids)
+        self.callbacks.setdefault(kind, {})[callback_id] = function
+        return callback_id
+
+    def remove_callback(self, callback_id):
+        for callbacks in self.callbacks.values():
+            callbacks.pop(callback_id, None)
+
+    def fire(self, kind, *args):
+        for function in list(self.callbacks.get(kind, {}).values()):
+            function(*args)
+
+
+def split_plug(plug):
+    node, _, attribute = str(plug).partition('.')
+    return node.split('|')[-1], attribute
+
+
+def _rename_plug(plug, old, new):
+    node, attribute = split_plug(plug)
+    return '{}.{}'.format(new if node == old else node, attribute)
+
+
+def create_points(values):
+    '''
+    return a ctypes float buffer from a flat list of coordinates
+    '''
+    return (ctypes.c_float * len(values))(*values)
+
+
+def copy_points(points):
+    copy = (ctypes.c_float * len(points))()
+    ctypes.memmove(copy, points, ctypes.sizeof(points))
+    return copy
+
+
+scene = Scene()
+
+
+def create_mesh(name, points, parent=None):
+    '''
+    create a transform and his mesh shape with an intermediate orig shape.
+    This is the benchmark entry point to populate the scene.
+    :points list: flat list of coordinates [x0, y0, z0, x1, ...]
+    '''
+    transform = scene.create_node('transform', name, parent)
+    shape = scene.create_node('mesh', name + 'Shape', transform)
+    shape.points = create_points(points)
+    orig = scene.create_node('mesh', name + 'ShapeOrig', transform)
+    orig.points = copy_points(shape.points)
+    orig.values['intermediateObject'] = True
+    return transform.name
+
+
+def get_plug_value(plug):
+    node_name, attribute = split_plug(plug)
+    return scene.get_node(node_name).get_value(attribute)
+
+
+def set_plug_value(plug, value):
+    node_name, attribute = split_plug(plug)
+    node = scene.get_node(node_name)
+    attribute = node.normalize(attribute)
+    if attribute in node.dynamic_attributes:
+        node.dynamic_attributes[attribute] = value
+    else:
+        node.values[attribute] = value
+
+
+def expand_component(component):
+    '''
+    return the indices of a component string: vtx[2:4] -> [2, 3, 4]
+    '''
+    content = component[component.index('[') + 1:component.rindex(']')]
+    start, _, end = content.partition(':')
+    return list(range(int(start), int(end or start) + 1))
+
+
+def compact_components(indices, component='vtx'):
+    '''
+    return the component strings of the indices, the contiguous indices are
+    merged as ranges.
+    '''
+    components = []
+    for index in indices:
+        if components and components[-1][1] == index - 1:
+            components[-1][1] = index
+        else:
+            components.append([index, index])
+    return [
+        '{}[{}]'.format(component, start) if start == end else
+        '{}[{}:{}]'.format(component, start, end)
+        for start, end in components]
+
+
+def evaluate_mesh_plug(plug):
+    '''
+    return the points buffer hold by a mesh data plug
+    '''
+    node_name, attribute = split_plug(plug)
+    node = scene.get_node(node_name)
+    if node.type == 'blendShape' and 'inputGeometry' in attribute:
+        return node.input_points
+    if node.type == 'transform':
+        node = scene.get_mesh(node.name)
+    return node.points
@@ -0,0 +1,419 @@
+'''
+Fake OpenMaya 2, see _scene.py
+'''
+
+import math
+
+from maya._scene import (
+    scene, split_plug, evaluate_mesh_plug, create_points, get_plug_value,
+    set_plug_value, expand_component, compact_components)
+
+
+class MFn(object):
+    kTransform = 'transform'
+    kMesh = 'mesh'
+    kDagNode = 'dagNode'
+    kMeshData = 'meshData'
+    kMeshVertComponent = 'vtx'
+    kComponentListData = 'componentListData'
+
+
+class MObject(object):
+    kNullObject = None
+
+    def __init__(self, node=None, points=None, attribute=None, data=None):
+        self.node = node
+        self.points = points
+        self.attribute = attribute
+        # the value of a data plug (componentList...) or the indices of a
+        # component.
+        self.data = data
+
+    def hasFn(self, fn):
+        if self.node is None:
+            return fn == MFn.kMeshData and self.points is not None
+        return self.node.type == fn or (fn == MFn.kDagNode and self.node.is_dag)
+
+    def isNull(self):
+        return self.node is None and self.points is None and self.data is None
+
+    def apiType(self):
+        return self.node.type if self.node else MFn.kMeshData
+
+
+class MObjectHandle(object):
+    def __init__(self, mobject):
+        self._mobject = mobject
+
+    def hashCode(self):
+        return id(self._mobject.node)
+
+    def __eq__(self, other):
+        return (
+            isinstance(other, MObjectHandle) and
+            other._mobject.node is self._mobject.node)
+
+    def __ne__(self, other):
+        return not self == other
+
+    def isValid(self):
+        return self._mobject.node is not None
+
+    def isAlive(self):
+        return self._mobject.node.alive
+
+    def object(self):
+        return self._mobject
+
+
+class MDagPath(object):
+    def __init__(self, node=None):
+        self.node = node
+
+    def hasFn(self, fn):
+        return MObject(self.node).hasFn(fn)
+
+    def extendToShape(self):
+        self.node = scene.get_mesh(self.node.name)
+        return self
+
+    def node_(self):
+        return MObject(self.node)
+
+    def partialPathName(self):
+        return self.node.name
+
+    def fullPathName(self):
+        return self.node.full_path()
+
+
+class MPlug(object):
+    def __init__(self, plug=None):
+        self._plug = plug
+
+    def name(self):
+        return self._plug
+
+    def partialName(self, *args, **kwargs):
+        return split_plug(self._plug)[1]
+
+    def node(self):
+        return MObject(scene.get_node(self._plug))
+
+    def attribute(self):
+        attribute = split_plug(self._plug)[1]
+        return MObject(attribute=attribute.split('.')[-1].split('[')[0])
+
+    def asMObject(self, *args):
+        value = get_plug_value(self._plug)
+        if isinstance(value, list):
+            return MObject(data=value)
+        if value is None and 'inputComponentsTarget' in self._plug:
+            return MObject()
+        return MObject(points=evaluate_mesh_plug(self._plug))
+
+    def setMObject(self, mobject):
+        set_plug_value(self._plug, mobject.data)
+
+    def getExistingArrayAttributeIndices(self):
+        from maya.cmds import getAttr
+        return getAttr(self._plug, multiIndices=True) or []
+
+    def elementByLogicalIndex(self, index):
+        return MPlug('{}[{}]'.format(self._plug, index))
+
+    def asDouble(self):
+        from maya.cmds import getAttr
+        return float(getAttr(self._plug))
+
+    def isNull(self):
+        return self._plug is None
+
+
+class MFnAttribute(object):
+    def __init__(self, attribute):
+        self.name = attribute.attribute
+
+
+class MSelectionList(object):
+    def __init__(self):
+        self._items = []
+
+    def add(self, name):
+        scene.get_node(name)
+        self._items.append(str(name))
+        return self
+
+    def length(self):
+        return len(self._items)
+
+    def clear(self):
+        self._items = []
+
+    def getDagPath(self, index):
+        return MDagPath(scene.get_node(self._items[index]))
+
+    def getDependNode(self, index):
+        return MObject(scene.get_node(self._items[index]))
+
+    def getPlug(self, index):
+        return MPlug(scene.normalize_plug(self._items[index]))
+
+
+class MFnDependencyNode(object):
+    def __init__(self, mobject=None):
+        self._node = mobject.node if mobject else None
+
+    def name(self):
+        return self._node.name
+
+    def typeName(self):
+        return self._node.type
+
+    def hasAttribute(self, name):
+        return self._node.has_attribute(name)
+
+
+class MFnDagNode(MFnDependencyNode):
+    def partialPathName(self):
+        return self._node.name
+
+    def fullPathName(self):
+        return self._node.full_path()
+
+
+class MVector(object):
+    __slots__ = ('x', 'y', 'z')
+
+    def __init__(self, x=0.0, y=0.0, z=0.0):
+        self.x, self.y, self.z = x, y, z
+
+    def length(self):
+        return math.sqrt(self.x * self.x + self.y * self.y + self.z * self.z)
+
+    def __add__(self, other):
+        return MVector(self.x + other.x, self.y + other.y, self.z + other.z)
+
+    def __sub__(self, other):
+        return MVector(self.x - other.x, self.y - other.y, self.z - other.z)
+
+    def __mul__(self, value):
+        return MVector(self.x * value, self.y * value, self.z * value)
+
+    def __iter__(self):
+        return iter((self.x, self.y, self.z))
+
+
+class MPoint(object):
+    __slots__ = ('x', 'y', 'z', 'w')
+
+    def __init__(self, x=0.0, y=0.0, z=0.0, w=1.0):
+        if isinstance(x, (MPoint, MVector, list, tuple)):
+            values = list(x) + [1.0] * (4 - len(list(x)))
+            x, y, z, w = values[:4]
+        self.x, self.y, self.z, self.w = x, y, z, w
+
+    def __sub__(self, other):
+        if isinstance(other, MPoint):
+            return MVector(self.x - other.x, self.y - other.y, self.z - other.z)
+        return MPoint(self.x - other.x, self.y - other.y, self.z - other.z)
+
+    def __add__(self, other):
+        return MPoint(self.x + other.x, self.y + other.y, self.z + other.z)
+
+    def __iter__(self):
+        return iter((self.x, self.y, self.z, self.w))
+
+    def __getitem__(self, index):
+        return (self.x, self.y, self.z, self.w)[index]
+
+    def __len__(self):
+        return 4
+
+
+class MPointArray(object):
+    def __init__(self, points=None):
+        self._points = [MPoint(p) for p in points] if points else []
+
+    def __len__(self):
+        return len(self._points)
+
+    def __getitem__(self, index):
+        return self._points[index]
+
+    def __setitem__(self, index, point):
+        self._points[index] = point
+
+    def __iter__(self):
+        return iter(self._points)
+
+    def append(self, point):
+        self._points.append(MPoint(point))
+
+
+def _points_to_array(buffer):
+    return MPointArray(
+        (buffer[i], buffer[i + 1], buffer[i + 2])
+        for i in range(0, len(buffer), 3))
+
+
+class MFnMesh(object):
+    def __init__(self, target=None):
+        if isinstance(target, MDagPath):
+            self._node = scene.get_mesh(target.node.name)
+        elif target is not None and target.node is not None:
+            self._node = scene.get_mesh(target.node.name)
+        else:
+            self._node = None
+            self._data = target
+
+    @property
+    def _points(self):
+        return self._node.points if self._node else self._data.points
+
+    @property
+    def numVertices(self):
+        return len(self._points) // 3
+
+    @property
+    def numPolygons(self):
+        # the fake meshes are point clouds, they don't have faces.
+        return 0
+
+    def fullPathName(self):
+        return '|' + self._node.name
+
+    def getPoints(self, space=None):
+        return _points_to_array(self._points)
+
+    def setPoints(self, points, space=None):
+        values = []
+        for point in points:
+            values.extend((point.x, point.y, point.z))
+        self._node.points = create_points(values)
+
+    def updateSurface(self):
+        return None
+
+    def getVertices(self):
+        # the fake meshes are point clouds, they don't have faces.
+        return [], []
+
+
+class MIntArray(list):
+    pass
+
+
+class MFnSingleIndexedComponent(object):
+    def __init__(self, mobject=None):
+        self._mobject = mobject
+
+    def create(self, component_type):
+        self._mobject = MObject(data=[])
+        self._type = component_type
+        return self._mobject
+
+    def addElements(self, elements):
+        self._mobject.data.extend(int(element) for element in elements)
+
+    def getElements(self):
+        return MIntArray(self._mobject.data)
+
+
+class MFnComponentListData(object):
+    def __init__(self, mobject=None):
+        self._mobject = mobject
+
+    def create(self):
+        self._mobject = MObject(data=[])
+        return self._mobject
+
+    def length(self):
+        return len(self._mobject.data)
+
+    def get(self, index):
+        return MObject(data=expand_component(self._mobject.data[index]))
+
+    def add(self, component):
+        self._mobject.data.extend(compact_components(component.data))
+
+
+class MDGMessage(object):
+    @staticmethod
+    def addConnectionCallback(function, client_data=None):
+        def callback(source, destination, made):
+            function(MPlug(source), MPlug(destination), made, client_data)
+        return scene.add_callback('connection', callback)
+
+    @staticmethod
+    def addNodeAddedCallback(function, node_type='dependNode', client_data=None):
+        return scene.add_callback(
+            'nodeAdded', lambda node: function(MObject(node), client_data))
+
+    @staticmethod
+    def addNodeRemovedCallback(
+            function, node_type='dependNode', client_data=None):
+        return scene.add_callback(
+            'nodeRemoved', lambda node: function(MObject(node), client_data))
+
+
+class MNodeMessage(object):
+    @staticmethod
+    def addNodeDirtyPlugCallback(node, function, client_data=None):
+        def callback(plug):
+            if split_plug(plug)[0] == node.node.name:
+                function(node, MPlug(plug), client_data)
+        return scene.add_callback('dirtyPlug', callback)
+
+
+class MEventMessage(object):
+    @staticmethod
+    def addEventCallback(event, function, client_data=None):
+        return scene.add_callback(event, lambda: function(client_data))
+
+
+class MSceneMessage(object):
+    kBeforeNew = 'beforeNew'
+    kBeforeOpen = 'beforeOpen'
+    kBeforeImport = 'beforeImport'
+    kAfterNew = 'afterNew'
+    kAfterOpen = 'afterOpen'
+    kAfterImport = 'afterImport'
+    kAfterCreateReference = 'afterCreateReference'
+    kAfterLoadReference = 'afterLoadReference'
+    kAfterUnloadReference = 'afterUnloadReference'
+    kAfterRemoveReference = 'afterRemoveReference'
+
+    @staticmethod
+    def addCallback(message, function, client_data=None):
+        return scene.add_callback(message, lambda: function(client_data))
+
+
+class MMessage(object):
+    @staticmethod
+    def removeCallbacks(callback_ids):
+        for callback_id in callback_ids:
+            scene.remove_callback(callback_id)
+
+    @staticmethod
+    def removeCallback(callback_id):
+        scene.remove_callback(callback_id)
+
+
+class MTime(object):
+    kFilm = 6
+
+    def __init__(self, value=0.0, unit=kFilm):
+        self.value = float(value)
+        self.unit = unit
+
+    @staticmethod
+    def uiUnit():
+        return MTime.kFilm
+
+    def asUnits(self, unit):
+        return self.value
+
+
+class MTimeArray(list):
+    pass
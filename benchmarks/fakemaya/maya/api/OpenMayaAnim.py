@@ -0,0 +1,94 @@
+'''
+Fake OpenMayaAnim 2, the anim curves are linear only.
+'''
+
+import bisect
+
+from maya._scene import scene
+from maya.api.OpenMaya import MObject, MTime
+
+
+TOLERANCE = 1e-6
+
+
+class MAnimUtil(object):
+    @staticmethod
+    def findAnimation(plug):
+        source = scene.connections.get(scene.normalize_plug(plug.name()))
+        if source is None:
+            return []
+        node = scene.get_node(source)
+        if not node.type.startswith('animCurve'):
+            return []
+        return [MObject(node)]
+
+
+class MFnAnimCurve(object):
+    kAnimCurveTU = 'animCurveTU'
+    kTangentGlobal = 'global'
+    kTangentLinear = 'linear'
+
+    def __init__(self, mobject=None):
+        self._node = mobject.node if mobject else None
+
+    def create(self, plug, curve_type=kAnimCurveTU, modifier=None):
+        node_name = plug.name().replace('.', '_').replace('[', '_').replace(
+            ']', '')
+        self._node = scene.create_node(curve_type, node_name)
+        scene.connect(self._node.name + '.output', plug.name())
+        return MObject(self._node)
+
+    @property
+    def isUnitlessInput(self):
+        return False
+
+    @property
+    def numKeys(self):
+        return len(self._node.keys)
+
+    def find(self, time):
+        times = [key[0] for key in self._node.keys]
+        index = bisect.bisect_left(times, time.value - TOLERANCE)
+        if index < len(times) and abs(times[index] - time.value) < TOLERANCE:
+            return index
+        return None
+
+    def input(self, index):
+        return MTime(self._node.keys[index][0])
+
+    def value(self, index):
+        return self._node.keys[index][1]
+
+    def setValue(self, index, value, change=None):
+        self._node.keys[index] = (self._node.keys[index][0], value)
+
+    def setInTangentType(self, index, tangent_type, change=None):
+        return None
+
+    def setOutTangentType(self, index, tangent_type, change=None):
+        return None
+
+    def addKeys(
+            self, times, values, tangent_in_type=kTangentGlobal,
+            tangent_out_type=kTangentGlobal, keep_existing_keys=False,
+            change=None):
+        keys = dict(self._node.keys) if keep_existing_keys else {}
+        for time, value in zip(times, values):
+            keys[time.value] = value
+        self._node.keys = sorted(keys.items())
+
+    def remove(self, index, change=None):
+        del self._node.keys[index]
+
+    def evaluate(self, time):
+        keys = self._node.keys
+        if not keys:
+            return 0.0
+        times = [key[0] for key in keys]
+        index = bisect.bisect_right(times, time.value)
+        if index == 0:
+            return keys[0][1]
+        if index == len(keys):
+            return keys[-1][1]
+        (t0, v0), (t1, v1) = keys[index - 1], keys[index]
+        return v0 + (v1 - v0) * (time.value - t0) / (t1 - t0)
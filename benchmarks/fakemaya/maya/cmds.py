@@ -0,0 +1,519 @@
+'''
+Fake maya.cmds, only the commands and flags used by silhouettepolisher are
+implemented. See _scene.py.
+'''
+
+import os
+import sys
+
+from maya._scene import scene, split_plug, copy_points, create_points
+
+
+def _flatten(args):
+    result = []
+    for arg in args:
+        if isinstance(arg, (list, tuple)):
+            result.extend(_flatten(arg))
+        elif arg is not None:
+            result.append(str(arg))
+    return result
+
+
+def _name(node, long=False):
+    return node.full_path() if long else node.name
+
+
+def _types(type):
+    if type is None:
+        return None
+    return (type, ) if isinstance(type, str) else tuple(type)
+
+
+def ls(*args, **kwargs):
+    selection = kwargs.get('selection', kwargs.get('sl', False))
+    long = kwargs.get('long', False)
+    types = _types(kwargs.get('type'))
+    show_type = kwargs.get('showType', False)
+    objects_only = kwargs.get('objectsOnly', False)
+
+    if selection:
+        items = list(scene.selection)
+    else:
+        # like maya, an empty list (or no argument) list the whole scene.
+        items = _flatten(args) or list(scene.nodes)
+    result = []
+    for item in items:
+        node_name, attribute = split_plug(item)
+        if node_name == '*' and attribute:
+            for node in list(scene.nodes.values()):
+                if attribute in node.dynamic_attributes:
+                    result.append('{}.{}'.format(node.name, attribute))
+            continue
+        if not scene.exists(node_name):
+            continue
+        node = scene.get_node(node_name)
+        if attribute and not objects_only:
+            result.append('{}.{}'.format(_name(node, long), attribute))
+            continue
+        if types and not node.is_type(types):
+            continue
+        name = _name(node, long)
+        if name in result:
+            continue
+        result.append(name)
+        if show_type:
+            result.append(node.type)
+    return result
+
+
+def select(*args, **kwargs):
+    nodes = _flatten(args)
+    if kwargs.get('clear'):
+        scene.selection = []
+        return
+    scene.selection = [n for n in nodes if scene.exists(n)]
+
+
+def nodeType(node):
+    return scene.get_node(node).type
+
+
+def objExists(name):
+    node_name, attribute = split_plug(name)
+    if not scene.exists(node_name):
+        return False
+    return not attribute or scene.get_node(node_name).has_attribute(attribute)
+
+
+def listRelatives(*args, **kwargs):
+    full_path = kwargs.get('fullPath', kwargs.get('path', False))
+    types = _types(kwargs.get('type'))
+    no_intermediate = kwargs.get('noIntermediate', False)
+    result = []
+    for name in _flatten(args):
+        node = scene.get_node(name)
+        if kwargs.get('parent'):
+            relatives = [node.parent] if node.parent else []
+        elif kwargs.get('shapes'):
+            relatives = scene.get_shapes(
+                node, intermediates=not no_intermediate)
+            relatives = [r for r in relatives if r is not node]
+        else:
+            relatives = [
+                child for child in node.children
+                if not no_intermediate or
+                not child.get_value('intermediateObject')]
+        for relative in relatives:
+            if types and not relative.is_type(types):
+                continue
+            name = _name(relative, full_path)
+            if name not in result:
+                result.append(name)
+    return result or None
+
+
+def listHistory(*args, **kwargs):
+    result = []
+    for name in _flatten(args):
+        node = scene.get_node(name)
+        if kwargs.get('future', kwargs.get('f')):
+            result.extend(
+                other.name for other in scene.nodes.values()
+                if node in other.history and other.name not in result)
+            continue
+        shapes = scene.get_shapes(node, intermediates=False)
+        for shape in shapes:
+            result.extend(n.name for n in shape.history)
+    return result or None
+
+
+def _match(attribute, pattern):
+    return (
+        pattern is None or attribute == pattern or
+        attribute.startswith(pattern + '[') or
+        attribute.startswith(pattern + '.'))
+
+
+def listConnections(*args, **kwargs):
+    source = kwargs.get('source', kwargs.get('s', True))
+    destination = kwargs.get('destination', kwargs.get('d', True))
+    plugs = kwargs.get('plugs', kwargs.get('p', False))
+    connections = kwargs.get('connections', kwargs.get('c', False))
+    types = _types(kwargs.get('type'))
+
+    result = []
+    for target in _flatten(args):
+        node_name, attribute = split_plug(target)
+        node = scene.get_node(node_name)
+        attribute = node.normalize(attribute) if attribute else None
+        if attribute == 'dagSetMembers':
+            result.extend(member.name for member in node.members)
+            continue
+        for destination_plug, source_plug in list(scene.connections.items()):
+            destination_node, destination_attribute = split_plug(
+                destination_plug)
+            source_node, source_attribute = split_plug(source_plug)
+            if (destination and source_node == node.name and
+                    _match(source_attribute, attribute)):
+                own, other = source_plug, destination_plug
+            elif (source and destination_node == node.name and
+                    _match(destination_attribute, attribute)):
+                own, other = destination_plug, source_plug
+            else:
+                continue
+            other_node = scene.get_node(other)
+            if types and not other_node.is_type(types):
+                continue
+            if connections:
+                result.append(own)
+            result.append(other if plugs else other_node.name)
+    return result or None
+
+
+def deformer(*args, **kwargs):
+    node = scene.get_node(_flatten(args)[0])
+    if kwargs.get('query', kwargs.get('q')) and kwargs.get(
+            'geometry', kwargs.get('g')):
+        return [
+            other.name for other in scene.nodes.values()
+            if node in other.history] or None
+    raise NotImplementedError('fake deformer only query the geometries')
+
+
+def connectAttr(source, destination, **kwargs):
+    scene.connect(source, destination)
+
+
+def disconnectAttr(source, destination, **kwargs):
+    scene.disconnect(source, destination)
+
+
+def _multi_indices(node, attribute):
+    prefix = node.normalize(attribute) + '['
+    indices = set()
+    keys = list(node.values) + [
+        split_plug(plug)[1] for plug in scene.connections
+        if split_plug(plug)[0] == node.name]
+    for key in keys:
+        if key.startswith(prefix):
+            indices.add(int(key[len(prefix):].split(']')[0]))
+    return sorted(indices)
+
+
+def getAttr(plug, **kwargs):
+    node_name, attribute = split_plug(plug)
+    node = scene.get_node(node_name)
+    if kwargs.get('multiIndices'):
+        return _multi_indices(node, attribute) or None
+    if kwargs.get('type'):
+        if attribute in ('outMesh', 'inMesh', 'worldMesh[0]'):
+            return 'mesh'
+        return 'double'
+    value = node.get_value(attribute)
+    if isinstance(value, tuple):
+        return [value]
+    return value
+
+
+def setAttr(plug, *values, **kwargs):
+    node_name, attribute = split_plug(plug)
+    node = scene.get_node(node_name)
+    attribute = node.normalize(attribute)
+    if attribute.endswith(']') and ':' in attribute.rsplit('[', 1)[1]:
+        base, indices = attribute[:-1].rsplit('[', 1)
+        start, end = (int(index) for index in indices.split(':'))
+        for index, value in zip(range(start, end + 1), values):
+            setAttr('{}.{}[{}]'.format(node_name, base, index), value)
+        return
+    type = kwargs.get('type')
+    if type in ('double3', 'float3'):
+        value = tuple(values)
+    elif type in ('pointArray', 'componentList'):
+        value = list(values[1:])
+    else:
+        value = values[0]
+    if attribute in node.dynamic_attributes:
+        node.dynamic_attributes[attribute] = value
+    else:
+        node.values[attribute] = value
+
+
+def addAttr(*args, **kwargs):
+    name = kwargs.get('longName', kwargs.get('ln'))
+    if kwargs.get('dataType') == 'string':
+        default = ''
+    elif kwargs.get('attributeType', kwargs.get('at')) == 'message':
+        default = None
+    else:
+        default = kwargs.get('defaultValue', 0)
+    for node_name in _flatten(args) or scene.selection:
+        node = scene.get_node(node_name)
+        if node.has_attribute(name):
+            raise RuntimeError(
+                'Found more than one attribute named {}'.format(name))
+        node.dynamic_attributes[name] = default
+        scene.fire('attributeAdded', node, name)
+
+
+def delete(*args, **kwargs):
+    if kwargs.get('constructionHistory'):
+        # the fake nodes don't have history.
+        return
+    for name in _flatten(args):
+        if scene.exists(name):
+            scene.delete_node(scene.get_node(name))
+
+
+def createNode(type, name=None, parent=None, **kwargs):
+    parent = scene.get_node(parent) if parent else None
+    return scene.create_node(type, name, parent).name
+
+
+def shadingNode(type, **kwargs):
+    return createNode(type, name=kwargs.get('name'))
+
+
+def _duplicate_node(node, parent):
+    copy = scene.create_node(node.type, node.name, parent)
+    copy.values = dict(node.values)
+    copy.dynamic_attributes = {
+        name: value for name, value in node.dynamic_attributes.items()}
+    if node.points is not None:
+        copy.points = copy_points(node.points)
+    for child in node.children:
+        _duplicate_node(child, copy)
+    return copy
+
+
+def duplicate(*args, **kwargs):
+    return [
+        _duplicate_node(scene.get_node(name), scene.get_node(name).parent).name
+        for name in _flatten(args)]
+
+
+def polyReduce(*args, **kwargs):
+    # the fake meshes are point clouds, the reduction keeps one vertex every
+    # n (like keepOriginalVertices).
+    step = max(int(round(100.0 / (100 - kwargs.get('percentage', 0)))), 1)
+    for name in _flatten(args):
+        mesh = scene.get_mesh(name)
+        mesh.points = create_points([
+            value for i in range(0, len(mesh.points) // 3, step)
+            for value in mesh.points[i * 3:i * 3 + 3]])
+
+
+def rename(node, name):
+    return scene.rename_node(scene.get_node(node), name)
+
+
+def hyperShade(*args, **kwargs):
+    shader = kwargs['assign']
+    shading_group = shader + 'SG'
+    if not scene.exists(shading_group):
+        createNode('shadingEngine', name=shading_group)
+        connectAttr(shader + '.outColor', shading_group + '.surfaceShader')
+    sets(scene.selection, edit=True, forceElement=shading_group)
+
+
+def sets(*args, **kwargs):
+    if kwargs.get('empty'):
+        return createNode('shadingEngine', name=kwargs.get('name'))
+    shading_group = scene.get_node(kwargs['forceElement'])
+    for name in _flatten(args):
+        node = scene.get_node(name)
+        for other in scene.nodes.values():
+            if node in other.members:
+                other.members.remove(node)
+        shading_group.members.append(node)
+
+
+def currentTime(*args, **kwargs):
+    if kwargs.get('query', kwargs.get('q')):
+        return scene.time
+    scene.time = float(args[0])
+    scene.fire('timeChanged')
+    return scene.time
+
+
+def playbackOptions(**kwargs):
+    if kwargs.get('minTime', kwargs.get('min')):
+        return scene.start_frame
+    if kwargs.get('maxTime', kwargs.get('max')):
+        return scene.end_frame
+
+
+def _store_dense_target(blendshape, index, target, name):
+    target_points = scene.get_mesh(target).points
+    base_points = blendshape.input_points
+    deltas = [
+        (target_points[i] - base_points[i],
+         target_points[i + 1] - base_points[i + 1],
+         target_points[i + 2] - base_points[i + 2], 1.0)
+        for i in range(0, len(base_points), 3)]
+    item = 'inputTarget[0].inputTargetGroup[{}].inputTargetItem[6000]'.format(
+        index)
+    blendshape.values[item + '.inputPointsTarget'] = deltas
+    blendshape.values[item + '.inputComponentsTarget'] = [
+        'vtx[0:{}]'.format(len(deltas) - 1)]
+    blendshape.values['weight[{}]'.format(index)] = 0.0
+    alias = scene.get_node(name).name
+    if alias not in blendshape.aliases:
+        blendshape.aliases[alias] = 'weight[{}]'.format(index)
+
+
+def blendShape(*args, **kwargs):
+    objects = _flatten(args)
+    if kwargs.get('edit'):
+        blendshape = scene.get_node(objects[0])
+        if kwargs.get('target'):
+            _, index, target, _ = kwargs['target']
+            _store_dense_target(blendshape, index, target, target)
+        if kwargs.get('weight'):
+            index, value = kwargs['weight']
+            blendshape.values['weight[{}]'.format(index)] = float(value)
+        return None
+
+    base = objects[-1]
+    shape = scene.get_mesh(base)
+    blendshape = scene.create_node(
+        'blendShape', kwargs.get('name') or 'blendShape1')
+    shapes = scene.get_shapes(scene.get_node(base))
+    origs = [s for s in shapes if s.get_value('intermediateObject')]
+    blendshape.input_points = copy_points((origs or [shape])[0].points)
+    shape.history.insert(0, blendshape)
+    for index, target in enumerate(objects[:-1]):
+        _store_dense_target(blendshape, index, target, target)
+    if kwargs.get('weight'):
+        index, value = kwargs['weight']
+        blendshape.values['weight[{}]'.format(index)] = float(value)
+    return [blendshape.name]
+
+
+def setKeyframe(*args, **kwargs):
+    # the fake curves are linear, the tangent types are ignored.
+    for plug in _flatten(args):
+        plug = scene.normalize_plug(plug)
+        source = scene.connections.get(plug)
+        curve = scene.get_node(source) if source else None
+        if curve is None or not curve.type.startswith('animCurve'):
+            name = plug.replace('.', '_').replace('[', '_').replace(']', '')
+            curve = scene.create_node('animCurveTU', name)
+            scene.connect(curve.name + '.output', plug)
+        times = kwargs.get('time', [scene.time])
+        times = times if isinstance(times, list) else [times]
+        keys = dict(curve.keys)
+        for time in times:
+            time = time[0] if isinstance(time, tuple) else time
+            keys[float(time)] = float(kwargs['value'])
+        curve.keys = sorted(keys.items())
+    return len(_flatten(args))
+
+
+def keyframe(*args, **kwargs):
+    # only the query of the keys of curves is supported.
+    result = []
+    for name in _flatten(args):
+        for time, value in scene.get_node(name).keys:
+            result.append(time if kwargs.get('timeChange') else value)
+    return result or None
+
+
+def keyTangent(*args, **kwargs):
+    # the fake curves are linear, the tangents are only queried.
+    if not kwargs.get('query'):
+        return None
+    source = scene.connections.get(scene.normalize_plug(args[0]))
+    curve = scene.get_node(source) if source else None
+    if curve is None or not curve.type.startswith('animCurve'):
+        return None
+    if kwargs.get('inAngle') or kwargs.get('outAngle'):
+        return [0.0] * len(curve.keys)
+    return ['linear'] * len(curve.keys)
+
+
+def removeMultiInstance(plug, **kwargs):
+    node_name, attribute = split_plug(plug)
+    node = scene.get_node(node_name)
+    attribute = node.normalize(attribute)
+    for key in list(node.values):
+        if key == attribute or key.startswith(attribute + '.'):
+            del node.values[key]
+    for destination, source in list(scene.connections.items()):
+        for plug_name in (destination, source):
+            plug_node, plug_attribute = split_plug(plug_name)
+            if plug_node == node.name and (
+                    plug_attribute == attribute or
+                    plug_attribute.startswith(attribute + '.')):
+                scene.disconnect(source, destination)
+                break
+
+
+def aliasAttr(*args, **kwargs):
+    if kwargs.get('query', kwargs.get('q')):
+        node = scene.get_node(args[0])
+        result = []
+        for alias, attribute in node.aliases.items():
+            result.extend((alias, attribute))
+        return result or None
+    if kwargs.get('remove', kwargs.get('rm')):
+        node_name, alias = split_plug(args[0])
+        scene.get_node(node_name).aliases.pop(alias, None)
+        return
+    name, plug = args
+    node_name, attribute = split_plug(plug)
+    node = scene.get_node(node_name)
+    node.aliases[name] = node.normalize(attribute)
+
+
+def listAttr(*args, **kwargs):
+    node_name, attribute = split_plug(args[0])
+    node = scene.get_node(node_name)
+    attribute = node.normalize(attribute)
+    aliases = {value: alias for alias, value in node.aliases.items()}
+    return [
+        aliases.get('{}[{}]'.format(attribute, i), '{}[{}]'.format(
+            attribute, i))
+        for i in _multi_indices(node, attribute)] or None
+
+
+def attributeQuery(name, node=None, exists=False, **kwargs):
+    return scene.get_node(node).has_attribute(name)
+
+
+def undoInfo(*args, **kwargs):
+    return None
+
+
+def warning(message):
+    sys.stderr.write('Warning: {}\n'.format(message))
+
+
+def about(*args, **kwargs):
+    if kwargs.get('apiVersion'):
+        return 20250000
+    return ''
+
+
+def polyEvaluate(*args, **kwargs):
+    node = scene.get_mesh(_flatten(args)[0])
+    if kwargs.get('vertex'):
+        return len(node.points) // 3
+    return {'vertex': len(node.points) // 3}
+
+
+def file(*args, **kwargs):
+    if kwargs.get('sceneName'):
+        return scene.filepath
+    if kwargs.get('open'):
+        # the fake can't read a scene, an existing file opens an empty scene.
+        if not os.path.exists(args[0]):
+            raise RuntimeError('File not found: ' + args[0])
+        scene.fire('beforeOpen')
+        scene.nodes.clear()
+        scene.connections.clear()
+        scene.filepath = args[0]
+        scene.fire('afterOpen')
+        return args[0]
+    if kwargs.get('save'):
+        return scene.filepath
+    return None
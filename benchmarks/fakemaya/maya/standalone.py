@@ -0,0 +1,6 @@
+def initialize(name='python'):
+    return None
+
+
+def uninitialize():
+    return None
@@ -0,0 +1,31 @@
+'''
+Fake pymel.core, only what the silhouettepolisher.blendshape wrappers use.
+'''
+
+from maya import cmds
+from maya._scene import scene
+
+
+class PyNode(str):
+    def __new__(cls, name):
+        scene.get_node(name)
+        return str.__new__(cls, str(name))
+
+    def name(self):
+        return str(self)
+
+    def nodeName(self):
+        return str(self).split('|')[-1]
+
+
+class _Environment(object):
+    @property
+    def time(self):
+        return cmds.currentTime(query=True)
+
+
+env = _Environment()
+
+
+def warning(message):
+    cmds.warning(message)
@@ -0,0 +1,91 @@
+'''
+Measure the import time of the silhouettepolisher package and of its core
+module, and check the UI stack isn't loaded by a plain import.
+Run it with the interpreter to measure (python or mayapy):
+    mayapy benchmarks/import_time.py --max-ms 50
+The maya modules are imported before the timer starts, they are already
+loaded in a maya session. Outside of maya, the fake maya of
+benchmarks/fakemaya is used.
+The script exit with 1 if an import is slower than the limit or if a
+forbidden module is imported.
+'''
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+
+
+ROOT = os.path.dirname(os.path.dirname(os.path.realpath(__file__)))
+FAKEMAYA = os.path.join(ROOT, 'benchmarks', 'fakemaya')
+FORBIDDEN_MODULES = (
+    'PySide2', 'PySide6', 'pymel', 'silhouettepolisher.ui',
+    'silhouettepolisher.blendshape')
+DEFAULT_MAX_MS = 50.0
+DEFAULT_MODULES = ('silhouettepolisher', 'silhouettepolisher.core')
+
+# executed in a fresh interpreter to get a cold import.
+PROBE = '''
+import json, sys, time
+try:
+    import maya.cmds
+except ImportError:
+    sys.path.append({fakemaya!r})
+import maya.cmds, maya.mel, maya.OpenMaya
+import maya.api.OpenMaya, maya.api.OpenMayaAnim
+start = time.perf_counter()
+import {module}
+elapsed = (time.perf_counter() - start) * 1000
+print(json.dumps({{
+    "milliseconds": elapsed,
+    "modules": sorted(sys.modules)}}))
+'''
+
+
+def measure_import(module=DEFAULT_MODULES[0], python=sys.executable):
+    '''
+    import the module in a new interpreter and return a tuple
+    (milliseconds, loaded modules)
+    '''
+    environment = dict(os.environ)
+    environment['PYTHONPATH'] = os.pathsep.join(
+        p for p in (ROOT, environment.get('PYTHONPATH')) if p)
+    output = subprocess.check_output(
+        [python, '-c', PROBE.format(module=module, fakemaya=FAKEMAYA)],
+        env=environment)
+    result = json.loads(output.decode().strip().splitlines()[-1])
+    return result['milliseconds'], result['modules']
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1])
+    parser.add_argument(
+        '--module', action='append', dest='modules',
+        help='the module to import, can be repeated (default: {})'.format(
+            ', '.join(DEFAULT_MODULES)))
+    parser.add_argument('--max-ms', type=float, default=DEFAULT_MAX_MS)
+    parser.add_argument('--python', default=sys.executable)
+    arguments = parser.parse_args(argv)
+
+    errors = []
+    for module in arguments.modules or DEFAULT_MODULES:
+        milliseconds, modules = measure_import(module, arguments.python)
+        forbidden = [
+            name for name in modules
+            if name in FORBIDDEN_MODULES or
+            name.split('.')[0] in FORBIDDEN_MODULES]
+        print('import {}: {:.2f} ms'.format(module, milliseconds))
+        if milliseconds > arguments.max_ms:
+            errors.append('{} slower than {:.2f} ms'.format(
+                module, arguments.max_ms))
+        if forbidden:
+            errors.append('{} imported: {}'.format(
+                module, ', '.join(forbidden)))
+    for error in errors:
+        print('FAIL: ' + error)
+    return 1 if errors else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
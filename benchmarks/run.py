@@ -0,0 +1,366 @@
+'''
+Time the silhouettepolisher hot paths on generated meshes and check them
+against a recorded baseline.
+The operations run against the in memory maya stand-in of benchmarks/fakemaya
+so the suite doesn't need a maya license. The fake doesn't evaluate the
+dependency graph, the timings measure the silhouettepolisher side (the python
+and the data transfers), not the maya deformation.
+    python benchmarks/run.py --sizes 10000 100000 1000000
+    python benchmarks/run.py --update-baseline
+The results are written as json (benchmarks/results.json by default). The
+script exit with 1 if an operation is slower than the baseline by more than
+the tolerance or if there's no baseline (benchmarks/baseline.json is
+recorded against the fake maya, update it with --update-baseline when an
+operation is expected to change).
+The timings are compared relatively to a calibration workload timed in the
+same run (and recorded with the baseline), a baseline recorded on another
+machine stays usable.
+'''
+
+import argparse
+import json
+import os
+import platform
+import sys
+import time
+
+
+ROOT = os.path.dirname(os.path.dirname(os.path.realpath(__file__)))
+FAKEMAYA = os.path.join(ROOT, 'benchmarks', 'fakemaya')
+DEFAULT_SIZES = (10000, 100000, 1000000)
+DEFAULT_REPEATS = 3
+DEFAULT_TOLERANCE = 0.5
+# the benchmarks noisier than the others (the allocations of the dense
+# arrays dominate), {name: tolerance}.
+TOLERANCES = {'apply_proxy_working_copy': 1.0}
+CALIBRATION_SIZE = 1000000
+# slowdowns smaller than this (seconds) are timer noise, never regressions.
+MINIMUM_REGRESSION = 0.005
+DEFAULT_RESULTS = os.path.join(ROOT, 'benchmarks', 'results.json')
+DEFAULT_BASELINE = os.path.join(ROOT, 'benchmarks', 'baseline.json')
+ANIMATION_TEMPLATE = [0.0, 0.25, 0.5, 0.75, 1.0, 0.75, 0.5, 0.25, 0.0]
+
+
+def setup_path():
+    for path in (ROOT, FAKEMAYA):
+        if path not in sys.path:
+            sys.path.insert(0, path)
+
+
+def generate_points(count, offset=0.0):
+    '''
+    return a flat coordinates list of a grid of count vertices
+    '''
+    width = max(int(count ** 0.5), 1)
+    points = []
+    for i in range(count):
+        points.extend((float(i % width), offset, float(i // width)))
+    return points
+
+
+def reset_scene():
+    from maya._scene import scene
+    from silhouettepolisher import core, sceneindex
+    sceneindex.uninstall_scene_index()
+    scene.reset()
+    core.clear_intermediate_points_cache()
+
+
+def create_corrected_mesh(count):
+    '''
+    create a mesh with a corrective blendshape and return the mesh name
+    '''
+    from maya import cmds
+    from maya._scene import create_mesh
+    from silhouettepolisher import core
+    mesh = create_mesh('body', generate_points(count))
+    working_copy, _ = core.setup_working_copy(mesh)
+    core.apply_working_copy(working_copy)
+    cmds.select(clear=True)
+    return mesh
+
+
+def bench_set_target_relative(count):
+    from maya import cmds
+    from silhouettepolisher import core
+    mesh = create_corrected_mesh(count)
+    blendshape = core.get_corrective_blendshapes(mesh)[0]
+    target = cmds.duplicate(mesh)[0]
+    # warm the intermediate points cache like in a real session where the
+    # same frame is sculpted several times.
+    core.get_intermediate_points(blendshape)
+    return lambda: core.set_target_relative(blendshape, target, mesh)
+
+
+def bench_setup_working_copy(count):
+    from maya import cmds
+    from maya._scene import create_mesh
+    from silhouettepolisher import core
+    mesh = create_mesh('body', generate_points(count))
+
+    def run():
+        core.setup_working_copy(mesh)
+        core.delete_working_copy_on_mesh(mesh)
+        cmds.select(clear=True)
+    return run
+
+
+def bench_apply_working_copy(count):
+    from silhouettepolisher import core
+    mesh = create_corrected_mesh(count)
+    working_copies = []
+
+    def setup():
+        working_copies.append(core.setup_working_copy(mesh)[0])
+
+    def run():
+        core.apply_working_copy(working_copies.pop())
+    return run, setup
+
+
+def bench_apply_proxy_working_copy(count):
+    from silhouettepolisher import core, points
+    if points.numpy is None:
+        return None
+    mesh = create_corrected_mesh(count)
+    working_copies = []
+
+    def setup():
+        working_copy, _ = core.setup_proxy_working_copy(mesh)
+        working_points = points.get_points_array(working_copy)
+        working_points[::10] += 0.1
+        points.set_points_array(working_copy, working_points)
+        working_copies.append(working_copy)
+
+    def run():
+        core.apply_working_copy(working_copies.pop())
+    return run, setup
+
+
+def bench_apply_edit_target_working_copy(count):
+    '''
+    apply the edit of the second target through the dense fallback (the
+    working copy is connected), it has to land on the edited target.
+    '''
+    from maya import cmds
+    from silhouettepolisher import core
+    mesh = create_corrected_mesh(count)
+    working_copy, _ = core.setup_working_copy(mesh)
+    core.apply_working_copy(working_copy)
+    blendshape = core.get_corrective_blendshapes(mesh)[0]
+    geometry_plug = (
+        core.get_target_item_plug(blendshape, 1) + '.inputGeomTarget')
+    working_copies = []
+
+    def setup():
+        # the working copy connected by the previous run is removed.
+        cmds.delete(cmds.listConnections(geometry_plug, source=True) or [])
+        core.setup_edit_target_working_copy(mesh, blendshape, 1)
+        working_copies.append(cmds.ls(selection=True)[0])
+
+    def run():
+        core.apply_edit_target_working_copy(
+            working_copies.pop(), incremental=False)
+        assert core.has_target_geometry(blendshape, 1)
+    return run, setup
+
+
+def bench_smooth_deltas(count):
+    '''
+    smooth a localized sculpt (a tenth of the vertices) on a quad grid.
+    '''
+    from silhouettepolisher import smoothing
+    numpy = smoothing.numpy
+    if numpy is None:
+        return None
+    width = max(int(count ** 0.5), 2)
+    rows, columns = numpy.meshgrid(
+        numpy.arange(width - 1), numpy.arange(width - 1), indexing='ij')
+    corners = (rows * width + columns).ravel()
+    connects = numpy.stack(
+        (corners, corners + 1, corners + width + 1, corners + width), 1)
+    matrix = smoothing.build_adjacency_matrix(
+        numpy.full(len(corners), 4), connects.ravel(), width * width)
+    deltas = numpy.zeros((width * width, 3))
+    deltas[:width * width // 10, 1] = 0.1
+    return lambda: smoothing.smooth_deltas(deltas, matrix)
+
+
+def bench_build_symmetry_map(count):
+    '''
+    build the symmetry map of an asymmetric grid (no vertex has a symmetric
+    vertex), the search of the reflections has to stop at the tolerance.
+    '''
+    from silhouettepolisher import symmetry
+    numpy = symmetry.numpy
+    if numpy is None:
+        return None
+    points = numpy.array(generate_points(count)).reshape(-1, 3)
+    points[:, 0] += 0.3
+
+    def run():
+        symmetry_map = symmetry.build_symmetry_map(points, 'x')
+        assert (symmetry_map == -1).all()
+    return run
+
+
+def bench_apply_animation_template(count):
+    from silhouettepolisher import core
+    mesh = create_corrected_mesh(count)
+    blendshape = core.get_corrective_blendshapes(mesh)[0]
+    return lambda: (
+        core.apply_animation_template_on_blendshape_target_weight(
+            blendshape, 0, ANIMATION_TEMPLATE))
+
+
+BENCHMARKS = (
+    ('set_target_relative', bench_set_target_relative),
+    ('setup_working_copy', bench_setup_working_copy),
+    ('apply_working_copy', bench_apply_working_copy),
+    ('apply_proxy_working_copy', bench_apply_proxy_working_copy),
+    ('apply_edit_target_working_copy', bench_apply_edit_target_working_copy),
+    ('smooth_deltas', bench_smooth_deltas),
+    ('build_symmetry_map', bench_build_symmetry_map),
+    ('apply_animation_template_on_blendshape_target_weight',
+        bench_apply_animation_template),
+)
+
+
+def calibrate(repeats):
+    '''
+    return the best time in seconds of a fixed workload mixing python loops
+    and numpy arrays operations, like the benchmarked operations.
+    '''
+    from silhouettepolisher.points import numpy
+    best = None
+    for _ in range(repeats):
+        start = time.perf_counter()
+        values = [float(i) for i in range(CALIBRATION_SIZE // 10)]
+        sum(value * 0.5 for value in values)
+        if numpy is not None:
+            array = numpy.arange(CALIBRATION_SIZE * 3, dtype=numpy.float64)
+            array = array.reshape(-1, 3) * 0.5
+            numpy.einsum('ij,ij->i', array, array).argsort()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def measure(factory, count, repeats):
+    '''
+    return the best time in seconds of repeats runs. The factory return the
+    function to time or a tuple (function, setup) where setup is called
+    before each run and isn't timed, or None if the benchmark can't run
+    (None is returned).
+    '''
+    reset_scene()
+    function = factory(count)
+    if function is None:
+        return None
+    function, setup = (
+        function if isinstance(function, tuple) else (function, None))
+    best = None
+    for _ in range(repeats):
+        if setup is not None:
+            setup()
+        start = time.perf_counter()
+        function()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def run_benchmarks(sizes, repeats, names=None):
+    setup_path()
+    from silhouettepolisher import points
+    calibration = calibrate(repeats)
+    print('{:<70} {:>10.4f} s'.format('calibration', calibration))
+    results = {}
+    for name, factory in BENCHMARKS:
+        if names and name not in names:
+            continue
+        for count in sizes:
+            key = '{}[{}]'.format(name, count)
+            seconds = measure(factory, count, repeats)
+            if seconds is None:
+                continue
+            results[key] = seconds
+            print('{:<70} {:>10.4f} s'.format(key, results[key]))
+    return {
+        'python': platform.python_version(),
+        'numpy': points.numpy is not None,
+        'repeats': repeats,
+        'calibration': calibration,
+        'results': results}
+
+
+def compare(results, baseline, tolerance):
+    '''
+    return the list of the regressions messages. The baseline timings are
+    scaled by the ratio of the calibrations. An operation regress if it's
+    slower than the scaled baseline by more than the tolerance (see
+    TOLERANCES) and by more than MINIMUM_REGRESSION.
+    '''
+    regressions = []
+    ratio = 1.0
+    if baseline.get('calibration') and results.get('calibration'):
+        ratio = results['calibration'] / baseline['calibration']
+    for key, seconds in sorted(results['results'].items()):
+        reference = baseline['results'].get(key)
+        if reference is None:
+            continue
+        reference *= ratio
+        limit = 1.0 + max(tolerance, TOLERANCES.get(key.split('[')[0], 0.0))
+        if (seconds > reference * limit and
+                seconds - reference > MINIMUM_REGRESSION):
+            regressions.append(
+                '{}: {:.4f} s (scaled baseline {:.4f} s)'.format(
+                    key, seconds, reference))
+    return regressions
+
+
+def write_json(path, data):
+    with open(path, 'w') as f:
+        json.dump(data, f, indent=2, sort_keys=True)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1])
+    parser.add_argument(
+        '--sizes', type=int, nargs='+', default=list(DEFAULT_SIZES))
+    parser.add_argument('--repeats', type=int, default=DEFAULT_REPEATS)
+    parser.add_argument(
+        '--benchmark', action='append', dest='names',
+        help='run only the given benchmark, can be repeated')
+    parser.add_argument('--tolerance', type=float, default=DEFAULT_TOLERANCE)
+    parser.add_argument('--output', default=DEFAULT_RESULTS)
+    parser.add_argument('--baseline', default=DEFAULT_BASELINE)
+    parser.add_argument('--update-baseline', action='store_true')
+    arguments = parser.parse_args(argv)
+
+    results = run_benchmarks(
+        arguments.sizes, arguments.repeats, arguments.names)
+    write_json(arguments.output, results)
+
+    if arguments.update_baseline:
+        write_json(arguments.baseline, results)
+        print('baseline updated: ' + arguments.baseline)
+        return 0
+
+    if not os.path.exists(arguments.baseline):
+        print('FAIL: no baseline found, run with --update-baseline to create '
+              'it')
+        return 1
+    with open(arguments.baseline, 'r') as f:
+        baseline = json.load(f)
+    if baseline.get('numpy') != results['numpy']:
+        print('WARNING: the baseline was recorded with numpy={}'.format(
+            baseline.get('numpy')))
+    regressions = compare(results, baseline, arguments.tolerance)
+    for regression in regressions:
+        print('FAIL: ' + regression)
+    return 1 if regressions else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -1,16 +1,27 @@
-
-try:
-    from PySide2 import QtWidgets
-except ImportError:
-    from PySide6 import QtWidgets
-from silhouettepolisher.ui import SilhouettePolisherWindow
+'''
+The UI stack (Qt, the widgets and their dependencies) is only loaded when
+launch() is called or when SilhouettePolisherWindow is accessed. Scripted
+use (e.g. silhouettepolisher.core) doesn't pay for it.
+'''
 
 
 _silhouette_polisher_window = None
 
 
+def __getattr__(name):
+    if name == 'SilhouettePolisherWindow':
+        from silhouettepolisher.ui import SilhouettePolisherWindow
+        return SilhouettePolisherWindow
+    raise AttributeError(
+        'module {!r} has no attribute {!r}'.format(__name__, name))
+
+
 def get_maya_main_window():
     '''Return Maya's main window'''
+    try:
+        from PySide2 import QtWidgets
+    except ImportError:
+        from PySide6 import QtWidgets
     for obj in QtWidgets.QApplication.topLevelWidgets():
         if obj.objectName() == 'MayaWindow':
             return obj
@@ -20,6 +31,7 @@ def get_maya_main_window():
 def launch():
     global _silhouette_polisher_window
     if _silhouette_polisher_window is None:
+        from silhouettepolisher.ui import SilhouettePolisherWindow
         parent = get_maya_main_window()
         _silhouette_polisher_window = SilhouettePolisherWindow(parent)
     _silhouette_polisher_window.show()
@@ -0,0 +1,145 @@
+'''
+This module contain the keyframing helpers. The keys are read through the
+OpenMaya animation curve function set and written with cmds.setKeyframe
+(the keys written by the API aren't registered in the undo queue), the frames
+sharing a value are keyed in one call.
+'''
+
+from collections import OrderedDict
+
+import maya.api.OpenMaya as om2
+import maya.api.OpenMayaAnim as om2anim
+from maya import cmds
+
+
+def get_plug(plug):
+    '''
+    return the OpenMaya 2 MPlug for a plug name
+    '''
+    selection_list = om2.MSelectionList()
+    selection_list.add(plug)
+    return selection_list.getPlug(0)
+
+
+def get_anim_curve(plug, create=True):
+    '''
+    return an MFnAnimCurve attached to the animation curve driving the plug.
+    If the plug isn't animated, a linear animCurveTU is created and connected
+    (or None is returned if create is False).
+    '''
+    mplug = get_plug(plug)
+    curves = om2anim.MAnimUtil.findAnimation(mplug)
+    if len(curves):
+        return om2anim.MFnAnimCurve(curves[0])
+    if not create:
+        return None
+    fn_anim_curve = om2anim.MFnAnimCurve()
+    fn_anim_curve.create(mplug, om2anim.MFnAnimCurve.kAnimCurveTU)
+    return fn_anim_curve
+
+
+def set_linear_keys(plug, frames_values):
+    '''
+    create or update the animation curve of the plug with linear keys.
+    The keys are set with cmds.setKeyframe to be undoable, the frames sharing
+    the same value are keyed by one single call (an animation template only
+    have a few distinct values).
+    :plug string: the animated plug name
+    :frames_values dict: {frame: value}
+    '''
+    times_by_value = OrderedDict()
+    for frame, value in sorted(frames_values.items()):
+        frame = float(frame)
+        times_by_value.setdefault(float(value), []).append((frame, frame))
+    for value, times in times_by_value.items():
+        cmds.setKeyframe(
+            plug, time=times, value=value, inTangentType='linear',
+            outTangentType='linear')
+
+
+def get_key_values(plug):
+    '''
+    return the values of the keys of the animation curve driving the plug,
+    None if the plug isn't animated.
+    '''
+    fn_anim_curve = get_anim_curve(plug, create=False)
+    if fn_anim_curve is None:
+        return None
+    return [fn_anim_curve.value(i) for i in range(fn_anim_curve.numKeys)]
+
+
+def get_keys(plug):
+    '''
+    return the keys of the animation curve driving the plug as a list of
+    (frame, value), None if the plug isn't animated.
+    '''
+    fn_anim_curve = get_anim_curve(plug, create=False)
+    if fn_anim_curve is None:
+        return None
+    unit = om2.MTime.uiUnit()
+    return [
+        (fn_anim_curve.input(i).asUnits(unit), fn_anim_curve.value(i))
+        for i in range(fn_anim_curve.numKeys)]
+
+
+def get_key_tangents(plug):
+    '''
+    return the tangents of the keys of the animation curve driving the plug
+    as a list of (in type, out type, in angle, out angle), None if the plug
+    isn't animated.
+    '''
+    tangents = [
+        cmds.keyTangent(plug, query=True, **{flag: True})
+        for flag in ('inTangentType', 'outTangentType', 'inAngle', 'outAngle')]
+    if not tangents[0]:
+        return None
+    return list(zip(*tangents))
+
+
+def set_keys(plug, keys, tangents=None):
+    '''
+    create or update the animation curve of the plug with the given keys and
+    tangents (see get_keys and get_key_tangents), linear by default. As in
+    set_linear_keys, the keys sharing the same value and tangent types are set
+    by one single call. The angles are only set on the fixed tangents, the
+    other types compute their angles.
+    :plug string: the animated plug name
+    :keys list: [(frame, value)]
+    :tangents list: [(in type, out type, in angle, out angle)]
+    '''
+    tangents = tangents or [('linear', 'linear', None, None)] * len(keys)
+    times_by_key = OrderedDict()
+    for (frame, value), (in_type, out_type, _, _) in zip(keys, tangents):
+        frame = float(frame)
+        times_by_key.setdefault(
+            (float(value), in_type, out_type), []).append((frame, frame))
+    for (value, in_type, out_type), times in times_by_key.items():
+        cmds.setKeyframe(
+            plug, time=times, value=value, inTangentType=in_type,
+            outTangentType=out_type)
+    for (frame, _), (in_type, out_type, in_angle, out_angle) in zip(
+            keys, tangents):
+        frame = float(frame)
+        if in_type == 'fixed':
+            cmds.keyTangent(
+                plug, edit=True, time=(frame, frame), inAngle=in_angle)
+        if out_type == 'fixed':
+            cmds.keyTangent(
+                plug, edit=True, time=(frame, frame), outAngle=out_angle)
+
+
+def get_plug_values(plug, frames):
+    '''
+    return the values of the plug at the given frames. An animation curve
+    driving the plug is evaluated directly, the other drivers (expression,
+    driven keys...) are evaluated by maya at each frame.
+    '''
+    fn_anim_curve = get_anim_curve(plug, create=False)
+    if fn_anim_curve is not None and not fn_anim_curve.isUnitlessInput:
+        unit = om2.MTime.uiUnit()
+        return [
+            fn_anim_curve.evaluate(om2.MTime(frame, unit))
+            for frame in frames]
+    if cmds.listConnections(plug, source=True, destination=False):
+        return [cmds.getAttr(plug, time=frame) for frame in frames]
+    return [cmds.getAttr(plug)] * len(frames)
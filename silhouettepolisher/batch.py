@@ -0,0 +1,392 @@
+'''
+This module is the command line entry point to process many scenes without
+opening them by hand. The scenes are spread on a pool of worker mayapy
+processes. Each worker initializes maya once and processes the scenes it
+receives one by one. The progress and the timings of each scene are printed
+when it's done. A failing scene is reported and the batch continue, a
+crashed worker is replaced. With --timeout, a worker spending more than the
+given seconds on a scene is killed and replaced, the scene is reported as
+failed.
+    mayapy -m silhouettepolisher.batch -o apply --sparse shots/*.ma
+    mayapy -m silhouettepolisher.batch -o consolidate -o prune shots/*.ma
+    mayapy -m silhouettepolisher.batch -o export -d /tmp/library shots/*.ma
+    mayapy -m silhouettepolisher.batch -o compress --tolerance 0.01 shots/*.ma
+The operations run in the given order, the scene is saved in place after
+the operations modifying it (unless --no-save).
+The workers talk with the main process through json lines on their
+stdin/stdout, everything else printed by maya is ignored (or forwarded with
+--verbose).
+'''
+
+import argparse
+import json
+import os
+import queue
+import subprocess
+import sys
+import threading
+import time
+from collections import OrderedDict
+
+from silhouettepolisher.constants import (
+    SPARSE_TARGET_EPSILON, PRUNE_DELTA_THRESHOLD, COMPRESSION_TOLERANCE,
+    WORKING_COPY_FRAME_ATTR)
+
+
+ROOT = os.path.dirname(os.path.dirname(os.path.realpath(__file__)))
+# prefix of the worker lines read by the main process.
+RESULT_PREFIX = '@silhouettepolisher:'
+
+
+# operations
+def apply_working_copies(scene, options):
+    from maya import cmds
+    from silhouettepolisher import core
+    from silhouettepolisher.sceneindex import get_scene_index
+    scene_index = get_scene_index()
+    applied = []
+    for mesh in scene_index.get_meshes_with_working_copy():
+        working_copy = scene_index.get_working_copy(mesh)
+        # the target is relative to the pose of the frame it was sculpted at.
+        cmds.currentTime(cmds.getAttr(
+            working_copy + '.' + WORKING_COPY_FRAME_ATTR))
+        core.apply_working_copy(
+            working_copy, sparse=options['sparse'],
+            epsilon=options['epsilon'])
+        applied.append(mesh)
+    return applied
+
+
+def export_correctives(scene, options):
+    from silhouettepolisher import library
+    from silhouettepolisher.core import short_name
+    from silhouettepolisher.sceneindex import get_scene_index
+    directory = options['directory'] or os.path.dirname(scene)
+    basename = os.path.splitext(os.path.basename(scene))[0]
+    filepaths = []
+    for mesh in get_scene_index().get_corrected_meshes():
+        filepath = os.path.join(directory, '{}_{}.splib'.format(
+            basename, short_name(mesh).replace(':', '_')))
+        library.export_correctives(mesh, filepath)
+        filepaths.append(filepath)
+    return filepaths
+
+
+def consolidate_correctives(scene, options):
+    from silhouettepolisher import core
+    from silhouettepolisher.sceneindex import get_scene_index
+    return [
+        core.consolidate_corrective_blendshapes(mesh)
+        for mesh in get_scene_index().get_corrected_meshes()]
+
+
+def prune_correctives(scene, options):
+    from silhouettepolisher import core
+    from silhouettepolisher.sceneindex import get_scene_index
+    return [
+        core.prune_corrective_blendshapes(
+            mesh, delta_threshold=options['delta_threshold'],
+            vertex_threshold=options['epsilon'])
+        for mesh in get_scene_index().get_corrected_meshes()]
+
+
+def compress_correctives(scene, options):
+    from silhouettepolisher import compression
+    from silhouettepolisher.sceneindex import get_scene_index
+    return [
+        compression.compress_corrective_blendshapes(
+            mesh, tolerance=options['tolerance'])
+        for mesh in get_scene_index().get_corrected_meshes()]
+
+
+# {name: (function, modify the scene)}
+OPERATIONS = OrderedDict((
+    ('apply', (apply_working_copies, True)),
+    ('export', (export_correctives, False)),
+    ('consolidate', (consolidate_correctives, True)),
+    ('prune', (prune_correctives, True)),
+    ('compress', (compress_correctives, True)),
+))
+
+
+# worker side
+def process_scene(job):
+    '''
+    open the scene, run the operations and save it. The exceptions are
+    catched and returned as the result error.
+    return a result dict: scene, error, timings and operations results.
+    '''
+    from maya import cmds
+    scene = job['scene']
+    result = OrderedDict((
+        ('scene', scene),
+        ('error', None),
+        ('timings', OrderedDict()),
+        ('results', OrderedDict())))
+    modified = False
+    stage = 'open'
+    try:
+        start = time.perf_counter()
+        cmds.file(scene, open=True, force=True)
+        result['timings']['open'] = time.perf_counter() - start
+        for stage in job['operations']:
+            function, modify = OPERATIONS[stage]
+            start = time.perf_counter()
+            result['results'][stage] = function(scene, job['options'])
+            result['timings'][stage] = time.perf_counter() - start
+            modified = modified or modify
+        if modified and job['options']['save']:
+            stage = 'save'
+            start = time.perf_counter()
+            cmds.file(save=True, force=True)
+            result['timings']['save'] = time.perf_counter() - start
+    except Exception as e:
+        result['error'] = '{} failed: {}'.format(stage, e)
+    return result
+
+
+def run_worker():
+    '''
+    initialize maya and process the scenes received on stdin until it's
+    closed.
+    '''
+    import maya.standalone
+    maya.standalone.initialize(name='python')
+    try:
+        for line in sys.stdin:
+            if not line.strip():
+                continue
+            result = process_scene(json.loads(line))
+            sys.stdout.write(RESULT_PREFIX + json.dumps(result) + '\n')
+            sys.stdout.flush()
+    finally:
+        maya.standalone.uninitialize()
+
+
+# main process side
+def get_worker_command(mayapy):
+    return [mayapy, '-m', 'silhouettepolisher.batch', '--worker']
+
+
+def start_worker(mayapy, verbose=False):
+    env = dict(os.environ)
+    env['PYTHONPATH'] = os.pathsep.join(
+        path for path in (ROOT, env.get('PYTHONPATH')) if path)
+    process = subprocess.Popen(
+        get_worker_command(mayapy), stdin=subprocess.PIPE,
+        stdout=subprocess.PIPE,
+        stderr=None if verbose else subprocess.DEVNULL,
+        env=env, universal_newlines=True, bufsize=1)
+    # the stdout is read by a thread, the lines can be waited with a timeout.
+    process.lines = queue.Queue()
+    thread = threading.Thread(
+        target=read_lines, args=(process.stdout, process.lines))
+    thread.daemon = True
+    thread.start()
+    return process
+
+
+def read_lines(stream, lines):
+    '''
+    thread function: put the lines of the stream in the lines queue, None
+    is put when the stream is closed.
+    '''
+    for line in stream:
+        lines.put(line)
+    lines.put(None)
+
+
+def read_result(process, verbose=False, timeout=None):
+    '''
+    return the next result sent by the worker, None if the worker died.
+    raise TimeoutError if no result is received in timeout seconds.
+    '''
+    deadline = None if timeout is None else time.perf_counter() + timeout
+    while True:
+        remaining = None
+        if deadline is not None:
+            remaining = max(deadline - time.perf_counter(), 0)
+        try:
+            line = process.lines.get(timeout=remaining)
+        except queue.Empty:
+            raise TimeoutError('timed out after {} s'.format(timeout))
+        if line is None:
+            return None
+        if line.startswith(RESULT_PREFIX):
+            return json.loads(line[len(RESULT_PREFIX):])
+        if verbose:
+            sys.stdout.write(line)
+
+
+def feed_worker(mayapy, jobs, results, verbose=False, timeout=None):
+    '''
+    thread function: send the jobs to a worker process and put the results
+    in the results queue. The worker is started at the first job and
+    restarted if it crashes or if a scene takes more than timeout seconds
+    (the worker is killed).
+    '''
+    process = None
+    while True:
+        try:
+            job = jobs.get_nowait()
+        except queue.Empty:
+            break
+        start = time.perf_counter()
+        result = None
+        try:
+            if process is None:
+                process = start_worker(mayapy, verbose)
+            process.stdin.write(json.dumps(job) + '\n')
+            process.stdin.flush()
+            result = read_result(process, verbose, timeout)
+        except TimeoutError as e:
+            process.kill()
+            process.wait()
+            process = None
+            result = {'scene': job['scene'], 'error': str(e)}
+        except (OSError, ValueError) as e:
+            result = {'scene': job['scene'], 'error': str(e)}
+        if result is None:
+            process.wait()
+            result = {
+                'scene': job['scene'],
+                'error': 'worker crashed (exit code {})'.format(
+                    process.returncode)}
+            process = None
+        if process is not None and process.poll() is not None:
+            process = None
+        result['seconds'] = time.perf_counter() - start
+        results.put(result)
+    if process is not None:
+        process.stdin.close()
+        process.wait()
+
+
+def format_result(result, index, count):
+    status = 'FAILED' if result.get('error') else 'ok'
+    line = '[{:>{width}}/{}] {:<6} {} {:.2f} s'.format(
+        index, count, status, result['scene'], result['seconds'],
+        width=len(str(count)))
+    timings = result.get('timings')
+    if timings:
+        line += ' ({})'.format(', '.join(
+            '{} {:.2f}'.format(name, seconds)
+            for name, seconds in timings.items()))
+    if result.get('error'):
+        line += ': ' + result['error']
+    return line
+
+
+def run_batch(
+        scenes, operations, options, workers=None, mayapy=None,
+        verbose=False, timeout=None):
+    '''
+    process the scenes on a pool of worker processes and print the progress.
+    :scenes list: the scenes file paths
+    :operations list: the OPERATIONS names to run on each scene
+    :options dict: the operations options, see main
+    :workers int: the number of processes, cpu count by default
+    :mayapy string: the interpreter of the workers, the current one by
+    default
+    :timeout float: the seconds allowed to each scene, no limit by default
+    return the results as a list of dict.
+    '''
+    mayapy = mayapy or sys.executable
+    workers = min(workers or os.cpu_count() or 1, len(scenes))
+    jobs, results = queue.Queue(), queue.Queue()
+    for scene in scenes:
+        jobs.put(OrderedDict((
+            ('scene', os.path.abspath(scene)),
+            ('operations', list(operations)),
+            ('options', options))))
+
+    threads = [
+        threading.Thread(
+            target=feed_worker,
+            args=(mayapy, jobs, results, verbose, timeout))
+        for _ in range(workers)]
+    for thread in threads:
+        thread.daemon = True
+        thread.start()
+
+    done = []
+    for i in range(1, len(scenes) + 1):
+        result = results.get()
+        done.append(result)
+        print(format_result(result, i, len(scenes)))
+        sys.stdout.flush()
+    for thread in threads:
+        thread.join()
+    return done
+
+
+def parse_arguments(argv=None):
+    parser = argparse.ArgumentParser(
+        prog='silhouettepolisher.batch',
+        description='process the correctives of many scenes with mayapy.')
+    parser.add_argument('scenes', nargs='*')
+    parser.add_argument(
+        '-o', '--operation', action='append', dest='operations',
+        choices=list(OPERATIONS),
+        help='operation to run on each scene, can be repeated')
+    parser.add_argument(
+        '-w', '--workers', type=int, default=None,
+        help='number of mayapy processes, cpu count by default')
+    parser.add_argument(
+        '--mayapy', default=None,
+        help='interpreter of the workers, the current one by default')
+    parser.add_argument(
+        '-d', '--directory', default=None,
+        help='export directory, the scene directory by default')
+    parser.add_argument('--sparse', action='store_true')
+    parser.add_argument(
+        '--epsilon', type=float, default=SPARSE_TARGET_EPSILON)
+    parser.add_argument(
+        '--delta-threshold', type=float, default=PRUNE_DELTA_THRESHOLD)
+    parser.add_argument(
+        '--tolerance', type=float, default=COMPRESSION_TOLERANCE,
+        help='largest vertex error allowed by the compression')
+    parser.add_argument(
+        '--timeout', type=float, default=None,
+        help='seconds allowed to each scene, the worker is killed and the '
+        'scene reported as failed when it expires')
+    parser.add_argument('--no-save', action='store_true')
+    parser.add_argument(
+        '--report', default=None, help='write the results as json')
+    parser.add_argument('-v', '--verbose', action='store_true')
+    parser.add_argument(
+        '--worker', action='store_true', help=argparse.SUPPRESS)
+    return parser, parser.parse_args(argv)
+
+
+def main(argv=None):
+    parser, arguments = parse_arguments(argv)
+    if arguments.worker:
+        run_worker()
+        return 0
+    if not arguments.scenes or not arguments.operations:
+        parser.error('at least one scene and one operation are required')
+
+    options = {
+        'sparse': arguments.sparse,
+        'epsilon': arguments.epsilon,
+        'delta_threshold': arguments.delta_threshold,
+        'tolerance': arguments.tolerance,
+        'directory': arguments.directory,
+        'save': not arguments.no_save}
+    start = time.perf_counter()
+    results = run_batch(
+        arguments.scenes, arguments.operations, options,
+        workers=arguments.workers, mayapy=arguments.mayapy,
+        verbose=arguments.verbose, timeout=arguments.timeout)
+    failures = [result for result in results if result.get('error')]
+    print('{} scenes processed in {:.2f} s, {} failed'.format(
+        len(results), time.perf_counter() - start, len(failures)))
+    if arguments.report:
+        with open(arguments.report, 'w') as f:
+            json.dump(results, f, indent=2)
+    return 1 if failures else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
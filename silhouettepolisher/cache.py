@@ -0,0 +1,300 @@
+'''
+This module contain the frame range cache of the geometry entering the
+corrective blendshapes (the mesh before the corrective deformation).
+The input geometry is evaluated for all the frames in one pass (with a
+DG context, the scene time doesn't change) and stored in a memory mapped
+float32 array (frames, vertices, 3) saved as .npy in the cache directory.
+get_intermediate_points (core.py) read the cache when it covers the current
+frame, the rig isn't evaluated anymore when the correctives are sculpted at
+several frames of the same shot.
+The cache file is named after the full scene path. The topology and a
+signature of the deformation chain (the nodes upstream the blendshape and the
+keys of their animation curves) are saved with it, a cache saved with another
+topology, rig or animation isn't loaded. The signature is checked again the
+first time a frame is served, a cache outdated during the session is dropped.
+The loaded caches are forgotten when a scene is opened or created.
+    from silhouettepolisher import cache
+    cache.cache_intermediate_points('body_corrective_blendshape', 1001, 1100)
+numpy is required.
+The caches depending only on a topology (vertex mappings, adjacencies) are
+saved in the same directory, see get_topology_cache_filepath.
+'''
+
+import hashlib
+import json
+import os
+import re
+import tempfile
+
+import maya.api.OpenMaya as om2
+from maya import cmds
+
+from silhouettepolisher.points import numpy, get_plug_points_array
+from silhouettepolisher.topology import get_topology_hash
+
+
+CACHE_DIRECTORY_ENVVAR = 'SILHOUETTEPOLISHER_CACHE_DIRECTORY'
+# the frames are matched with this tolerance (the cache step can be a
+# subframe).
+FRAME_TOLERANCE = 1e-3
+
+# the callbacks installed before a module reload are removed.
+if globals().get('_callbacks'):
+    om2.MMessage.removeCallbacks(_callbacks)
+# {(scene, blendshape): IntermediatePointsCache}
+_caches = {}
+# callbacks clearing the caches when the scene changes.
+_callbacks = []
+
+
+def get_cache_directory():
+    '''
+    return the directory where the caches are saved, it can be set with
+    the environment variable SILHOUETTEPOLISHER_CACHE_DIRECTORY.
+    '''
+    directory = os.environ.get(CACHE_DIRECTORY_ENVVAR) or os.path.join(
+        tempfile.gettempdir(), 'silhouettepolisher_cache')
+    if not os.path.isdir(directory):
+        os.makedirs(directory)
+    return directory
+
+
+def get_scene_name():
+    return cmds.file(query=True, sceneName=True) or 'untitled'
+
+
+def get_cache_filepath(blendshape, mesh=None):
+    '''
+    return the cache .npy file path of a blendshape, the metadata are saved
+    next to it as .json. The name contains a hash of the full scene path, the
+    scenes with the same name in different directories don't share it.
+    '''
+    scene = get_scene_name()
+    scene_hash = hashlib.sha1(
+        os.path.normpath(scene).encode('utf-8')).hexdigest()[:12]
+    scene = os.path.splitext(os.path.basename(scene))[0]
+    name = '_'.join(n for n in (scene, scene_hash, mesh, blendshape) if n)
+    name = re.sub(r'[^\w]+', '_', name)
+    return os.path.join(get_cache_directory(), name + '.npy')
+
+
+def get_topology_cache_filepath(kind, *keys):
+    '''
+    return the .npz file path of a cache depending only on topologies (vertex
+    mappings, adjacencies...), it can be shared between the scenes.
+    :kind string: the cache type, e.g. "proxy"
+    :keys strings: the topology hashes and the parameters of the cache
+    '''
+    name = re.sub(r'[^\w]+', '_', '_'.join((kind,) + tuple(map(str, keys))))
+    return os.path.join(get_cache_directory(), name + '.npz')
+
+
+def get_blendshape_topology_hash(blendshape):
+    '''
+    return the topology hash of the mesh deformed by the blendshape, None if
+    it doesn't deform a mesh.
+    '''
+    geometries = cmds.deformer(blendshape, query=True, geometry=True) or []
+    return get_topology_hash(geometries[0]) if geometries else None
+
+
+def get_deformation_signature(blendshape):
+    '''
+    return a sha1 hexdigest of the nodes upstream the blendshape input
+    geometry (name and type, in history order) and of the keys of their
+    animation curves. It changes if a deformer is added, removed or
+    reordered, or if the animation is edited.
+    '''
+    history = cmds.listHistory(blendshape + '.input[0].inputGeometry') or []
+    digest = hashlib.sha1()
+    for node in history:
+        digest.update('{}:{};'.format(node, cmds.nodeType(node)).encode(
+            'utf-8'))
+    # cmds.ls([]) would list the whole scene.
+    curves = cmds.ls(history, type='animCurve') if history else []
+    if curves:
+        # one query for all the curves.
+        for flag in ('timeChange', 'valueChange'):
+            keys = cmds.keyframe(curves, query=True, **{flag: True}) or []
+            digest.update(repr(keys).encode('utf-8'))
+    return digest.hexdigest()
+
+
+class IntermediatePointsCache(object):
+    '''
+    the intermediate points of a blendshape for a frame range. The points are
+    memory mapped, a frame is only read from the disk when it's requested.
+    '''
+    def __init__(self, filepath, start, end, step, array, signature):
+        self.filepath = filepath
+        self.start = start
+        self.end = end
+        self.step = step
+        self.array = array
+        self.signature = signature
+        # the frame indices served since the signature was checked.
+        self.checked = set()
+
+    def get_frame_index(self, frame):
+        index = (frame - self.start) / self.step
+        rounded = int(round(index))
+        if abs(index - rounded) > FRAME_TOLERANCE:
+            return None
+        if rounded < 0 or rounded >= len(self.array):
+            return None
+        return rounded
+
+    def get(self, frame):
+        '''
+        return the (n, 3) float64 points of the frame, None if the frame
+        isn't cached.
+        '''
+        index = self.get_frame_index(frame)
+        if index is None:
+            return None
+        return self.array[index].astype(numpy.float64)
+
+    @property
+    def vertex_count(self):
+        return self.array.shape[1]
+
+
+def cache_intermediate_points(blendshape, start, end, step=1.0, mesh=None):
+    '''
+    evaluate the geometry entering the blendshape for each frame of the range
+    and save it as memory mapped cache.
+    :blendshape string: the corrective blendshape
+    :start float: first frame
+    :end float: last frame (included)
+    :step float: frame step
+    :mesh string: the deformed mesh, only used to name the file
+    return the IntermediatePointsCache.
+    '''
+    if numpy is None:
+        raise RuntimeError('numpy is required by the frame range cache')
+    blendshape = str(blendshape)
+    plug = blendshape + '.input[0].inputGeometry'
+    count = int(round((end - start) / float(step))) + 1
+    frames = [start + i * step for i in range(count)]
+
+    signature = get_deformation_signature(blendshape)
+    first = get_plug_points_array(plug, frame=frames[0])
+    filepath = get_cache_filepath(blendshape, mesh)
+    array = numpy.lib.format.open_memmap(
+        filepath, mode='w+', dtype=numpy.float32,
+        shape=(count, len(first), 3))
+    array[0] = first
+    for i, frame in enumerate(frames[1:], 1):
+        array[i] = get_plug_points_array(plug, frame=frame)
+    array.flush()
+
+    with open(os.path.splitext(filepath)[0] + '.json', 'w') as f:
+        json.dump({
+            'blendshape': blendshape,
+            'mesh': mesh,
+            'start': start,
+            'end': end,
+            'step': step,
+            'vertices': len(first),
+            'topology': get_blendshape_topology_hash(blendshape),
+            'signature': signature}, f, indent=2)
+
+    # reopened as read only, the frames are paged on demand.
+    cache = IntermediatePointsCache(
+        filepath, start, end, step, numpy.load(filepath, mmap_mode='r'),
+        signature)
+    register_cache(blendshape, cache)
+    return cache
+
+
+def load_intermediate_points_cache(blendshape, mesh=None):
+    '''
+    load a cache saved by a previous session, return None if there's no
+    cache or if the topology or the deformation chain of the blendshape
+    changed since the cache was saved.
+    '''
+    if numpy is None:
+        return None
+    blendshape = str(blendshape)
+    filepath = get_cache_filepath(blendshape, mesh)
+    metadata_filepath = os.path.splitext(filepath)[0] + '.json'
+    if not os.path.exists(filepath) or not os.path.exists(metadata_filepath):
+        return None
+    with open(metadata_filepath, 'r') as f:
+        metadata = json.load(f)
+    # the caches saved without the topology or the signature aren't trusted.
+    if metadata.get('topology') != get_blendshape_topology_hash(blendshape):
+        return None
+    signature = get_deformation_signature(blendshape)
+    if metadata.get('signature') != signature:
+        return None
+    array = numpy.load(filepath, mmap_mode='r')
+    if array.shape[1] != metadata['vertices']:
+        return None
+    cache = IntermediatePointsCache(
+        filepath, metadata['start'], metadata['end'], metadata['step'], array,
+        signature)
+    register_cache(blendshape, cache)
+    return cache
+
+
+def register_cache(blendshape, cache):
+    '''
+    keep the cache in memory for the current scene. The callbacks clearing
+    the caches on a new scene or a scene opened are installed at the first
+    call.
+    '''
+    if not _callbacks:
+        for message in ('kBeforeNew', 'kBeforeOpen'):
+            _callbacks.append(
+                om2.MSceneMessage.addCallback(
+                    getattr(om2.MSceneMessage, message), _scene_changed))
+    _caches[(get_scene_name(), blendshape)] = cache
+
+
+def get_cached_intermediate_points(blendshape, frame):
+    '''
+    return the cached points of the blendshape at the frame or None if the
+    frame isn't cached. The first time a frame is served, the deformation
+    signature is checked, the cache is dropped if it changed.
+    '''
+    blendshape = str(blendshape)
+    key = (get_scene_name(), blendshape)
+    cache = _caches.get(key)
+    if cache is None:
+        return None
+    index = cache.get_frame_index(frame)
+    if index is None:
+        return None
+    if index not in cache.checked:
+        if get_deformation_signature(blendshape) != cache.signature:
+            cmds.warning(
+                'the deformation of {} changed, its frame range cache is '
+                'dropped'.format(blendshape))
+            del _caches[key]
+            return None
+        cache.checked.add(index)
+    return cache.get(frame)
+
+
+def clear_intermediate_points_caches(blendshape=None, delete_files=False):
+    '''
+    forget the caches of a blendshape (all of them if blendshape is None), the
+    files are deleted from the disk if delete_files is True.
+    '''
+    keys = [
+        key for key in _caches
+        if blendshape is None or key[1] == str(blendshape)]
+    for key in keys:
+        cache = _caches.pop(key)
+        if not delete_files:
+            continue
+        filepath = cache.filepath
+        cache.array = None
+        for path in (filepath, os.path.splitext(filepath)[0] + '.json'):
+            if os.path.exists(path):
+                os.remove(path)
+
+
+def _scene_changed(*_):
+    _caches.clear()
@@ -0,0 +1,345 @@
+'''
+This module contain the compression of the correctives of a mesh: the
+targets of all the corrective blendshapes are replaced by a few basis
+targets whose weights are animated to reproduce the animated deformation.
+The basis is the principal components of the deformation of each frame
+(the deltas of the targets mixed by their weights), computed through the
+small (targets, targets) gram matrix and a (frames, targets) svd, the
+vertices are never looped. The rank is the smallest one keeping every
+vertex of every frame of the range within the tolerance of the original
+deformation.
+The envelope, the base weights and the painted target weights of the
+correctives are folded in the deltas, the compressed deformation is the
+deformation really evaluated. The blendshapes with a driven envelope are
+skipped (reported). The deltas are kept sparse, the products are done by
+blocks of vertices built from the stored components.
+The new weight curves have a key per frame, the deformation outside of the
+frame range isn't preserved.
+    from silhouettepolisher import compression
+    report = compression.compress_corrective_blendshapes(
+        'body', tolerance=1e-3, apply=False)
+numpy is required.
+'''
+
+from collections import OrderedDict
+
+from maya import cmds
+
+from silhouettepolisher.animation import set_linear_keys, get_plug_values
+from silhouettepolisher.constants import (
+    COMPRESSION_TOLERANCE, SPARSE_TARGET_EPSILON, TARGET_ITEM_INDEX)
+from silhouettepolisher.core import (
+    add_sparse_corrective_target, get_corrective_blendshapes,
+    get_target_points, has_target_geometry, remove_target,
+    get_blendshape_scale, get_multi_values)
+from silhouettepolisher.points import numpy
+from silhouettepolisher.profiling import profiled, profile_stage
+from silhouettepolisher.sparse import CSRMatrix
+
+
+BASIS_TARGET_NAME = 'corrective_basis'
+# values of the dense (frames or targets, vertices) blocks, bound the memory.
+BLOCK_SIZE = 1 << 22
+# eigen values under this ratio of the largest one are numerical noise.
+RANK_EPSILON = 1e-12
+
+
+def get_compressible_targets(blendshape):
+    '''
+    return the target indices of the blendshape which can be compressed: the
+    targets without geometry connected nor in-between.
+    '''
+    targets = []
+    indices = cmds.getAttr(
+        blendshape + '.inputTarget[0].inputTargetGroup',
+        multiIndices=True) or []
+    for index in indices:
+        items = cmds.getAttr(
+            '{}.inputTarget[0].inputTargetGroup[{}].inputTargetItem'.format(
+                blendshape, index), multiIndices=True) or []
+        if list(items) != [TARGET_ITEM_INDEX]:
+            continue
+        if has_target_geometry(blendshape, index):
+            continue
+        targets.append(index)
+    return targets
+
+
+def get_folded_target_points(blendshape, index, scale, vertex_count):
+    '''
+    return the (indices, deltas) of a target multiplied by the blendshape
+    scale (see get_blendshape_scale) and by his painted target weights.
+    '''
+    indices, deltas = get_target_points(blendshape, index)
+    painted, values = get_multi_values(
+        '{}.inputTarget[0].inputTargetGroup[{}].targetWeights'.format(
+            blendshape, index))
+    if scale is None and not painted:
+        return indices, deltas
+    factors = numpy.ones(vertex_count) if scale is None else scale.copy()
+    factors[painted] *= values
+    return indices, deltas * factors[indices, None]
+
+
+def build_delta_matrix(targets_points):
+    '''
+    return the vertices touched by the targets and the sparse (vertices * 3,
+    targets) matrix of their deltas (the transposed delta matrix, the rows of
+    a block of vertices are contiguous).
+    :targets_points list: the (indices, deltas) of each target
+    '''
+    vertices = numpy.unique(numpy.concatenate(
+        [indices for indices, _ in targets_points]))
+    rows, columns, values = [], [], []
+    for column, (indices, deltas) in enumerate(targets_points):
+        positions = numpy.searchsorted(vertices, indices)
+        rows.append((positions[:, None] * 3 + numpy.arange(3)).ravel())
+        columns.append(numpy.full(len(positions) * 3, column))
+        values.append(numpy.asarray(deltas, dtype=numpy.float64).ravel())
+    rows, columns, values = (
+        numpy.concatenate(rows), numpy.concatenate(columns),
+        numpy.concatenate(values))
+    order = numpy.argsort(rows, kind='stable')
+    indptr = numpy.zeros(len(vertices) * 3 + 1, dtype=numpy.int64)
+    numpy.cumsum(
+        numpy.bincount(rows, minlength=len(vertices) * 3), out=indptr[1:])
+    return vertices, CSRMatrix(
+        indptr, columns[order], values[order],
+        (len(vertices) * 3, len(targets_points)))
+
+
+def iter_delta_blocks(matrix, height):
+    '''
+    yield the (start, end, block) dense (targets, end - start) blocks of the
+    delta matrix, the blocks of vertices fit in BLOCK_SIZE values with the
+    given number of rows (frames or targets) multiplied by them.
+    '''
+    size = max(BLOCK_SIZE // max(height, matrix.shape[1], 1) // 3, 1) * 3
+    for start in range(0, matrix.shape[0], size):
+        end = min(start + size, matrix.shape[0])
+        first, last = matrix.indptr[start], matrix.indptr[end]
+        rows = numpy.repeat(
+            numpy.arange(end - start),
+            numpy.diff(matrix.indptr[start:end + 1]))
+        block = numpy.zeros((matrix.shape[1], end - start))
+        block[matrix.indices[first:last], rows] = matrix.data[first:last]
+        yield start, end, block
+
+
+def compute_gram_matrix(matrix):
+    '''
+    return the (targets, targets) dot products of the targets deltas.
+    '''
+    gram = numpy.zeros((matrix.shape[1], matrix.shape[1]))
+    for _, _, block in iter_delta_blocks(matrix, matrix.shape[1]):
+        gram += block @ block.T
+    return gram
+
+
+def compute_animated_basis(gram, weights):
+    '''
+    return the principal components of the animated deformation weights @
+    matrix from the gram matrix (matrix @ matrix.T), sorted by importance,
+    as a tuple of arrays:
+    - coefficients (targets, rank): the basis targets are
+      coefficients.T @ matrix
+    - curves (frames, rank): the weights of the basis targets
+    The product curves[:, :k] @ (coefficients[:, :k].T @ matrix) is the best
+    rank k approximation of the animated deformation.
+    '''
+    # matrix = vectors @ diag(singular) @ components, from the gram matrix.
+    eigen_values, vectors = numpy.linalg.eigh(gram)
+    kept = eigen_values > eigen_values.max() * RANK_EPSILON
+    singular = numpy.sqrt(eigen_values[kept])
+    vectors = vectors[:, kept]
+    if not len(singular):
+        return vectors, numpy.zeros((len(weights), 0))
+    # the animated deformation in the components space.
+    animated = weights @ (vectors * singular)
+    _, _, rotation = numpy.linalg.svd(animated, full_matrices=False)
+    coefficients = (vectors / singular) @ rotation.T
+    return coefficients, animated @ rotation.T
+
+
+def compute_basis(matrix, coefficients):
+    '''
+    return the dense (rank, vertices * 3) basis targets coefficients.T @
+    matrix.
+    '''
+    basis = numpy.zeros((coefficients.shape[1], matrix.shape[0]))
+    for start, end, block in iter_delta_blocks(matrix, len(basis)):
+        basis[:, start:end] = coefficients.T @ block
+    return basis
+
+
+def compute_frame_errors(weights, matrix, curves=None, basis=None):
+    '''
+    return the largest vertex error of each frame between the targets
+    deformation (weights @ matrix) and the basis deformation (curves @
+    basis). Without basis, the weights are residual weights and the error is
+    the residual deformation.
+    '''
+    errors = numpy.zeros(len(weights))
+    for start, end, block in iter_delta_blocks(matrix, len(weights)):
+        chunk = weights @ block
+        if basis is not None:
+            chunk -= curves @ basis[:, start:end]
+        chunk = chunk.reshape(len(chunk), -1, 3)
+        errors = numpy.maximum(errors, numpy.sqrt(
+            numpy.einsum('ijk,ijk->ij', chunk, chunk).max(axis=1)))
+    return errors
+
+
+def find_rank(weights, matrix, coefficients, curves, tolerance):
+    '''
+    return the smallest rank keeping all the frames within the tolerance,
+    found by bisection.
+    '''
+    # the frames with the same weights have the same error.
+    weights, frames = numpy.unique(weights, axis=0, return_index=True)
+    curves = curves[frames]
+
+    def is_within_tolerance(rank):
+        # weights @ matrix - curves @ basis, the basis isn't built.
+        residual = weights - curves[:, :rank] @ coefficients[:, :rank].T
+        return compute_frame_errors(residual, matrix).max() <= tolerance
+
+    low, high = 0, coefficients.shape[1]
+    while low < high:
+        middle = (low + high) // 2
+        if is_within_tolerance(middle):
+            high = middle
+        else:
+            low = middle + 1
+    return high
+
+
+def get_frame_range(start=None, end=None):
+    if start is None:
+        start = cmds.playbackOptions(query=True, minTime=True)
+    if end is None:
+        end = cmds.playbackOptions(query=True, maxTime=True)
+    return [float(frame) for frame in range(int(start), int(end) + 1)]
+
+
+@profiled('compress_corrective_blendshapes')
+def compress_corrective_blendshapes(
+        mesh, tolerance=COMPRESSION_TOLERANCE, start=None, end=None,
+        apply=True, epsilon=SPARSE_TARGET_EPSILON):
+    '''
+    replace the targets of the corrective blendshapes of the mesh by basis
+    targets. The targets connected to a geometry or with in-betweens are kept
+    as they are. The envelope, the base weights and the target weights are
+    folded in the basis, it's created on the first corrective with a neutral
+    envelope and base weights. The blendshapes with a driven envelope are
+    skipped.
+    :tolerance float: the largest vertex error allowed on a frame
+    :start float: the first frame, the playback start by default
+    :end float: the last frame, the playback end by default
+    :apply bool: if False, the correctives aren't modified, only the report
+    is computed
+    :epsilon float: the basis target vertices moved less are not stored
+    return a report dict: the targets and the stored vertices before and
+    after (the vertices maya evaluates each frame), the error of the frames,
+    the skipped blendshapes and if the compression was applied. It isn't
+    applied if it doesn't save any vertex.
+    '''
+    report = OrderedDict((
+        ('mesh', str(mesh)),
+        ('frames', 0),
+        ('targets_before', 0),
+        ('targets_after', 0),
+        ('vertices_before', 0),
+        ('vertices_after', 0),
+        ('evaluation_saved', 0.0),
+        ('max_error', 0.0),
+        ('mean_error', 0.0),
+        ('skipped_blendshapes', []),
+        ('applied', False)))
+    if numpy is None:
+        cmds.warning('numpy is required to compress the correctives')
+        return report
+
+    frames = get_frame_range(start, end)
+    vertex_count = cmds.polyEvaluate(mesh, vertex=True)
+    targets, targets_points, weights = [], [], []
+    destination = None
+    with profile_stage('gather', mesh):
+        for blendshape in get_corrective_blendshapes(mesh):
+            if cmds.listConnections(
+                    blendshape + '.envelope', source=True, destination=False):
+                cmds.warning(
+                    '{} envelope is driven, it isn\'t compressed'.format(
+                        blendshape))
+                report['skipped_blendshapes'].append(blendshape)
+                continue
+            scale = get_blendshape_scale(blendshape, vertex_count)
+            if scale is None and destination is None:
+                destination = blendshape
+            for index in get_compressible_targets(blendshape):
+                targets.append((blendshape, index))
+                targets_points.append(get_folded_target_points(
+                    blendshape, index, scale, vertex_count))
+                weights.append(get_plug_values(
+                    '{}.weight[{}]'.format(blendshape, index), frames))
+    report['frames'] = len(frames)
+    report['targets_before'] = len(targets)
+    report['vertices_before'] = sum(
+        len(indices) for indices, _ in targets_points)
+    if not report['vertices_before']:
+        return report
+
+    with profile_stage('basis', mesh):
+        weights = numpy.array(weights, dtype=numpy.float64).T
+        vertices, matrix = build_delta_matrix(targets_points)
+        coefficients, curves = compute_animated_basis(
+            compute_gram_matrix(matrix), weights)
+        rank = find_rank(weights, matrix, coefficients, curves, tolerance)
+        curves = curves[:, :rank]
+        basis = compute_basis(matrix, coefficients[:, :rank]).reshape(
+            rank, -1, 3)
+        # the error is measured with the basis vertices really stored.
+        basis[numpy.einsum('ijk,ijk->ij', basis, basis) <= epsilon ** 2] = 0
+        errors = compute_frame_errors(
+            weights, matrix, curves, basis.reshape(rank, -1))
+
+    report['targets_after'] = rank
+    report['vertices_after'] = int(numpy.count_nonzero(
+        numpy.any(basis != 0, axis=2)))
+    report['evaluation_saved'] = (
+        1.0 - float(report['vertices_after']) / report['vertices_before'])
+    report['max_error'] = float(errors.max())
+    report['mean_error'] = float(errors.mean())
+    if not apply:
+        return report
+    if report['vertices_after'] >= report['vertices_before']:
+        cmds.warning(
+            'the compression of {} doesn\'t save any vertex, the correctives '
+            'are kept'.format(mesh))
+        return report
+    if destination is None:
+        cmds.warning(
+            '{} doesn\'t have a corrective with a neutral envelope and base '
+            'weights to receive the basis, the correctives are kept'.format(
+                mesh))
+        return report
+
+    cmds.undoInfo(openChunk=True, chunkName='compress_corrective_blendshapes')
+    try:
+        for i in range(rank):
+            moved = numpy.flatnonzero(numpy.any(basis[i] != 0, axis=1))
+            weight_plug = add_sparse_corrective_target(
+                mesh, '{}{}'.format(BASIS_TARGET_NAME, i), vertices[moved],
+                basis[i, moved], destination)
+            set_linear_keys(weight_plug, dict(zip(frames, curves[:, i])))
+        for blendshape, index in targets:
+            remove_target(blendshape, index)
+        for blendshape in get_corrective_blendshapes(mesh):
+            if blendshape != destination and not cmds.getAttr(
+                    blendshape + '.inputTarget[0].inputTargetGroup',
+                    multiIndices=True):
+                cmds.delete(blendshape)
+    finally:
+        cmds.undoInfo(closeChunk=True)
+    report['applied'] = True
+    return report
@@ -0,0 +1,43 @@
+'''
+This module contain the node names, attribute names and default values
+shared by the silhouettepolisher modules.
+'''
+
+CORRECTIVE_BLENDSHAPE_NAME = 'corrective_blendshape'
+CORRECTIVE_BLENDSHAPE_ATTR = 'is_corrective_blendshape'
+
+WORKING_MESH_ATTR = 'is_working_copy_mesh'
+DISPLAY_MESH_ATTR = 'is_display_copy_mesh'
+TARGET_MESH_ATTR = 'is_a_target_edit'
+BLENDSHAPE_EDIT_ATTR = 'is_blendshape_edit'
+WORKING_COPY_FRAME_ATTR = 'working_copy_frame'
+FROZEN_HISTORY_ATTR = 'frozen_history_states'
+PROXY_MAPPING_ATTR = 'proxy_mapping_file'
+PROXY_PERCENTAGE_ATTR = 'proxy_reduction_percentage'
+EDIT_TARGET_START_ATTR = 'edit_target_start_points'
+
+WORKING_MESH_SHADER = 'TMP_WORKING_COPY_BLINN'
+WORKING_MESH_SG = 'TMP_WORKING_COPY_BLINNSG'
+DISPLAY_MESH_SHADER = 'TMP_DISPLAY_COPY_LAMBERT'
+DISPLAY_MESH_SG = 'TMP_DISPLAY_COPY_LAMBERTSG'
+
+TARGET_ITEM_INDEX = 6000
+SPARSE_TARGET_EPSILON = 1e-4
+PRUNE_DELTA_THRESHOLD = 1e-3
+INTERMEDIATE_POINTS_CACHE_SIZE = 8
+# thread pool size of the multi meshes apply, None = cpu count.
+APPLY_WORKERS = None
+PROFILING_BUFFER_SIZE = 1000
+# percentage of the vertices removed to build a proxy working copy.
+PROXY_REDUCTION_PERCENTAGE = 90
+# proxy vertices interpolated for each full resolution vertex.
+PROXY_NEIGHBOURS = 4
+# source vertices interpolated for each vertex of a transfer destination.
+TRANSFER_NEIGHBOURS = 4
+# distance tolerated between a reflected vertex and his symmetric vertex.
+SYMMETRY_TOLERANCE = 1e-2
+# laplacian iterations and step of the working copies delta smoothing.
+SMOOTH_ITERATIONS = 4
+SMOOTH_STRENGTH = 0.5
+# largest vertex error allowed by the compression of the correctives.
+COMPRESSION_TOLERANCE = 1e-3
@@ -0,0 +1,1919 @@
+'''
+This module contain the blendshape corrective operations implemented with
+maya.cmds and OpenMaya 2. The points are moved in batch through points.py
+(maya.OpenMaya 1 raw buffers, imported by the functions using them) and the
+sculpt tool is opened with maya.mel. It doesn't import pymel, it can be used
+in batch or farm scripts (mayapy) and in the tight loops.
+The nodes are given and returned as names. The functions accept any object
+converted to the node name by str() (e.g. PyNodes), see blendshape.py for the
+historical pymel flavour.
+'''
+
+import json
+from collections import OrderedDict
+from functools import wraps
+
+import maya.api.OpenMaya as om2
+from maya import cmds, mel
+
+from silhouettepolisher.animation import (
+    set_linear_keys, get_key_values, get_plug)
+from silhouettepolisher.constants import (
+    CORRECTIVE_BLENDSHAPE_NAME, CORRECTIVE_BLENDSHAPE_ATTR, WORKING_MESH_ATTR,
+    DISPLAY_MESH_ATTR, TARGET_MESH_ATTR, BLENDSHAPE_EDIT_ATTR,
+    WORKING_COPY_FRAME_ATTR, FROZEN_HISTORY_ATTR, PROXY_MAPPING_ATTR,
+    PROXY_PERCENTAGE_ATTR, EDIT_TARGET_START_ATTR, WORKING_MESH_SHADER,
+    WORKING_MESH_SG, DISPLAY_MESH_SHADER, DISPLAY_MESH_SG,
+    TARGET_ITEM_INDEX, SPARSE_TARGET_EPSILON, PRUNE_DELTA_THRESHOLD,
+    INTERMEDIATE_POINTS_CACHE_SIZE, APPLY_WORKERS, PROXY_REDUCTION_PERCENTAGE)
+from silhouettepolisher.profiling import profiled, profile_stage
+from silhouettepolisher.sceneindex import get_scene_index
+from silhouettepolisher.selection import (
+    resolved_selection, ls_filter, shapes_to_transforms,
+    transforms_with_children_types, contains_at_least, contains_exactly)
+
+
+# the callbacks installed before a module reload are removed.
+if globals().get('_intermediate_points_callbacks'):
+    om2.MMessage.removeCallbacks(_intermediate_points_callbacks)
+# cache of the blendshapes input geometry points:
+# {(blendshape, frame, generation): points}
+_intermediate_points_cache = OrderedDict()
+# generation of the blendshapes input geometry, increased each time the input
+# geometry is dirtied: {blendshape: int}
+_intermediate_points_generations = {}
+# callbacks invalidating the intermediate points cache.
+_intermediate_points_callbacks = []
+# animation templates collected by batch_animation_templates, None if no batch
+# is running.
+_pending_animation_templates = None
+
+
+def batch_animation_templates(func):
+    '''
+    this decorator collect the animation templates applied during the
+    decorated function and write all of them at the end in one batch.
+    '''
+    @wraps(func)
+    def wrapper(*args, **kwargs):
+        global _pending_animation_templates
+        if _pending_animation_templates is not None:
+            # already batched by a parent call.
+            return func(*args, **kwargs)
+        _pending_animation_templates = []
+        try:
+            result = func(*args, **kwargs)
+            templates = _pending_animation_templates
+        finally:
+            _pending_animation_templates = None
+        apply_animation_templates(templates)
+        return result
+    return wrapper
+
+
+@resolved_selection(
+    ls_filter(type=('mesh', 'transform'), objectsOnly=True),
+    shapes_to_transforms,
+    transforms_with_children_types('mesh'),
+    contains_at_least(1, 'transform'))
+def create_working_copy_on_selection(nodes):
+    meshes = [
+        transform for transform in nodes
+        if not mesh_has_working_copy(transform) and
+        not has_attr(transform, WORKING_MESH_ATTR) and
+        not has_attr(transform, DISPLAY_MESH_ATTR)]
+    if meshes:
+        setup_working_copies(meshes)
+    mel.eval('SculptGeometryToolOptions')
+
+
+@profiled('setup_working_copy')
+def setup_working_copy(
+        mesh, working_copy=None, display_copy=None, display=None,
+        freeze_history=True):
+    """
+    this function setup the working editing environment.
+    the working copy and the display copy are temporary meshes used
+    to make and previzualize the mesh edit.
+    if working_copy and display_copy are let as None, the function will duplicate
+    the specified one.
+
+    the original mesh is hidden during the procedure (lodVisibility)
+    the working copy, is a mesh for create the deformation.
+    the display copy, is a copy (hidden by default), to compare the working
+    copy to the original mesh. It's only created when it's visible, see
+    setup_working_copies.
+
+    a red shader is assigned to the working copy
+    a blue shader is assigned to the display copy
+
+    if freeze_history is True, the deformers of the original mesh are frozen
+    until the working copy is applied or deleted (see
+    freeze_deformation_history).
+
+    the working copy is renamed, the function return the tuple
+    (working_copy, display_copy) with the final names (display_copy is None if
+    it's not created yet).
+    """
+    working_copy, display_copy = setup_working_copies(
+        [mesh],
+        [working_copy] if working_copy else None,
+        [display_copy] if display_copy else None,
+        display=display, freeze_history=freeze_history)[0]
+    cmds.select(working_copy)
+    return working_copy, display_copy
+
+
+@profiled('setup_working_copies')
+def setup_working_copies(
+        meshes, working_copies=None, display_copies=None, display=None,
+        freeze_history=True):
+    """
+    batch version of setup_working_copy, return the list of tuples
+    (working_copy, display_copy) in the meshes order.
+    All the copies are duplicated with one command, the attributes are added
+    in bulk and each shader is assigned with one set membership edit. The
+    whole setup is one undo chunk.
+    The display copies are created if display is True or if display_copies
+    are given. If display is None, they are only created if the working
+    copies are already transparent, else they are created later by
+    ensure_display_copies when the before/after slider is moved.
+    If freeze_history is True, the deformation history of the meshes is
+    frozen while the working copies exist.
+    """
+    original_meshes = [str(mesh) for mesh in meshes]
+    if display is None:
+        display = bool(display_copies) or get_working_copys_transparency() > 0
+
+    cmds.undoInfo(openChunk=True, chunkName='setup_working_copies')
+    try:
+        working_copies = _setup_working_copies(original_meshes, working_copies)
+        if display:
+            display_copies = _setup_display_copies(
+                original_meshes, display_copies)
+        else:
+            display_copies = [None] * len(working_copies)
+        if freeze_history:
+            with profile_stage('freeze history'):
+                for original_mesh, working_copy in zip(
+                        original_meshes, working_copies):
+                    freeze_deformation_history(original_mesh, working_copy)
+        return list(zip(working_copies, display_copies))
+    finally:
+        cmds.undoInfo(closeChunk=True)
+
+
+def ensure_display_copies(meshes=None):
+    """
+    create the missing display copies of the meshes with a working copy (all
+    the working copies of the scene if meshes is None).
+    The display copy is duplicated from the original mesh at the frame the
+    working copy was created.
+    """
+    scene_index = get_scene_index()
+    if meshes is None:
+        meshes = scene_index.get_meshes_with_working_copy()
+    meshes_per_frame = {}
+    for mesh in meshes:
+        mesh = str(mesh)
+        working_copy = scene_index.get_working_copy(mesh)
+        if not working_copy or scene_index.get_display_copy(mesh):
+            continue
+        frame = cmds.getAttr(working_copy + '.' + WORKING_COPY_FRAME_ATTR)
+        meshes_per_frame.setdefault(frame, []).append(mesh)
+    if not meshes_per_frame:
+        return
+
+    current_time = get_current_time()
+    cmds.undoInfo(openChunk=True, chunkName='ensure_display_copies')
+    try:
+        for frame, original_meshes in sorted(meshes_per_frame.items()):
+            if frame != current_time:
+                cmds.currentTime(frame, update=True)
+            _setup_display_copies(original_meshes)
+        if get_current_time() != current_time:
+            cmds.currentTime(current_time, update=True)
+    finally:
+        cmds.undoInfo(closeChunk=True)
+
+
+@resolved_selection(
+    ls_filter(type=('mesh', 'transform'), objectsOnly=True),
+    shapes_to_transforms,
+    transforms_with_children_types('mesh'),
+    contains_at_least(1, 'transform'))
+def create_proxy_working_copy_on_selection(
+        nodes, percentage=PROXY_REDUCTION_PERCENTAGE):
+    meshes = [
+        transform for transform in nodes
+        if not mesh_has_working_copy(transform) and
+        not has_attr(transform, WORKING_MESH_ATTR) and
+        not has_attr(transform, DISPLAY_MESH_ATTR)]
+    for mesh in meshes:
+        setup_proxy_working_copy(mesh, percentage)
+    if meshes:
+        cmds.select(get_scene_index().get_working_copy(meshes[0]))
+    mel.eval('SculptGeometryToolOptions')
+
+
+@profiled('setup_proxy_working_copy')
+def setup_proxy_working_copy(
+        mesh, percentage=PROXY_REDUCTION_PERCENTAGE, freeze_history=True):
+    """
+    setup a working copy reduced to a percentage of the vertices of the mesh
+    (polyReduce keeping the original vertices). The proxy is sculpted
+    instead of the full resolution mesh, the full resolution is only touched
+    when the proxy is applied: the proxy deltas are interpolated to all the
+    vertices through the proxy mapping (see proxy.py) and written as sparse
+    target.
+    The proxy is reduced from the rest shape, the mapping is cached on the
+    disk and reused for the same topology and percentage. The display copy
+    is a copy of the proxy, it's always created (it's the reference of the
+    deltas). numpy is required.
+    :percentage float: the percentage of vertices removed
+    return the tuple (working_copy, display_copy).
+    """
+    from silhouettepolisher.points import (
+        numpy, get_points_array, set_points_array)
+    from silhouettepolisher.proxy import get_rest_points, get_proxy_mapping
+    if numpy is None:
+        raise RuntimeError('numpy is required by the proxy working copies')
+    mesh = str(mesh)
+    cmds.undoInfo(openChunk=True, chunkName='setup_proxy_working_copy')
+    try:
+        with profile_stage('reduce', mesh):
+            rest_points = get_rest_points(mesh)
+            proxy = _reduce_mesh(mesh, rest_points, percentage)
+        with profile_stage('mapping'):
+            mapping = get_proxy_mapping(
+                mesh, proxy, rest_points, percentage)
+        # the proxy is posed with the current points of his vertices.
+        set_points_array(
+            proxy, get_points_array(mesh)[mapping.proxy_vertices])
+        display_copy = cmds.duplicate(proxy)[0]
+        cmds.addAttr(proxy, dataType='string', longName=PROXY_MAPPING_ATTR)
+        cmds.setAttr(
+            proxy + '.' + PROXY_MAPPING_ATTR, mapping.filepath, type='string')
+        cmds.addAttr(
+            proxy, attributeType='double', longName=PROXY_PERCENTAGE_ATTR)
+        cmds.setAttr(proxy + '.' + PROXY_PERCENTAGE_ATTR, percentage)
+        working_copy, display_copy = setup_working_copies(
+            [mesh], [proxy], [display_copy], display=True,
+            freeze_history=freeze_history)[0]
+    finally:
+        cmds.undoInfo(closeChunk=True)
+    cmds.select(working_copy)
+    return working_copy, display_copy
+
+
+def _reduce_mesh(mesh, rest_points, percentage):
+    '''
+    return a copy of the mesh at rest reduced to the proxy topology.
+    '''
+    from silhouettepolisher.points import set_points_array
+    proxy = _duplicate_meshes([mesh])[0]
+    set_points_array(proxy, rest_points)
+    cmds.polyReduce(
+        proxy, percentage=percentage, keepOriginalVertices=True,
+        replaceOriginal=True)
+    cmds.delete(proxy, constructionHistory=True)
+    return proxy
+
+
+def rebuild_proxy_mapping(working_copy):
+    '''
+    rebuild the mapping of a proxy working copy when its cache file is
+    missing (e.g. the temp directory was cleared or the scene is opened on
+    another machine). A proxy is reduced again from the rest shape with the
+    percentage stored on the working copy and deleted once mapped, its
+    topology must match the working copy.
+    '''
+    from silhouettepolisher.proxy import get_rest_points, get_proxy_mapping
+    from silhouettepolisher.topology import get_topology_hash
+    working_copy = str(working_copy)
+    original_mesh = get_connected(working_copy + '.' + WORKING_MESH_ATTR)[0]
+    percentage = PROXY_REDUCTION_PERCENTAGE
+    if has_attr(working_copy, PROXY_PERCENTAGE_ATTR):
+        percentage = cmds.getAttr(working_copy + '.' + PROXY_PERCENTAGE_ATTR)
+    with profile_stage('reduce', original_mesh):
+        rest_points = get_rest_points(original_mesh)
+        proxy = _reduce_mesh(original_mesh, rest_points, percentage)
+    try:
+        with profile_stage('mapping'):
+            mapping = get_proxy_mapping(
+                original_mesh, proxy, rest_points, percentage)
+    finally:
+        cmds.delete(proxy)
+    if mapping.proxy_topology != get_topology_hash(working_copy):
+        raise RuntimeError(
+            "the proxy mapping of {} can't be rebuilt, the topology "
+            "changed".format(working_copy))
+    cmds.setAttr(
+        working_copy + '.' + PROXY_MAPPING_ATTR, mapping.filepath,
+        type='string')
+    return mapping
+
+
+def compute_proxy_working_copy_deltas(
+        working_copy, epsilon=SPARSE_TARGET_EPSILON):
+    '''
+    return the sparse (indices, deltas) of the full resolution mesh
+    interpolated from the proxy working copy deltas (proxy - display copy).
+    '''
+    from silhouettepolisher.points import numpy, get_points_array
+    from silhouettepolisher.proxy import load_proxy_mapping
+    working_copy = str(working_copy)
+    filepath = cmds.getAttr(working_copy + '.' + PROXY_MAPPING_ATTR)
+    mapping = load_proxy_mapping(filepath)
+    if mapping is None:
+        mapping = rebuild_proxy_mapping(working_copy)
+    original_mesh = get_connected(working_copy + '.' + WORKING_MESH_ATTR)[0]
+    display_copy = get_scene_index().get_display_copy(original_mesh)
+    with profile_stage('proxy deltas', original_mesh):
+        deltas = mapping.compute_deltas(
+            get_points_array(working_copy) - get_points_array(display_copy))
+        indices = numpy.flatnonzero(
+            numpy.einsum('ij,ij->i', deltas, deltas) > epsilon * epsilon)
+    return indices, deltas[indices]
+
+
+def resolve_proxy_working_copy(
+        working_copy, sparse, epsilon=SPARSE_TARGET_EPSILON,
+        precomputed=None):
+    '''
+    return the (sparse, precomputed) arguments to apply a working copy. A
+    proxy working copy is always applied sparse with his interpolated
+    deltas, the other working copies keep the given arguments.
+    '''
+    if not has_attr(working_copy, PROXY_MAPPING_ATTR):
+        return sparse, precomputed
+    if precomputed is None:
+        precomputed = compute_proxy_working_copy_deltas(
+            working_copy, epsilon)
+    return True, precomputed
+
+
+def _duplicate_meshes(original_meshes, copies=None):
+    '''
+    duplicate the meshes with one command (if the copies aren't given) and
+    delete the intermediate shapes of the copies.
+    '''
+    if copies:
+        copies = [str(copy) for copy in copies]
+    else:
+        mesh = original_meshes[0] if len(original_meshes) == 1 else None
+        with profile_stage('duplicate', mesh):
+            copies = cmds.duplicate(original_meshes, returnRootsOnly=True)
+
+    # clean intermediate duplicated shapes
+    with profile_stage('clean intermediates'):
+        shapes = cmds.listRelatives(
+            copies, shapes=True, fullPath=True) or []
+        intermediates = [
+            shape for shape in shapes
+            if cmds.getAttr(shape + '.intermediateObject')]
+        if intermediates:
+            cmds.delete(intermediates)
+    return copies
+
+
+def _setup_working_copies(original_meshes, working_copies=None):
+    working_copies = _duplicate_meshes(original_meshes, working_copies)
+
+    with profile_stage('connect'):
+        for original_mesh in original_meshes:
+            cmds.setAttr(original_mesh + '.lodVisibility', False)
+        current_time = get_current_time()
+        suffix = '_f' + str(current_time)
+        working_copies = [
+            cmds.rename(working_copy, short_name(working_copy) + suffix)
+            for working_copy in working_copies]
+
+        # create and link attibutes to connect working meshes to original mesh.
+        cmds.addAttr(
+            working_copies,
+            attributeType='message',
+            longName=WORKING_MESH_ATTR,
+            niceName=WORKING_MESH_ATTR.replace('_', ' '))
+        # the frame is used to create the display copy later.
+        cmds.addAttr(
+            working_copies,
+            attributeType='double',
+            longName=WORKING_COPY_FRAME_ATTR,
+            defaultValue=current_time)
+        for original_mesh, working_copy in zip(
+                original_meshes, working_copies):
+            cmds.setAttr(
+                working_copy + '.' + WORKING_COPY_FRAME_ATTR, current_time)
+            cmds.connectAttr(
+                original_mesh + '.message',
+                working_copy + '.' + WORKING_MESH_ATTR)
+
+    with profile_stage('shaders'):
+        ensure_shading_group(WORKING_MESH_SHADER, WORKING_MESH_SG, 'blinn')
+        cmds.setAttr(
+            WORKING_MESH_SHADER + '.color', 1, .25, .33, type='double3')
+        if not cmds.objExists(DISPLAY_MESH_SHADER):
+            cmds.setAttr(
+                WORKING_MESH_SHADER + '.transparency', 0, 0, 0,
+                type='double3')
+        cmds.sets(working_copies, edit=True, forceElement=WORKING_MESH_SG)
+
+    return working_copies
+
+
+def _setup_display_copies(original_meshes, display_copies=None):
+    display_copies = _duplicate_meshes(original_meshes, display_copies)
+
+    with profile_stage('connect'):
+        for display_copy in display_copies:
+            # the original may be already hidden by his working copy.
+            cmds.setAttr(display_copy + '.lodVisibility', True)
+        for shape in cmds.listRelatives(
+                display_copies, shapes=True, fullPath=True) or []:
+            ensure_node_disconnected(shape)
+            cmds.setAttr(shape + '.overrideEnabled', True)
+            cmds.setAttr(shape + '.overrideDisplayType', 2)
+
+        cmds.addAttr(
+            display_copies,
+            attributeType='message',
+            longName=DISPLAY_MESH_ATTR,
+            niceName=DISPLAY_MESH_ATTR.replace('_', ' '))
+        for original_mesh, display_copy in zip(
+                original_meshes, display_copies):
+            cmds.connectAttr(
+                original_mesh + '.message',
+                display_copy + '.' + DISPLAY_MESH_ATTR)
+
+    with profile_stage('shaders'):
+        new_shader = not cmds.objExists(DISPLAY_MESH_SHADER)
+        ensure_shading_group(DISPLAY_MESH_SHADER, DISPLAY_MESH_SG, 'lambert')
+        if new_shader:
+            transparency = 1 - get_working_copys_transparency()
+            cmds.setAttr(
+                DISPLAY_MESH_SHADER + '.color', 0, .25, 1, type='double3')
+            cmds.setAttr(
+                DISPLAY_MESH_SHADER + '.transparency', transparency,
+                transparency, transparency, type='double3')
+        cmds.sets(display_copies, edit=True, forceElement=DISPLAY_MESH_SG)
+
+    return display_copies
+
+
+def freeze_deformation_history(mesh, working_copy):
+    '''
+    freeze the deformers in the history of the mesh, they keep their last
+    output and aren't evaluated anymore when the time change. The original
+    frozen states are stored as json on the working copy to be restored by
+    restore_deformation_history.
+    Only the deformers are frozen, the rig itself can be shared with other
+    meshes still visible. The deformers deforming other geometries are
+    skipped, they would freeze them too. A deformer already frozen by an
+    other working copy is stored with its original state, it's only restored
+    by the last working copy holding it.
+    '''
+    shape = get_mesh_shape(mesh)
+    deformers = cmds.ls(
+        cmds.listHistory(shape, pruneDagObjects=True) or [],
+        type='geometryFilter') or []
+    shapes = set(cmds.ls(shape, long=True))
+    deformers = [
+        deformer for deformer in deformers
+        if set(cmds.ls(cmds.deformer(
+            deformer, query=True, geometry=True) or [], long=True)) <= shapes]
+    frozen = [
+        deformer for deformer in deformers
+        if cmds.getAttr(deformer + '.frozen')]
+    references = (
+        get_frozen_deformers_references(frozen, working_copy)
+        if frozen else {})
+    states = {}
+    for deformer in deformers:
+        if deformer in references:
+            states[deformer] = references[deformer][0]
+            continue
+        if deformer in frozen:
+            continue
+        states[deformer] = False
+        cmds.setAttr(deformer + '.frozen', True)
+
+    if not has_attr(working_copy, FROZEN_HISTORY_ATTR):
+        cmds.addAttr(
+            working_copy, dataType='string', longName=FROZEN_HISTORY_ATTR)
+    cmds.setAttr(
+        working_copy + '.' + FROZEN_HISTORY_ATTR, json.dumps(states),
+        type='string')
+
+
+def restore_deformation_history(working_copy):
+    '''
+    set back the frozen states stored on the working copy by
+    freeze_deformation_history. The deformers still held by an other
+    working copy stay frozen. The stored states are cleared, this can be
+    called several times.
+    '''
+    plug = working_copy + '.' + FROZEN_HISTORY_ATTR
+    if not has_attr(working_copy, FROZEN_HISTORY_ATTR):
+        return
+    states = json.loads(cmds.getAttr(plug) or '{}')
+    deformers = [deformer for deformer in states if cmds.objExists(deformer)]
+    references = (
+        get_frozen_deformers_references(deformers, working_copy)
+        if deformers else {})
+    for deformer in deformers:
+        if deformer not in references:
+            cmds.setAttr(deformer + '.frozen', states[deformer])
+    cmds.setAttr(plug, '{}', type='string')
+
+
+def get_frozen_deformers_references(deformers, working_copy):
+    '''
+    return the deformers held frozen by the working copies other than the
+    given one as a dict {deformer: (original state, reference count)}.
+    Only the working copies of the meshes downstream of the deformers are
+    read.
+    '''
+    shapes = cmds.ls(
+        cmds.listHistory(deformers, future=True) or [], type='mesh',
+        long=True)
+    transforms = set(
+        cmds.listRelatives(shapes, parent=True, fullPath=True) or [])
+    scene_index = get_scene_index()
+    working_copy = cmds.ls(working_copy, long=True)[0]
+    references = {}
+    for transform in transforms:
+        other = scene_index.get_working_copy(transform)
+        if not other or not has_attr(other, FROZEN_HISTORY_ATTR):
+            continue
+        if cmds.ls(other, long=True)[0] == working_copy:
+            continue
+        states = json.loads(
+            cmds.getAttr(other + '.' + FROZEN_HISTORY_ATTR) or '{}')
+        for deformer in deformers:
+            if deformer not in states:
+                continue
+            state, count = references.get(deformer, (states[deformer], 0))
+            references[deformer] = (state, count + 1)
+    return references
+
+
+def ensure_shading_group(shader, shading_group, shader_type):
+    '''
+    create the shader and his shading group if they don't exist. The names
+    follow the hyperShade convention (shading group = shader + "SG").
+    '''
+    if not cmds.objExists(shader):
+        cmds.shadingNode(shader_type, asShader=True, name=shader)
+    if not cmds.objExists(shading_group):
+        cmds.sets(
+            renderable=True, noSurfaceShader=True, empty=True,
+            name=shading_group)
+        cmds.connectAttr(
+            shader + '.outColor', shading_group + '.surfaceShader')
+
+
+def setup_edit_target_working_copy(mesh, blendshape, target_index):
+    '''
+    this function setup the working editing environment to edit an target.
+    To get a working copy of the mesh, it force the blendshape envelope to 1
+    and the selected target to 1. To generate the display copy it set the
+    target value to 0.0.
+
+    When the working setup is done, the envelope and target's original values
+    are set back.
+
+    on the working mesh an attribute "is_a_target_edit" and the edited index
+    is stored as value. The blendshape message is connected to the
+    working copy message. This is useful for the applying procedure. To notify
+    that's an target edit instead of a target creation, an know which
+    blendshape target is modified.
+    '''
+    from silhouettepolisher.points import (
+        numpy, get_points_array, set_point_array_plug)
+    original_mesh = str(mesh)
+    blendshape = str(blendshape)
+    original_target_value = cmds.getAttr(
+        '{}.weight[{}]'.format(blendshape, target_index))
+    original_envelope_value = cmds.getAttr(blendshape + '.envelope')
+
+    cmds.setAttr(blendshape + '.envelope', 1.0)
+
+    cmds.blendShape(blendshape, edit=True, weight=(target_index, 1.0))
+    working_copy = cmds.duplicate(original_mesh)[0]
+
+    cmds.blendShape(blendshape, edit=True, weight=(target_index, 0.0))
+    display_copy = cmds.duplicate(original_mesh)[0]
+
+    working_copy, display_copy = setup_working_copy(
+        original_mesh, working_copy, display_copy, display=True)
+
+    cmds.addAttr(
+        working_copy,
+        attributeType='byte',
+        longName=TARGET_MESH_ATTR,
+        niceName=TARGET_MESH_ATTR.replace('_', ' '))
+
+    cmds.addAttr(
+        working_copy,
+        attributeType='message',
+        longName=BLENDSHAPE_EDIT_ATTR,
+        niceName=BLENDSHAPE_EDIT_ATTR.replace('_', ' '))
+
+    cmds.setAttr(working_copy + '.' + TARGET_MESH_ATTR, target_index)
+    cmds.connectAttr(
+        blendshape + '.message', working_copy + '.' + BLENDSHAPE_EDIT_ATTR)
+
+    cmds.setAttr(blendshape + '.envelope', original_envelope_value)
+    cmds.blendShape(
+        blendshape, edit=True, weight=(target_index, original_target_value))
+
+    if numpy is not None:
+        # starting point of the incremental edit, stored on the working copy
+        # to survive a save or a reload, see apply_incremental_target_edit.
+        cmds.addAttr(
+            working_copy, dataType='pointArray',
+            longName=EDIT_TARGET_START_ATTR)
+        set_point_array_plug(
+            working_copy + '.' + EDIT_TARGET_START_ATTR,
+            get_points_array(working_copy))
+
+
+@resolved_selection(
+    ls_filter(type=('mesh', 'transform'), objectsOnly=True),
+    shapes_to_transforms,
+    transforms_with_children_types('mesh'),
+    contains_at_least(1, 'transform'))
+def delete_selected_working_copys(nodes):
+    for mesh_transform in nodes:
+        if not has_attr(mesh_transform, WORKING_MESH_ATTR):
+            continue
+        mesh = get_connected(mesh_transform + '.' + WORKING_MESH_ATTR)[0]
+        delete_working_copy_on_mesh(mesh)
+
+
+@profiled('delete_working_copy_on_mesh')
+def delete_working_copy_on_mesh(mesh):
+    '''
+    This function let the user cancel his work and delete current working copy
+    '''
+    original_mesh = str(mesh)
+    working_meshes = get_working_meshes(original_mesh)
+
+    working_copy = get_scene_index().get_working_copy(original_mesh)
+    if working_copy:
+        restore_deformation_history(working_copy)
+    cmds.setAttr(original_mesh + '.lodVisibility', True)
+    with profile_stage('delete'):
+        if working_meshes:
+            cmds.delete(working_meshes)
+
+    # clean shaders
+    with profile_stage('clean shaders'):
+        shaders = (
+            (WORKING_MESH_SG, WORKING_MESH_SHADER),
+            (DISPLAY_MESH_SG, DISPLAY_MESH_SHADER))
+        for shading_group, shader in shaders:
+            if not cmds.objExists(shading_group):
+                continue
+            if not cmds.listConnections(shading_group + '.dagSetMembers'):
+                cmds.delete(shading_group, shader)
+
+
+def get_working_copys_transparency():
+    """
+    this function's querying the working shaders transparency
+    """
+    if not cmds.objExists(WORKING_MESH_SHADER):
+        return 0.0
+    return cmds.getAttr(WORKING_MESH_SHADER + '.transparency')[0][0]
+
+
+def set_working_copys_transparency(value):
+    """
+    this function's tweaking the working shaders to let user
+    compare working mesh and original mesh.
+    the display copies are created the first time the working copies become
+    transparent.
+    """
+    if not cmds.objExists(WORKING_MESH_SHADER):
+        return cmds.warning('working mesh shader not found')
+
+    cmds.setAttr(
+        WORKING_MESH_SHADER + '.transparency', value, value, value,
+        type='double3')
+    if value > 0:
+        ensure_display_copies()
+    if not cmds.objExists(DISPLAY_MESH_SHADER):
+        return
+    cmds.setAttr(
+        DISPLAY_MESH_SHADER + '.transparency', 1 - value, 1 - value,
+        1 - value, type='double3')
+
+
+def get_corrective_blendshapes(mesh):
+    """
+    this function return a list off all corrective blendshapes
+    present in the history. The result comes from the scene index, see
+    sceneindex.py.
+    """
+    return get_scene_index().get_corrective_blendshapes(str(mesh))
+
+
+@resolved_selection(
+    ls_filter(type=('mesh', 'transform'), objectsOnly=True),
+    shapes_to_transforms,
+    transforms_with_children_types('mesh'),
+    contains_at_least(1, 'transform'))
+@batch_animation_templates
+def create_blendshape_corrective_for_selected_working_copys(
+        nodes, values=None, sparse=False, epsilon=SPARSE_TARGET_EPSILON):
+    result = []
+    working_copies = [
+        working_copy for working_copy in nodes
+        if has_attr(working_copy, WORKING_MESH_ATTR)]
+    precomputed = precompute_working_copies(
+        working_copies, sparse=sparse, epsilon=epsilon, new_blendshape=True)
+    for working_copy, data in zip(working_copies, precomputed):
+        original_mesh = get_connected(
+            working_copy + '.' + WORKING_MESH_ATTR)[0]
+        restore_deformation_history(working_copy)
+        working_copy_sparse, data = resolve_proxy_working_copy(
+            working_copy, sparse, epsilon, data)
+        create_blendshape_corrective_on_mesh(
+            base=original_mesh, target=working_copy, values=values,
+            sparse=working_copy_sparse, epsilon=epsilon, precomputed=data)
+        delete_working_copy_on_mesh(original_mesh)
+        result.append(original_mesh)
+    if result:
+        cmds.select(result)
+
+
+def create_blendshape_corrective_on_mesh(
+        base, target, values=None, sparse=False,
+        epsilon=SPARSE_TARGET_EPSILON, precomputed=None):
+    """
+    this function's creating a new corrective blendshape on a mesh and add the
+    first target.
+    in sparse mode, the blendshape is created empty and only the vertices moved
+    more than epsilon are written in the target.
+    precomputed is the result of compute_working_copy_deltas, see
+    precompute_working_copies.
+    return the blendshape created.
+    """
+    base = str(base)
+    target = str(target)
+    name = short_name(base) + '_' + CORRECTIVE_BLENDSHAPE_NAME
+
+    with profile_stage('blendshape', base):
+        if sparse:
+            corrective_blendshape = cmds.blendShape(
+                base, name=name, before=True)[0]
+            indices, deltas = (
+                precomputed or compute_sparse_deltas(target, base, epsilon))
+            create_sparse_target(
+                corrective_blendshape, 0, short_name(target), indices, deltas)
+        else:
+            corrective_blendshape = cmds.blendShape(
+                target, base, name=name, before=True, weight=(0, 1))[0]
+
+    cmds.addAttr(
+        corrective_blendshape, attributeType='message',
+        longName=CORRECTIVE_BLENDSHAPE_ATTR,
+        niceName=CORRECTIVE_BLENDSHAPE_ATTR.replace('_', ' '))
+
+    cmds.connectAttr(
+        base + '.message',
+        corrective_blendshape + '.' + CORRECTIVE_BLENDSHAPE_ATTR)
+
+    if values is not None:
+        apply_animation_template_on_blendshape_target_weight(
+            blendshape=corrective_blendshape, target_index=0, values=values)
+    return corrective_blendshape
+
+
+def mesh_has_working_copy(mesh):
+    '''
+    This function query if a working copy is currently in use
+    it should never append
+    '''
+    return get_scene_index().has_working_copy(str(mesh))
+
+
+def add_target_on_corrective_blendshape(
+        blendshape, target, base, values=None, sparse=False,
+        epsilon=SPARSE_TARGET_EPSILON, precomputed=None):
+    '''
+    this is a simple function to add target on a blendshape
+    in sparse mode, only the vertices moved more than epsilon are stored and
+    the target mesh is never connected to the blendshape.
+    precomputed is the result of compute_working_copy_deltas, see
+    precompute_working_copies.
+    '''
+    from silhouettepolisher.points import set_points_array
+    corrective_blendshape = str(blendshape)
+    base = str(base)
+    target = str(target)
+
+    index = get_next_target_index(corrective_blendshape)
+
+    if sparse:
+        with profile_stage('sparse target', base):
+            indices, deltas = (
+                precomputed or compute_sparse_deltas(target, base, epsilon))
+            create_sparse_target(
+                corrective_blendshape, index, short_name(target), indices,
+                deltas)
+        apply_animation_template_on_blendshape_target_weight(
+            blendshape=corrective_blendshape, target_index=index,
+            values=values)
+        return
+
+    if precomputed is not None:
+        set_points_array(target, precomputed)
+    else:
+        set_target_relative(corrective_blendshape, target, base)
+    cmds.getAttr(get_mesh_shape(target) + '.outMesh', type=True)
+
+    # the target is created with "1.0" as weight. But it still created with
+    # value set to 0.0. If the value is not set to 1.0, strange bug's appears
+    # I have to set the target after if I want my value to 1.0 (life's strange)
+    with profile_stage('blendshape', base):
+        cmds.blendShape(
+            corrective_blendshape, edit=True, before=True,
+            target=(base, index, target, 1.0))
+        cmds.blendShape(corrective_blendshape, edit=True, weight=(index, 1.0))
+
+    apply_animation_template_on_blendshape_target_weight(
+        blendshape=corrective_blendshape, target_index=index, values=values)
+
+
+def add_sparse_corrective_target(mesh, name, indices, deltas, blendshape=None):
+    '''
+    add a sparse target from precomputed (indices, deltas) on a corrective
+    blendshape of the mesh (the first one if blendshape is None). The
+    corrective is created if the mesh doesn't have one yet.
+    return the weight plug of the new target.
+    '''
+    mesh = str(mesh)
+    if blendshape is None:
+        blendshapes = get_corrective_blendshapes(mesh)
+        blendshape = blendshapes[0] if blendshapes else None
+    if blendshape is None:
+        blendshape = create_blendshape_corrective_on_mesh(
+            base=mesh, target=name, sparse=True, precomputed=(indices, deltas))
+        return '{}.weight[0]'.format(blendshape)
+    blendshape = str(blendshape)
+    index = get_next_target_index(blendshape)
+    add_target_on_corrective_blendshape(
+        blendshape=blendshape, target=name, base=mesh, sparse=True,
+        precomputed=(indices, deltas))
+    return '{}.weight[{}]'.format(blendshape, index)
+
+
+def can_edit_target_incrementally(working_copy, blendshape, target_index):
+    '''
+    return True if the target of the working copy can be edited with
+    apply_incremental_target_edit: the starting points are stored on the
+    working copy and the target points are stored (no geometry connected to
+    the target).
+    '''
+    from silhouettepolisher.points import numpy
+    if numpy is None or not has_attr(working_copy, EDIT_TARGET_START_ATTR):
+        return False
+    geometry_plug = (
+        get_target_item_plug(blendshape, target_index) + '.inputGeomTarget')
+    return not cmds.listConnections(
+        geometry_plug, source=True, destination=False)
+
+
+@profiled('apply_incremental_target_edit')
+def apply_incremental_target_edit(
+        working_copy, display_copy, blendshape, target_index,
+        epsilon=SPARSE_TARGET_EPSILON):
+    '''
+    update the stored target points with the vertices moved on the working
+    copy since his setup. The other stored vertices are kept as they are.
+    The target is read and written through the plugs data (double buffers,
+    no python object per point), the python work follows the edit size.
+    Careful, the target plugs are set through the API, the edit isn't
+    registered in the undo queue.
+    The edited vertices delta is the working copy to display copy offset (the
+    same as a full edit). The vertices brought back under epsilon are
+    removed from the target.
+    return False if the target can't be edited incrementally (nothing is
+    done), see can_edit_target_incrementally.
+    '''
+    from silhouettepolisher.points import (
+        numpy, get_points_array, get_sparse_deltas, get_point_array_plug)
+    working_copy = str(working_copy)
+    if not can_edit_target_incrementally(
+            working_copy, blendshape, target_index):
+        return False
+
+    with profile_stage('dirty vertices', working_copy):
+        start_points = get_point_array_plug(
+            working_copy + '.' + EDIT_TARGET_START_ATTR)
+        working_points = get_points_array(working_copy)
+        if len(working_points) != len(start_points):
+            return False
+        edited_indices, _ = get_sparse_deltas(
+            working_points, start_points, epsilon)
+    if not len(edited_indices):
+        return True
+
+    with profile_stage('merge'):
+        display_points = get_points_array(display_copy)
+        edited_deltas = (
+            working_points[edited_indices] - display_points[edited_indices])
+        indices, deltas = get_target_points(blendshape, target_index)
+        kept = ~numpy.isin(indices, edited_indices)
+        moved = numpy.einsum(
+            'ij,ij->i', edited_deltas, edited_deltas) > epsilon * epsilon
+        indices = numpy.concatenate((indices[kept], edited_indices[moved]))
+        deltas = numpy.concatenate((deltas[kept], edited_deltas[moved]))
+        order = numpy.argsort(indices)
+
+    with profile_stage('write target'):
+        write_target_points(
+            blendshape, target_index, indices[order], deltas[order])
+    return True
+
+
+def get_target_points(blendshape, target_index, item=TARGET_ITEM_INDEX):
+    '''
+    return the points stored in the blendshape target item (the full weight
+    by default) as a tuple of arrays (indices, deltas), read from the plugs
+    data.
+    '''
+    from silhouettepolisher.points import (
+        get_point_array_plug, get_component_list_plug)
+    item_plug = get_target_item_plug(blendshape, target_index, item)
+    indices = get_component_list_plug(item_plug + '.inputComponentsTarget')
+    deltas = get_point_array_plug(item_plug + '.inputPointsTarget')
+    return indices, deltas
+
+
+def write_target_points(
+        blendshape, target_index, indices, deltas, item=TARGET_ITEM_INDEX):
+    '''
+    same as set_sparse_target_points, but the arrays are written through the
+    plugs data instead of setAttr lists. The target must not have a geometry
+    connected. Careful, it isn't registered in the undo queue.
+    '''
+    from silhouettepolisher.points import (
+        set_point_array_plug, set_component_list_plug)
+    item_plug = get_target_item_plug(blendshape, target_index, item)
+    set_point_array_plug(item_plug + '.inputPointsTarget', deltas)
+    set_component_list_plug(item_plug + '.inputComponentsTarget', indices)
+
+
+def apply_edit_target_working_copy(
+        working_copy, sparse=False, epsilon=SPARSE_TARGET_EPSILON,
+        precomputed=None, incremental=True):
+    """
+    this function apply a target edit.
+    To do that, it retrieve information about the setup from the working copy.
+    Set the blendshapetarget to 0.0 and use the display copy to to calculate
+    the relative target mesh.
+    Connect the working mesh to the correct blendshape input target to update
+    it.
+    Put back the target value to his original value to clean the scene.
+    By default (incremental is True), only the vertices moved since the
+    setup are updated in the target stored points and no mesh stay connected
+    to the blendshape (see apply_incremental_target_edit). The full edit
+    below is the fallback when the working copy has no starting points
+    snapshot (numpy missing) or when the target is still connected to a
+    geometry.
+    In sparse mode, the delta between the working copy and the display copy
+    is directly written in the target stored points and no mesh stay
+    connected to the blendshape.
+    precomputed is the result of compute_working_copy_deltas, see
+    precompute_working_copies.
+    """
+    from silhouettepolisher.points import set_points_array
+    working_copy = str(working_copy)
+    original_mesh = get_connected(working_copy + '.' + WORKING_MESH_ATTR)[0]
+    display_copy = get_scene_index().get_display_copy(original_mesh)
+
+    blendshape = get_connected(working_copy + '.' + BLENDSHAPE_EDIT_ATTR)[0]
+    target_index = int(cmds.getAttr(working_copy + '.' + TARGET_MESH_ATTR))
+    if incremental and apply_incremental_target_edit(
+            working_copy, display_copy, blendshape, target_index, epsilon):
+        return
+
+    if sparse:
+        indices, deltas = precomputed or compute_sparse_deltas(
+            working_copy, display_copy, epsilon)
+        set_sparse_target_points(blendshape, target_index, indices, deltas)
+        return
+
+    weight_plug = '{}.weight[{}]'.format(blendshape, target_index)
+    target_original_value = cmds.getAttr(weight_plug)
+    blendshape_input = (
+        get_target_item_plug(blendshape, target_index) + '.inputGeomTarget')
+
+    cmds.setAttr(weight_plug, 0)
+    if precomputed is not None:
+        set_points_array(working_copy, precomputed)
+    else:
+        set_target_relative(blendshape, working_copy, display_copy)
+    cmds.connectAttr(
+        get_mesh_shape(working_copy) + '.worldMesh[0]', blendshape_input)
+
+    cmds.setAttr(weight_plug, target_original_value)
+
+
+@resolved_selection(
+    ls_filter(type=('mesh', 'transform'), objectsOnly=True),
+    shapes_to_transforms,
+    contains_at_least(1, 'transform'))
+@batch_animation_templates
+def apply_selected_working_copys(
+        nodes, values=None, sparse=False, epsilon=SPARSE_TARGET_EPSILON):
+    result = []
+    working_copies = [
+        working_copy for working_copy in nodes
+        if has_attr(working_copy, WORKING_MESH_ATTR)]
+    precomputed = precompute_working_copies(
+        working_copies, sparse=sparse, epsilon=epsilon)
+    for working_copy, data in zip(working_copies, precomputed):
+        result.append(apply_working_copy(
+            working_copy, values=values, sparse=sparse, epsilon=epsilon,
+            precomputed=data))
+    if result:
+        cmds.select(result)
+
+
+@profiled('apply_working_copy')
+def apply_working_copy(
+        mesh, blendshape=None, values=None, sparse=False,
+        epsilon=SPARSE_TARGET_EPSILON, precomputed=None):
+    '''
+    this function is let apply a working mesh on his main shape
+    it manage if a blendshape already exist or not.
+    sparse and epsilon are forwarded to the target creation/edit, see
+    create_sparse_target.
+    precomputed is the result of compute_working_copy_deltas, see
+    precompute_working_copies.
+    return the original mesh.
+    '''
+    working_mesh = str(mesh)
+    if not has_attr(working_mesh, WORKING_MESH_ATTR):
+        return cmds.warning('please, select working mesh')
+
+    original_mesh = get_connected(working_mesh + '.' + WORKING_MESH_ATTR)[0]
+    # the deformers must evaluate to get the relative target.
+    restore_deformation_history(working_mesh)
+    sparse, precomputed = resolve_proxy_working_copy(
+        working_mesh, sparse, epsilon, precomputed)
+
+    if has_attr(working_mesh, TARGET_MESH_ATTR):
+        apply_edit_target_working_copy(
+            working_mesh, sparse=sparse, epsilon=epsilon,
+            precomputed=precomputed)
+
+    elif blendshape:
+        add_target_on_corrective_blendshape(
+            blendshape, working_mesh, original_mesh, values=values,
+            sparse=sparse, epsilon=epsilon, precomputed=precomputed)
+
+    elif blendshape is None:
+        blendshapes = get_corrective_blendshapes(original_mesh)
+        if not blendshapes:
+            create_blendshape_corrective_on_mesh(
+                original_mesh, working_mesh, values=values, sparse=sparse,
+                epsilon=epsilon, precomputed=precomputed)
+        else:
+            add_target_on_corrective_blendshape(
+                blendshapes[0], working_mesh, original_mesh, values=values,
+                sparse=sparse, epsilon=epsilon, precomputed=precomputed)
+
+    # the corrective changed, the inputs of the next correctives too.
+    discard_intermediate_points(get_corrective_blendshapes(original_mesh))
+    delete_working_copy_on_mesh(original_mesh)
+    return original_mesh
+
+
+@profiled('precompute_working_copies')
+def precompute_working_copies(
+        working_copies, blendshape=None, sparse=False,
+        epsilon=SPARSE_TARGET_EPSILON, new_blendshape=False, workers=None):
+    '''
+    compute the targets of several working copies in parallel, return a list
+    of precomputed data to give to apply_working_copy (None for a working copy
+    without anything to precompute).
+    The points are read on the main thread (maya isn't thread safe), the
+    deltas are computed in a thread pool over plain arrays (numpy release the
+    GIL) and the results are written back in the scene by the apply.
+    Without numpy or with a single working copy, nothing is precomputed.
+    :new_blendshape bool: the working copies are applied on new blendshapes
+    :workers int: the thread pool size, default is APPLY_WORKERS (None = cpu
+    count)
+    '''
+    from concurrent.futures import ThreadPoolExecutor
+    from silhouettepolisher.points import numpy
+    if numpy is None or len(working_copies) < 2:
+        return [None] * len(working_copies)
+
+    with profile_stage('gather'):
+        points = []
+        for working_copy in working_copies:
+            # the deformers must evaluate to get the relative target.
+            restore_deformation_history(str(working_copy))
+            points.append(gather_working_copy_points(
+                working_copy, blendshape=blendshape, sparse=sparse,
+                new_blendshape=new_blendshape))
+
+    with profile_stage('compute'):
+        jobs = [
+            (working_copy_points, sparse, epsilon)
+            for working_copy_points in points]
+        workers = workers or APPLY_WORKERS
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            return list(executor.map(_compute_working_copy_deltas, jobs))
+
+
+def gather_working_copy_points(
+        working_copy, blendshape=None, sparse=False, new_blendshape=False):
+    '''
+    read the points needed to compute the target of a working copy. It
+    follows the same rules than apply_working_copy to find the base and the
+    blendshape.
+    return a tuple of arrays (target_points, base_points, intermediate_points)
+    (intermediate_points is None in sparse mode) or None if the target can't
+    be precomputed (a new dense blendshape compute the target itself, a
+    proxy is interpolated by the apply).
+    '''
+    from silhouettepolisher.points import get_points_array
+    working_copy = str(working_copy)
+    if has_attr(working_copy, PROXY_MAPPING_ATTR):
+        # the proxy deltas are interpolated by the apply.
+        return None
+    original_mesh = get_connected(working_copy + '.' + WORKING_MESH_ATTR)[0]
+    if has_attr(working_copy, TARGET_MESH_ATTR):
+        base = get_scene_index().get_display_copy(original_mesh)
+        blendshape = get_connected(
+            working_copy + '.' + BLENDSHAPE_EDIT_ATTR)[0]
+        target_index = int(
+            cmds.getAttr(working_copy + '.' + TARGET_MESH_ATTR))
+        if can_edit_target_incrementally(
+                working_copy, blendshape, target_index):
+            # edited incrementally by the apply.
+            return None
+    else:
+        base = original_mesh
+        if not new_blendshape and not blendshape:
+            blendshapes = get_corrective_blendshapes(original_mesh)
+            blendshape = blendshapes[0] if blendshapes else None
+        if new_blendshape or not blendshape:
+            blendshape = None
+            if not sparse:
+                return None
+
+    target_points = get_points_array(working_copy)
+    base_points = get_points_array(base)
+    if sparse:
+        return target_points, base_points, None
+    return target_points, base_points, get_intermediate_points(blendshape)
+
+
+def compute_working_copy_deltas(points, sparse=False, epsilon=None):
+    '''
+    compute the target from the arrays returned by gather_working_copy_points.
+    It doesn't call maya and can run in a thread.
+    return the relative points array or in sparse mode, a tuple
+    (indices, deltas).
+    '''
+    from silhouettepolisher.points import (
+        compute_relative_points, get_sparse_deltas)
+    if points is None:
+        return None
+    target_points, base_points, intermediate_points = points
+    if sparse:
+        epsilon = SPARSE_TARGET_EPSILON if epsilon is None else epsilon
+        return get_sparse_deltas(target_points, base_points, epsilon)
+    return compute_relative_points(
+        target_points, base_points, intermediate_points)
+
+
+def _compute_working_copy_deltas(job):
+    return compute_working_copy_deltas(*job)
+
+
+@resolved_selection(
+    ls_filter(type=('mesh', 'transform'), objectsOnly=True),
+    shapes_to_transforms,
+    contains_exactly(1, 'transform'))
+def get_targets_list_from_selection(nodes):
+    original_mesh = nodes[0]
+    return original_mesh, get_targets_list_from_mesh(original_mesh)
+
+
+def get_targets_list_from_mesh(mesh):
+    '''
+    this function return a list tuple containing the blendshape corrective
+    connected and the target available per blendshapes
+    '''
+    blendshapes = get_corrective_blendshapes(mesh)
+    if not blendshapes:
+        return None
+    return [
+        (bs, cmds.listAttr(bs + '.w', multi=True) or [])
+        for bs in blendshapes]
+
+
+@profiled('set_target_relative')
+def set_target_relative(blendshape, target, base):
+    """
+    the function is setting the target relative to the base if a blendshape
+    exist to avoid double transformation when the target is applyied
+    Thanks Carlo Giesa, this one is yours :)
+    """
+    from silhouettepolisher.points import (
+        numpy, get_points_array, set_points_array, compute_relative_points)
+    target = str(target)
+    base = str(base)
+
+    blendshape = str(blendshape)
+    with profile_stage('intermediate', target):
+        intermediate_points = get_intermediate_points(blendshape)
+
+    if numpy is not None:
+        # batched path: read the three meshes as contiguous arrays, compute
+        # the delta in one operation and write back with one setPoints.
+        with profile_stage('read points'):
+            target_points = get_points_array(target)
+            base_points = get_points_array(base)
+        with profile_stage('delta'):
+            relative_points = compute_relative_points(
+                target_points=target_points,
+                base_points=base_points,
+                intermediate_points=intermediate_points)
+        with profile_stage('write points'):
+            set_points_array(target, relative_points)
+        return
+
+    with profile_stage('read points'):
+        selection_list = om2.MSelectionList()
+        selection_list.add(target)
+        selection_list.add(base)
+
+        target_fn_mesh = om2.MFnMesh(selection_list.getDagPath(0))
+        target_points = target_fn_mesh.getPoints()
+        base_points = om2.MFnMesh(selection_list.getDagPath(1)).getPoints()
+        # the cached array is copied, it's modified in place bellow.
+        intermediate_points = om2.MPointArray(intermediate_points)
+        selection_list.clear()
+
+    with profile_stage('delta'):
+        i = 0
+        while (i < len(target_points)):
+            intermediate_points[i] = (
+                intermediate_points[i] + (target_points[i] - base_points[i]))
+            i += 1
+
+    with profile_stage('write points'):
+        target_fn_mesh.setPoints(intermediate_points)
+        target_fn_mesh.updateSurface()
+
+
+def get_intermediate_points(blendshape, use_cache=True):
+    '''
+    return the points of the geometry entering the blendshape (the mesh
+    before the corrective deformation) at the current frame.
+    The points are read from the input geometry plug data, the scene isn't
+    modified. The result is cached per blendshape, frame and input geometry
+    generation: the cache is cleared when the time changes and the entries
+    of a blendshape are dropped when its input geometry is dirtied (see
+    watch_intermediate_points).
+    If a frame range cache covers the current frame (see cache.py), the points
+    are read from it and the deformation chain isn't evaluated.
+    '''
+    from silhouettepolisher.cache import get_cached_intermediate_points
+    from silhouettepolisher.points import (
+        numpy, get_plug_points_array, get_plug_points)
+    blendshape = str(blendshape)
+    if use_cache:
+        watch_intermediate_points(blendshape)
+    frame = get_current_time()
+    key = (blendshape, frame, _intermediate_points_generations.get(blendshape))
+    if use_cache and key in _intermediate_points_cache:
+        return _intermediate_points_cache[key]
+
+    plug = blendshape + '.input[0].inputGeometry'
+    points = None
+    if use_cache:
+        points = get_cached_intermediate_points(blendshape, frame)
+    if points is None and numpy is not None:
+        points = get_plug_points_array(plug)
+    elif points is None:
+        points = get_plug_points(plug)
+
+    if not use_cache:
+        return points
+    while len(_intermediate_points_cache) >= INTERMEDIATE_POINTS_CACHE_SIZE:
+        _intermediate_points_cache.popitem(last=False)
+    _intermediate_points_cache[key] = points
+    return points
+
+
+def watch_intermediate_points(blendshape):
+    '''
+    install the callbacks invalidating the intermediate points of the
+    blendshape: a time change clears the cache, a dirty input geometry
+    increases the blendshape generation and drops its entries. A new scene
+    or a scene opened clears the cache and remove the callbacks.
+    '''
+    if blendshape in _intermediate_points_generations:
+        return
+    if not _intermediate_points_callbacks:
+        _intermediate_points_callbacks.append(
+            om2.MEventMessage.addEventCallback(
+                'timeChanged', _time_changed))
+        for message in ('kBeforeNew', 'kBeforeOpen'):
+            _intermediate_points_callbacks.append(
+                om2.MSceneMessage.addCallback(
+                    getattr(om2.MSceneMessage, message), _scene_changed))
+    selection_list = om2.MSelectionList()
+    selection_list.add(blendshape)
+    _intermediate_points_callbacks.append(
+        om2.MNodeMessage.addNodeDirtyPlugCallback(
+            selection_list.getDependNode(0), _blendshape_dirtied,
+            blendshape))
+    _intermediate_points_generations[blendshape] = 0
+
+
+def discard_intermediate_points(blendshapes):
+    '''
+    drop the cached intermediate points of the given blendshapes, the frame
+    range caches included (see cache.py).
+    '''
+    from silhouettepolisher.cache import clear_intermediate_points_caches
+    blendshapes = set(str(blendshape) for blendshape in blendshapes)
+    for blendshape in blendshapes:
+        clear_intermediate_points_caches(blendshape)
+    _discard_cached_points(blendshapes)
+
+
+def _discard_cached_points(blendshapes):
+    for key in list(_intermediate_points_cache):
+        if key[0] in blendshapes:
+            del _intermediate_points_cache[key]
+    for blendshape in blendshapes:
+        if blendshape in _intermediate_points_generations:
+            _intermediate_points_generations[blendshape] += 1
+
+
+def clear_intermediate_points_cache():
+    '''
+    clear the intermediate points cache and remove its callbacks.
+    '''
+    if _intermediate_points_callbacks:
+        om2.MMessage.removeCallbacks(_intermediate_points_callbacks)
+    del _intermediate_points_callbacks[:]
+    _intermediate_points_generations.clear()
+    _intermediate_points_cache.clear()
+
+
+def _time_changed(*_):
+    _intermediate_points_cache.clear()
+
+
+def _scene_changed(*_):
+    clear_intermediate_points_cache()
+
+
+def _blendshape_dirtied(node, plug, blendshape):
+    # the frame range cache is kept, the input geometry is also dirtied by
+    # each time change. Its signature is checked when a frame is served.
+    if om2.MFnAttribute(plug.attribute()).name == 'inputGeometry':
+        _discard_cached_points([blendshape])
+
+
+def get_next_target_index(blendshape):
+    '''
+    return the first free target index after the existing ones
+    '''
+    indices = cmds.getAttr(
+        '{}.inputTarget[0].inputTargetGroup'.format(blendshape),
+        multiIndices=True)
+    return int(indices[-1] + 1) if indices else 0
+
+
+def get_target_item_plug(blendshape, target_index, item=TARGET_ITEM_INDEX):
+    '''
+    return the name of the inputTargetItem plug containing the stored points
+    of a target (the full weight in-between by default).
+    '''
+    return '{}.inputTarget[0].inputTargetGroup[{}].inputTargetItem[{}]'.format(
+        blendshape, target_index, item)
+
+
+def has_target_geometry(blendshape, target_index):
+    '''
+    return True if a geometry is connected to the target, maya evaluates it
+    instead of the stored points.
+    '''
+    geometry_plug = (
+        get_target_item_plug(blendshape, target_index) + '.inputGeomTarget')
+    return bool(cmds.listConnections(
+        geometry_plug, source=True, destination=False))
+
+
+def compute_sparse_deltas(target, base, epsilon=SPARSE_TARGET_EPSILON):
+    '''
+    return a tuple (indices, deltas) containing the vertex moved more than
+    epsilon between the base and the target and their object space offsets.
+    '''
+    from silhouettepolisher.points import (
+        numpy, get_points_array, get_sparse_deltas)
+    target = str(target)
+    base = str(base)
+    if numpy is not None:
+        return get_sparse_deltas(
+            get_points_array(target), get_points_array(base), epsilon)
+
+    selection_list = om2.MSelectionList()
+    selection_list.add(target)
+    selection_list.add(base)
+    target_points = om2.MFnMesh(selection_list.getDagPath(0)).getPoints()
+    base_points = om2.MFnMesh(selection_list.getDagPath(1)).getPoints()
+    indices, deltas = [], []
+    for i, (target_point, base_point) in enumerate(
+            zip(target_points, base_points)):
+        delta = target_point - base_point
+        if delta.length() > epsilon:
+            indices.append(i)
+            deltas.append((delta.x, delta.y, delta.z))
+    return indices, deltas
+
+
+def set_sparse_target_points(
+        blendshape, target_index, indices, deltas, item=TARGET_ITEM_INDEX):
+    '''
+    write the deltas directly in the blendshape inputPointsTarget and
+    inputComponentsTarget arrays of the target item (the full weight by
+    default). If a mesh is still connected as target geometry, it's
+    disconnected first, otherwise maya keeps evaluating it instead of the
+    stored points.
+    '''
+    from silhouettepolisher.points import indices_to_components
+    item_plug = get_target_item_plug(blendshape, target_index, item)
+    geometry_plug = item_plug + '.inputGeomTarget'
+    for source in cmds.listConnections(
+            geometry_plug, source=True, destination=False, plugs=True) or []:
+        cmds.disconnectAttr(source, geometry_plug)
+
+    points = [(x, y, z, 1.0) for x, y, z in _as_list(deltas)]
+    components = indices_to_components(indices)
+    cmds.setAttr(
+        item_plug + '.inputPointsTarget', len(points), *points,
+        type='pointArray')
+    cmds.setAttr(
+        item_plug + '.inputComponentsTarget', len(components), *components,
+        type='componentList')
+
+
+def create_sparse_target(blendshape, target_index, name, indices, deltas):
+    '''
+    create a new target on the blendshape without any target geometry. The
+    weight is set to 1.0 and aliased with the given name (suffixed if it's
+    already used).
+    '''
+    blendshape = str(blendshape)
+    set_sparse_target_points(blendshape, target_index, indices, deltas)
+    weight_plug = '{}.weight[{}]'.format(blendshape, target_index)
+    cmds.setAttr(weight_plug, 1.0)
+    cmds.aliasAttr(get_unique_alias(blendshape, name), weight_plug)
+
+
+@resolved_selection(
+    ls_filter(type=('mesh', 'transform'), objectsOnly=True),
+    shapes_to_transforms,
+    transforms_with_children_types('mesh'),
+    contains_at_least(1, 'transform'))
+def consolidate_selected_corrective_blendshapes(nodes):
+    return [consolidate_corrective_blendshapes(mesh) for mesh in nodes]
+
+
+@profiled('consolidate_corrective_blendshapes')
+def consolidate_corrective_blendshapes(mesh):
+    '''
+    merge all the corrective blendshapes of the mesh in the first one (in
+    history order) and delete the others. The targets are moved with their
+    stored deltas (all the in-betweens), their painted weights, their name
+    and whatever drive their weight (animation curve, expression...). The
+    kept blendshape keeps his "is_corrective_blendshape" link.
+    The correctives are all created in front of the chain, their deltas are
+    added in the same space, one blendshape gives the same deformation. The
+    envelope and the base weights of the merged blendshapes are folded in
+    the moved deltas. The consolidation is refused (nothing is done) if the
+    kept blendshape envelope or base weights aren't neutral, if an envelope
+    is driven or if a scaled blendshape has a target geometry connected.
+    Careful, the stored points are copied through the API, they aren't
+    registered in the undo queue.
+    return the consolidated blendshape or None if the mesh doesn't have
+    corrective or if the consolidation is refused.
+    '''
+    from silhouettepolisher.points import numpy
+    blendshapes = get_corrective_blendshapes(mesh)
+    if len(blendshapes) < 2:
+        return blendshapes[0] if blendshapes else None
+    if numpy is None:
+        cmds.warning('numpy is required to consolidate the correctives')
+        return None
+
+    destination = blendshapes[0]
+    vertex_count = cmds.polyEvaluate(mesh, vertex=True)
+    scales = {}
+    for blendshape in blendshapes:
+        if cmds.listConnections(
+                blendshape + '.envelope', source=True, destination=False):
+            cmds.warning(
+                '{} envelope is driven, it can\'t be consolidated'.format(
+                    blendshape))
+            return None
+        scales[blendshape] = get_blendshape_scale(blendshape, vertex_count)
+    if scales[destination] is not None:
+        cmds.warning(
+            '{} envelope or base weights aren\'t neutral, the correctives '
+            'can\'t be consolidated in it'.format(destination))
+        return None
+    for source in blendshapes[1:]:
+        indices = cmds.getAttr(
+            source + '.inputTarget[0].inputTargetGroup',
+            multiIndices=True) or []
+        if scales[source] is not None and any(
+                has_target_geometry(source, index) for index in indices):
+            cmds.warning(
+                '{} envelope or base weights can\'t be folded in a target '
+                'geometry, apply the targets before the consolidation'.format(
+                    source))
+            return None
+
+    cmds.undoInfo(openChunk=True, chunkName='consolidate_blendshapes')
+    try:
+        for source in blendshapes[1:]:
+            aliases = get_weight_aliases(source)
+            indices = cmds.getAttr(
+                source + '.inputTarget[0].inputTargetGroup',
+                multiIndices=True) or []
+            for index in indices:
+                move_target(
+                    source, index, destination,
+                    get_next_target_index(destination),
+                    aliases.get('weight[{}]'.format(index)), scales[source])
+            cmds.delete(source)
+    finally:
+        cmds.undoInfo(closeChunk=True)
+    return destination
+
+
+def get_blendshape_scale(blendshape, vertex_count):
+    '''
+    return the (vertices,) array of the envelope multiplied by the base
+    weights of the blendshape, None if they are neutral (all 1.0).
+    '''
+    from silhouettepolisher.points import numpy
+    envelope = cmds.getAttr(blendshape + '.envelope')
+    indices, values = get_multi_values(
+        blendshape + '.inputTarget[0].baseWeights')
+    if envelope == 1 and all(value == 1 for value in values):
+        return None
+    scale = numpy.full(vertex_count, float(envelope))
+    scale[indices] *= values
+    return scale
+
+
+def get_multi_values(plug):
+    '''
+    return the existing indices of a numeric multi attribute and their
+    values as a tuple of lists.
+    '''
+    mplug = get_plug(plug)
+    indices = list(mplug.getExistingArrayAttributeIndices())
+    values = [mplug.elementByLogicalIndex(i).asDouble() for i in indices]
+    return indices, values
+
+
+def set_multi_values(plug, indices, values):
+    '''
+    set the values of a numeric multi attribute, the contiguous indices are
+    set by one setAttr call.
+    '''
+    start = 0
+    for end in range(1, len(indices) + 1):
+        if end < len(indices) and indices[end] == indices[end - 1] + 1:
+            continue
+        cmds.setAttr(
+            '{}[{}:{}]'.format(plug, indices[start], indices[end - 1]),
+            *values[start:end])
+        start = end
+
+
+def move_target(source, source_index, destination, destination_index,
+                name=None, scale=None):
+    '''
+    copy a target of the source blendshape to the destination blendshape at
+    the given index: the stored points and components of all the target
+    items (through the plugs data), the painted target weights, the weight
+    value, the weight input connection and the alias.
+    The target geometry connected to the source target, if any, is moved too.
+    :scale numpy.array: the (vertices,) factors applied to the stored deltas
+    (see get_blendshape_scale)
+    '''
+    source_group = '{}.inputTarget[0].inputTargetGroup[{}]'.format(
+        source, source_index)
+    destination_group = '{}.inputTarget[0].inputTargetGroup[{}]'.format(
+        destination, destination_index)
+    items = cmds.getAttr(
+        source_group + '.inputTargetItem', multiIndices=True) or []
+    for item in items:
+        indices, deltas = get_target_points(source, source_index, item)
+        if scale is not None:
+            deltas = deltas * scale[indices, None]
+        write_target_points(
+            destination, destination_index, indices, deltas, item)
+        source_item = '{}.inputTargetItem[{}]'.format(source_group, item)
+        destination_item = '{}.inputTargetItem[{}]'.format(
+            destination_group, item)
+        geometries = cmds.listConnections(
+            source_item + '.inputGeomTarget', source=True,
+            destination=False, plugs=True) or []
+        for geometry in geometries:
+            cmds.disconnectAttr(geometry, source_item + '.inputGeomTarget')
+            cmds.connectAttr(
+                geometry, destination_item + '.inputGeomTarget')
+    indices, values = get_multi_values(source_group + '.targetWeights')
+    set_multi_values(destination_group + '.targetWeights', indices, values)
+
+    source_weight = '{}.weight[{}]'.format(source, source_index)
+    destination_weight = '{}.weight[{}]'.format(
+        destination, destination_index)
+    cmds.setAttr(destination_weight, cmds.getAttr(source_weight))
+    drivers = cmds.listConnections(
+        source_weight, source=True, destination=False, plugs=True) or []
+    for driver in drivers:
+        cmds.disconnectAttr(driver, source_weight)
+        cmds.connectAttr(driver, destination_weight)
+    if name:
+        # the source is deleted after, the alias is removed from it first to
+        # keep the name available.
+        cmds.aliasAttr(source + '.' + name, remove=True)
+        cmds.aliasAttr(
+            get_unique_alias(destination, name), destination_weight)
+
+
+def get_weight_aliases(blendshape):
+    '''
+    return a dict {"weight[index]": alias} of the blendshape targets
+    '''
+    aliases = cmds.aliasAttr(blendshape, query=True) or []
+    return dict(zip(aliases[1::2], aliases[::2]))
+
+
+def get_unique_alias(blendshape, name):
+    '''
+    return the name suffixed by a number if it's already used as attribute
+    on the blendshape.
+    '''
+    alias, i = name, 1
+    while has_attr(blendshape, alias):
+        alias = '{}{}'.format(name, i)
+        i += 1
+    return alias
+
+
+@profiled('prune_corrective_blendshapes')
+def prune_corrective_blendshapes(
+        mesh, delta_threshold=PRUNE_DELTA_THRESHOLD,
+        vertex_threshold=SPARSE_TARGET_EPSILON, delete_empty=True):
+    '''
+    clean the corrective blendshapes of the mesh:
+    - the targets with all deltas under delta_threshold are removed.
+    - the targets with a weight set to zero and not animated or animated with
+      only zero keys are removed.
+    - the vertices moved less than vertex_threshold are removed from the
+      remaining targets.
+    - if delete_empty is True, the blendshapes without target are deleted.
+    The targets still connected to a geometry are ignored (their stored
+    points aren't used by maya). numpy is required.
+    return a report dict: the targets and blendshapes removed, the vertices
+    evaluated before and after (the sum of the stored vertices of the
+    targets) and the stored bytes saved.
+    '''
+    from silhouettepolisher.points import numpy
+    report = OrderedDict((
+        ('mesh', str(mesh)),
+        ('targets_removed', []),
+        ('blendshapes_removed', []),
+        ('vertices_before', 0),
+        ('vertices_after', 0),
+        ('bytes_saved', 0)))
+    if numpy is None:
+        cmds.warning('numpy is required to prune the correctives')
+        return report
+
+    cmds.undoInfo(openChunk=True, chunkName='prune_corrective_blendshapes')
+    try:
+        for blendshape in get_corrective_blendshapes(mesh):
+            _prune_corrective_blendshape(
+                blendshape, delta_threshold, vertex_threshold, report)
+            indices = cmds.getAttr(
+                blendshape + '.inputTarget[0].inputTargetGroup',
+                multiIndices=True)
+            if delete_empty and not indices:
+                cmds.delete(blendshape)
+                report['blendshapes_removed'].append(blendshape)
+    finally:
+        cmds.undoInfo(closeChunk=True)
+    # a stored vertex is a point (4 doubles) and his component index.
+    removed = report['vertices_before'] - report['vertices_after']
+    report['bytes_saved'] = removed * (4 * 8 + 4)
+    return report
+
+
+def _prune_corrective_blendshape(
+        blendshape, delta_threshold, vertex_threshold, report):
+    from silhouettepolisher.points import numpy
+    aliases = get_weight_aliases(blendshape)
+    indices = cmds.getAttr(
+        blendshape + '.inputTarget[0].inputTargetGroup',
+        multiIndices=True) or []
+    for index in indices:
+        if has_target_geometry(blendshape, index):
+            continue
+        target_indices, deltas = get_target_points(blendshape, index)
+        report['vertices_before'] += len(target_indices)
+        lengths = numpy.sqrt(numpy.einsum('ij,ij->i', deltas, deltas))
+        if not len(lengths) or lengths.max() < delta_threshold or (
+                is_target_weight_null(blendshape, index)):
+            name = aliases.get('weight[{}]'.format(index), index)
+            remove_target(blendshape, index)
+            report['targets_removed'].append('{}.{}'.format(blendshape, name))
+            continue
+        kept = lengths > vertex_threshold
+        report['vertices_after'] += int(kept.sum())
+        if not kept.all():
+            set_sparse_target_points(
+                blendshape, index, target_indices[kept], deltas[kept])
+
+
+def is_target_weight_null(blendshape, target_index):
+    '''
+    return True if the target weight is zero for the whole shot: zero and not
+    connected or driven by an animation curve with only zero keys.
+    '''
+    plug = '{}.weight[{}]'.format(blendshape, target_index)
+    drivers = cmds.listConnections(plug, source=True, destination=False)
+    if not drivers:
+        return cmds.getAttr(plug) == 0
+    values = get_key_values(plug)
+    return values is not None and not any(values)
+
+
+def remove_target(blendshape, target_index):
+    '''
+    remove a target from the blendshape: the weight drivers, the alias, the
+    weight and the target data.
+    '''
+    plug = '{}.weight[{}]'.format(blendshape, target_index)
+    curves = cmds.listConnections(
+        plug, source=True, destination=False, type='animCurve') or []
+    for driver in cmds.listConnections(
+            plug, source=True, destination=False, plugs=True) or []:
+        cmds.disconnectAttr(driver, plug)
+    if curves:
+        cmds.delete(curves)
+    alias = get_weight_aliases(blendshape).get('weight[{}]'.format(
+        target_index))
+    if alias:
+        cmds.aliasAttr(blendshape + '.' + alias, remove=True)
+    cmds.removeMultiInstance(
+        '{}.inputTarget[0].inputTargetGroup[{}]'.format(
+            blendshape, target_index), b=True)
+    cmds.removeMultiInstance(plug, b=True)
+
+
+def _as_list(array):
+    return array.tolist() if hasattr(array, 'tolist') else array
+
+
+def ensure_node_disconnected(node):
+    """
+    This function clean all plug from a node
+    """
+    connections = cmds.listConnections(
+        str(node), plugs=True, connections=True) or []
+    for inplug, outplug in zip(connections[::2], connections[1::2]):
+        try:
+            cmds.disconnectAttr(outplug, inplug)
+        # That the lazy way, if disconnection fail, that because inplug and
+        # outplug are reversed ...
+        except RuntimeError:
+            cmds.disconnectAttr(inplug, outplug)
+
+
+def apply_animation_template_on_blendshape_target_weight(
+        blendshape, target_index, values=None):
+    """
+    this function will apply an animation on the blendshape target index given.
+    the value is an float array. It represent a value at frame.
+    the array middle value is the value set at the current frame.
+    If it's called inside a function decorated by batch_animation_templates,
+    the keys are written when the decorated function is done.
+    """
+    if values is None or not any(1 for v in values if v is not None):
+        return
+
+    if _pending_animation_templates is not None:
+        _pending_animation_templates.append(
+            (str(blendshape), target_index, values))
+        return
+    apply_animation_templates([(str(blendshape), target_index, values)])
+
+
+def apply_animation_templates(templates):
+    """
+    this function apply a list of animation templates as
+    [(blendshape, target_index, values), ...]
+    The current time is resolved once and each target weight receives all his
+    keys with one single call.
+    """
+    with profile_stage('keyframes'):
+        current_time = get_current_time()
+        for blendshape, target_index, values in templates:
+            frames_values = get_animation_template_frames_values(
+                values, current_time)
+            if not frames_values:
+                continue
+            plug = '{}.weight[{}]'.format(blendshape, target_index)
+            set_linear_keys(plug, frames_values)
+
+            # this force maya to refresh the current frame in evaluation
+            # without those lines, maya does'nt refresh the current frame if a
+            # key is set at this timing.
+            if frames_values.get(current_time) is not None:
+                cmds.blendShape(
+                    blendshape, edit=True,
+                    weight=(target_index, frames_values[current_time]))
+
+
+def get_animation_template_frames_values(values, current_time):
+    """
+    convert an animation template to a dict {frame: value}, the template
+    middle value is placed on the current time.
+    """
+    startframe = int(current_time - float(len(values) / 2) + .5)
+    endframe = int(current_time + float(len(values) / 2) + .5)
+    frames = range(int(startframe), int(endframe))
+    decimal = current_time - int(current_time)
+    return {
+        f + decimal: values[i] for i, f in enumerate(frames)
+        if values[i] is not None}
+
+
+def get_current_time():
+    return float(cmds.currentTime(query=True))
+
+
+def short_name(node):
+    return node.split('|')[-1]
+
+
+def has_attr(node, attribute):
+    return cmds.objExists('{}.{}'.format(node, attribute))
+
+
+def get_connected(plug):
+    '''
+    return the nodes connected as source of the given plug
+    '''
+    return cmds.listConnections(plug, source=True, destination=False) or []
+
+
+def get_working_meshes(mesh):
+    '''
+    return the working copy and display copy connected to the mesh
+    '''
+    scene_index = get_scene_index()
+    mesh = str(mesh)
+    return [
+        node for node in (
+            scene_index.get_working_copy(mesh),
+            scene_index.get_display_copy(mesh))
+        if node]
+
+
+def get_mesh_shape(node):
+    '''
+    return the first non intermediate mesh shape of a transform or the node
+    itself if it's a mesh.
+    '''
+    node = str(node)
+    if cmds.nodeType(node) == 'mesh':
+        return node
+    return cmds.listRelatives(
+        node, shapes=True, noIntermediate=True, fullPath=True,
+        type='mesh')[0]
@@ -0,0 +1,266 @@
+'''
+This module contain the corrective library: the targets of the corrective
+blendshapes of a mesh saved in one binary file, to be reused on another shot
+or another asset sharing the topology.
+The file layout is:
+    - a preamble: the magic bytes, the header offset and size (uint64).
+    - the data blocks, aligned on 64 bytes. For each target item (the full
+      weight and the in-betweens), the sparse indices as int32 (n,) and the
+      deltas as float32 (n, 3).
+    - the header as json: the mesh, his topology hash and vertex count, and
+      for each target his name, the blocks offsets of his items, his weight
+      and the keys and tangents of his weight.
+Only the libraries of the current VERSION are read, the others are refused.
+The blocks are memory mapped when the library is read, a target is only
+loaded from the disk when it's imported.
+    from silhouettepolisher import library
+    library.export_correctives('body', '/tmp/body.splib')
+    library.import_correctives('body', '/tmp/body.splib')
+numpy is required.
+'''
+
+import json
+import struct
+from collections import OrderedDict
+
+from maya import cmds
+
+from silhouettepolisher.animation import set_keys, get_keys, get_key_tangents
+from silhouettepolisher.constants import TARGET_ITEM_INDEX
+from silhouettepolisher.core import (
+    get_corrective_blendshapes, get_target_points, has_target_geometry,
+    get_weight_aliases, add_sparse_corrective_target, short_name,
+    set_sparse_target_points)
+from silhouettepolisher.points import numpy
+from silhouettepolisher.profiling import profiled, profile_stage
+from silhouettepolisher.topology import get_fn_mesh, get_topology_hash
+
+
+MAGIC = b'SPLIB\x00\x00\x01'
+VERSION = 2
+# magic, header offset, header size
+PREAMBLE = struct.Struct('<8sQQ')
+ALIGNMENT = 64
+INDICES_DTYPE = '<i4'
+DELTAS_DTYPE = '<f4'
+
+
+class CorrectiveLibrary(object):
+    '''
+    a library file opened as read only memory map. The header is loaded, the
+    targets blocks are paged on demand.
+    '''
+    def __init__(self, filepath):
+        self.filepath = filepath
+        self.header = read_library_header(filepath)
+        self.array = numpy.memmap(filepath, dtype=numpy.uint8, mode='r')
+
+    @property
+    def targets(self):
+        return self.header['targets']
+
+    @property
+    def topology(self):
+        return self.header['topology']
+
+    @property
+    def vertex_count(self):
+        return self.header['vertex_count']
+
+    def get_target(self, name):
+        for target in self.targets:
+            if target['name'] == name:
+                return target
+        raise KeyError('{} not found in {}'.format(name, self.filepath))
+
+    def get_target_points(self, item):
+        '''
+        return the (indices, deltas) of a target item entry as memory mapped
+        arrays.
+        '''
+        count = item['count']
+        start = item['indices_offset']
+        indices = self.array[start:start + count * 4].view(INDICES_DTYPE)
+        start = item['deltas_offset']
+        deltas = self.array[start:start + count * 12].view(DELTAS_DTYPE)
+        return indices, deltas.reshape(count, 3)
+
+
+def read_library_header(filepath):
+    '''
+    return the json header of a library file without reading the targets.
+    raise ValueError if the file isn't a library of the current VERSION.
+    '''
+    with open(filepath, 'rb') as f:
+        magic, offset, size = PREAMBLE.unpack(f.read(PREAMBLE.size))
+        if magic != MAGIC:
+            raise ValueError('{} is not a corrective library'.format(filepath))
+        f.seek(offset)
+        header = json.loads(f.read(size).decode('utf-8'))
+    if header.get('version') != VERSION:
+        raise ValueError(
+            '{} has an unsupported library version: {} (expected {})'.format(
+                filepath, header.get('version'), VERSION))
+    return header
+
+
+def _write_block(f, array):
+    '''
+    write the array at the next aligned position and return his offset.
+    '''
+    f.write(b'\x00' * (-f.tell() % ALIGNMENT))
+    offset = f.tell()
+    f.write(numpy.ascontiguousarray(array).tobytes())
+    return offset
+
+
+@profiled('export_correctives')
+def export_correctives(mesh, filepath, blendshapes=None):
+    '''
+    save the targets of the corrective blendshapes of the mesh in a library
+    file, with all their items (the full weight and the in-betweens). The
+    items are written one by one, only one item is in memory at a time.
+    The targets still connected to a geometry are skipped (their stored
+    points aren't used by maya), apply the working copies in sparse mode to
+    export them.
+    :mesh string: the corrected mesh
+    :filepath string: the library file, overwritten if it exists
+    :blendshapes list: the blendshapes to export, all the correctives of the
+    mesh by default
+    return the header written.
+    '''
+    if numpy is None:
+        raise RuntimeError('numpy is required by the corrective library')
+    mesh = str(mesh)
+    if blendshapes is None:
+        blendshapes = get_corrective_blendshapes(mesh)
+    header = OrderedDict((
+        ('version', VERSION),
+        ('mesh', short_name(mesh)),
+        ('topology', get_topology_hash(mesh)),
+        ('vertex_count', get_fn_mesh(mesh).numVertices),
+        ('targets', [])))
+
+    with open(filepath, 'wb') as f:
+        f.write(PREAMBLE.pack(MAGIC, 0, 0))
+        for blendshape in blendshapes:
+            blendshape = str(blendshape)
+            aliases = get_weight_aliases(blendshape)
+            indices = cmds.getAttr(
+                blendshape + '.inputTarget[0].inputTargetGroup',
+                multiIndices=True) or []
+            for index in indices:
+                name = aliases.get(
+                    'weight[{}]'.format(index),
+                    '{}_{}'.format(blendshape, index))
+                if has_target_geometry(blendshape, index):
+                    cmds.warning(
+                        '{}.{} is connected to a geometry, skipped'.format(
+                            blendshape, name))
+                    continue
+                with profile_stage('write target'):
+                    items = cmds.getAttr(
+                        '{}.inputTarget[0].inputTargetGroup[{}]'
+                        '.inputTargetItem'.format(blendshape, index),
+                        multiIndices=True) or []
+                    items_entries = []
+                    for item in items:
+                        target_indices, deltas = get_target_points(
+                            blendshape, index, item)
+                        items_entries.append(OrderedDict((
+                            ('item', item),
+                            ('count', len(target_indices)),
+                            ('indices_offset', _write_block(
+                                f, target_indices.astype(INDICES_DTYPE))),
+                            ('deltas_offset', _write_block(
+                                f, deltas.astype(DELTAS_DTYPE))))))
+                    weight_plug = '{}.weight[{}]'.format(blendshape, index)
+                    header['targets'].append(OrderedDict((
+                        ('name', name),
+                        ('blendshape', blendshape),
+                        ('items', items_entries),
+                        ('weight', cmds.getAttr(weight_plug)),
+                        ('keys', get_keys(weight_plug)),
+                        ('tangents', get_key_tangents(weight_plug)))))
+
+        data = json.dumps(header).encode('utf-8')
+        offset = _write_block(f, numpy.frombuffer(data, dtype=numpy.uint8))
+        f.seek(0)
+        f.write(PREAMBLE.pack(MAGIC, offset, len(data)))
+    return header
+
+
+def read_target_points(library, item):
+    '''
+    return the (indices, deltas) of a target item entry read from the disk.
+    '''
+    indices, deltas = library.get_target_points(item)
+    with profile_stage('read target'):
+        # only this item is paged in.
+        return numpy.array(indices), numpy.array(deltas)
+
+
+@profiled('import_correctives')
+def import_correctives(
+        mesh, filepath, names=None, blendshape=None, check_topology=True,
+        frame_offset=0.0):
+    '''
+    create the library targets on the corrective blendshape of the mesh (the
+    first one, one is created if the mesh doesn't have corrective). The
+    targets are stored sparse with their in-betweens, their weight receive
+    the saved value or keys (with their tangents).
+    :mesh string: the mesh to correct
+    :filepath string: the library file
+    :names list: the targets to import, all by default
+    :blendshape string: the corrective receiving the targets
+    :check_topology bool: refuse a library saved from another topology, the
+    vertex count is always checked
+    :frame_offset float: offset added to the keys frames
+    return the weight plugs of the imported targets.
+    '''
+    if numpy is None:
+        raise RuntimeError('numpy is required by the corrective library')
+    mesh = str(mesh)
+    library = CorrectiveLibrary(filepath)
+    if get_fn_mesh(mesh).numVertices != library.vertex_count:
+        raise ValueError('{} vertex count doesn\'t match {}'.format(
+            mesh, filepath))
+    if check_topology and get_topology_hash(mesh) != library.topology:
+        raise ValueError('{} topology doesn\'t match {}'.format(
+            mesh, filepath))
+    targets = library.targets if names is None else [
+        library.get_target(name) for name in names]
+
+    weight_plugs = []
+    cmds.undoInfo(openChunk=True, chunkName='import_correctives')
+    try:
+        for target in targets:
+            items = OrderedDict(
+                (item['item'], item) for item in target['items'])
+            # the target is created with his full weight item, the
+            # in-betweens are added after.
+            full_weight = items.pop(TARGET_ITEM_INDEX, None)
+            if full_weight is None:
+                indices, deltas = numpy.zeros(0, int), numpy.zeros((0, 3))
+            else:
+                indices, deltas = read_target_points(library, full_weight)
+            weight_plug = add_sparse_corrective_target(
+                mesh, target['name'], indices, deltas, blendshape)
+            blendshape, weight = weight_plug.split('.')
+            index = int(weight.split('[')[1].rstrip(']'))
+            for item, entry in items.items():
+                indices, deltas = read_target_points(library, entry)
+                set_sparse_target_points(
+                    blendshape, index, indices, deltas, item)
+            if target['keys']:
+                set_keys(
+                    weight_plug,
+                    [(frame + frame_offset, value)
+                     for frame, value in target['keys']],
+                    target['tangents'])
+            else:
+                cmds.setAttr(weight_plug, target['weight'])
+            weight_plugs.append(weight_plug)
+    finally:
+        cmds.undoInfo(closeChunk=True)
+    return weight_plugs
@@ -0,0 +1,283 @@
+'''
+This module contain helpers to move mesh points between maya and contiguous
+float arrays. The points are read straight from the mesh internal buffer,
+this avoid to create a python MPoint per vertex and let the math be done in
+batch with numpy.
+numpy is optional, when it's not available the callers are expected to
+fallback on the OpenMaya loops (check numpy is not None).
+'''
+
+import ctypes
+
+import maya.OpenMaya as om
+import maya.api.OpenMaya as om2
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+
+# {ctypes type: (MScriptUtil, pointer, capacity)}, the (n, 4) buffers given
+# to the OpenMaya 1 point arrays, reused from a call to another.
+_buffers = {}
+
+def get_mesh_dagpath(mesh):
+    '''
+    return an OpenMaya 1 MDagPath extended to the mesh shape
+    :mesh string: a mesh shape or its transform
+    '''
+    selection_list = om.MSelectionList()
+    selection_list.add(mesh)
+    dagpath = om.MDagPath()
+    selection_list.getDagPath(0, dagpath)
+    if dagpath.hasFn(om.MFn.kTransform):
+        dagpath.extendToShape()
+    return dagpath
+
+
+def get_points_array(mesh):
+    '''
+    return the object space points of the mesh as a (n, 3) float64 array.
+    The internal buffer is copied, the returned array is safe to modify.
+    :mesh string: a mesh shape or its transform
+    '''
+    fn_mesh = om.MFnMesh(get_mesh_dagpath(mesh))
+    count = fn_mesh.numVertices()
+    if not count:
+        return numpy.zeros((0, 3), dtype=numpy.float64)
+    pointer = int(fn_mesh.getRawPoints())
+    buffer = (ctypes.c_float * (count * 3)).from_address(pointer)
+    points = numpy.frombuffer(buffer, dtype=numpy.float32, count=count * 3)
+    return points.reshape(count, 3).astype(numpy.float64)
+
+
+def get_mplug(plug):
+    '''
+    return the OpenMaya 1 MPlug of a plug name
+    '''
+    selection_list = om.MSelectionList()
+    selection_list.add(plug)
+    mplug = om.MPlug()
+    selection_list.getPlug(0, mplug)
+    return mplug
+
+
+def get_plug_points_array(plug, frame=None):
+    '''
+    return the points of the mesh data hold by a plug as a (n, 3) float64
+    array. The plug is evaluated but nothing is created or connected in the
+    scene.
+    :plug string: a mesh data plug (e.g. "blendShape1.input[0].inputGeometry")
+    :frame float: evaluate the plug at this frame instead of the current time
+    (the scene time doesn't change).
+    '''
+    mplug = get_mplug(plug)
+    if frame is None:
+        data = mplug.asMObject()
+    else:
+        time = om.MTime(frame, om.MTime.uiUnit())
+        data = mplug.asMObject(om.MDGContext(time))
+    fn_mesh = om.MFnMesh(data)
+    count = fn_mesh.numVertices()
+    if not count:
+        return numpy.zeros((0, 3), dtype=numpy.float64)
+    pointer = int(fn_mesh.getRawPoints())
+    buffer = (ctypes.c_float * (count * 3)).from_address(pointer)
+    points = numpy.frombuffer(buffer, dtype=numpy.float32, count=count * 3)
+    return points.reshape(count, 3).astype(numpy.float64)
+
+
+def get_plug_points(plug):
+    '''
+    same as get_plug_points_array, but return an OpenMaya 2 MPointArray.
+    This is the fallback used when numpy isn't available.
+    '''
+    selection_list = om2.MSelectionList()
+    selection_list.add(plug)
+    return om2.MFnMesh(selection_list.getPlug(0).asMObject()).getPoints()
+
+
+def get_points_buffer(ctype, count):
+    '''
+    return the pointer and a (count, 4) numpy view of a buffer of the ctype
+    (ctypes.c_float or ctypes.c_double) readable by the OpenMaya 1 point
+    arrays. MScriptUtil can't allocate a buffer without a list of its size,
+    the buffer is kept and only reallocated (at the next power of two) when
+    a larger mesh comes. The content is left by the previous call.
+    '''
+    util, pointer, capacity = _buffers.get(ctype, (None, None, 0))
+    if util is None or count > capacity:
+        capacity = 1 << max(count - 1, 0).bit_length()
+        util = om.MScriptUtil()
+        util.createFromList([0.0] * (capacity * 4), capacity * 4)
+        if ctype is ctypes.c_float:
+            pointer = util.asFloat4Ptr()
+        else:
+            pointer = util.asDouble4Ptr()
+        _buffers[ctype] = util, pointer, capacity
+    buffer = (ctype * (count * 4)).from_address(int(pointer))
+    array = numpy.frombuffer(buffer, dtype=ctype).reshape(count, 4)
+    return pointer, array
+
+
+def set_points_array(mesh, points):
+    '''
+    write a (n, 3) array as the object space points of the mesh with one
+    single setPoints call. The points are copied in a (n, 4) float buffer
+    given to MFloatPointArray, like get_points_array no python object is
+    created per vertex.
+    :mesh string: a mesh shape or its transform
+    :points numpy.array
+    '''
+    count = len(points)
+    # the same pointer is filled and given to the array.
+    pointer, array = get_points_buffer(ctypes.c_float, count)
+    array[:, :3] = points
+    array[:, 3] = 1.0
+    fn_mesh = om.MFnMesh(get_mesh_dagpath(mesh))
+    fn_mesh.setPoints(
+        om.MFloatPointArray(pointer, count), om.MSpace.kObject)
+    fn_mesh.updateSurface()
+
+
+def get_point_array_plug(plug):
+    '''
+    return the points of a pointArray plug (e.g. a blendshape target
+    inputPointsTarget) as a (n, 3) float64 array. The MPointArray is copied
+    in a double buffer, no python object is created per point.
+    '''
+    try:
+        data = get_mplug(plug).asMObject()
+    except RuntimeError:
+        # the plug was never set.
+        data = None
+    if data is None or data.isNull():
+        return numpy.zeros((0, 3), dtype=numpy.float64)
+    array = om.MFnPointArrayData(data).array()
+    count = array.length()
+    if not count:
+        return numpy.zeros((0, 3), dtype=numpy.float64)
+    pointer, points = get_points_buffer(ctypes.c_double, count)
+    array.get(pointer)
+    return points[:, :3].copy()
+
+
+def set_point_array_plug(plug, points):
+    '''
+    write a (n, 3) array in a pointArray plug through an MPointArray built
+    from a double buffer. Careful, the plug is set through the API, it isn't
+    registered in the undo queue.
+    '''
+    count = len(points)
+    pointer, array = get_points_buffer(ctypes.c_double, count)
+    array[:, :3] = points
+    array[:, 3] = 1.0
+    data = om.MFnPointArrayData().create(om.MPointArray(pointer, count))
+    get_mplug(plug).setMObject(data)
+
+
+def get_component_list_plug(plug):
+    '''
+    return the indices of the components hold by a componentList plug (e.g.
+    a blendshape target inputComponentsTarget) as an int64 array.
+    '''
+    selection_list = om2.MSelectionList()
+    selection_list.add(plug)
+    try:
+        data = selection_list.getPlug(0).asMObject()
+    except RuntimeError:
+        # the plug was never set.
+        data = None
+    if data is None or data.isNull():
+        return numpy.zeros(0, dtype=numpy.int64)
+    fn_data = om2.MFnComponentListData(data)
+    indices = [
+        numpy.array(
+            om2.MFnSingleIndexedComponent(fn_data.get(i)).getElements(),
+            dtype=numpy.int64)
+        for i in range(fn_data.length())]
+    if not indices:
+        return numpy.zeros(0, dtype=numpy.int64)
+    return numpy.concatenate(indices)
+
+
+def set_component_list_plug(plug, indices, component=None):
+    '''
+    write the indices in a componentList plug as one single indexed
+    component (mesh vertices by default). Careful, the plug is set through
+    the API, it isn't registered in the undo queue.
+    '''
+    if component is None:
+        component = om2.MFn.kMeshVertComponent
+    fn_component = om2.MFnSingleIndexedComponent()
+    mobject = fn_component.create(component)
+    fn_component.addElements(om2.MIntArray(numpy.asarray(
+        indices, dtype=numpy.int64).tolist()))
+    fn_data = om2.MFnComponentListData()
+    data = fn_data.create()
+    fn_data.add(mobject)
+    selection_list = om2.MSelectionList()
+    selection_list.add(plug)
+    selection_list.getPlug(0).setMObject(data)
+
+
+def compute_relative_points(target_points, base_points, intermediate_points):
+    '''
+    return the intermediate points moved by the target/base difference:
+    intermediate + (target - base), computed in one batched operation.
+    '''
+    result = numpy.subtract(target_points, base_points)
+    result += intermediate_points
+    return result
+
+
+def get_sparse_deltas(target_points, base_points, epsilon):
+    '''
+    return the indices of the points moved more than epsilon between the base
+    and the target and their deltas as (indices, deltas) arrays.
+    '''
+    deltas = numpy.subtract(target_points, base_points)
+    indices = numpy.flatnonzero(
+        numpy.einsum('ij,ij->i', deltas, deltas) > epsilon * epsilon)
+    return indices, deltas[indices]
+
+
+def indices_to_components(indices, component='vtx'):
+    '''
+    convert a sorted indices list to a compact maya component list where the
+    contiguous indices are merged as ranges: [0, 1, 2, 5] -> vtx[0:2], vtx[5]
+    '''
+    components = []
+    start = previous = None
+    for index in indices:
+        index = int(index)
+        if previous is not None and index == previous + 1:
+            previous = index
+            continue
+        if start is not None:
+            components.append(_format_component(component, start, previous))
+        start = previous = index
+    if start is not None:
+        components.append(_format_component(component, start, previous))
+    return components
+
+
+def components_to_indices(components):
+    '''
+    convert a maya component list to the indices list, the ranges are
+    expanded: [vtx[0:2], vtx[5]] -> [0, 1, 2, 5]
+    '''
+    indices = []
+    for component in components:
+        content = component[component.index('[') + 1:component.rindex(']')]
+        if content == '*':
+            raise ValueError('unsupported component: ' + component)
+        start, _, end = content.partition(':')
+        indices.extend(range(int(start), int(end or start) + 1))
+    return indices
+
+
+def _format_component(component, start, end):
+    if start == end:
+        return '{}[{}]'.format(component, start)
+    return '{}[{}:{}]'.format(component, start, end)
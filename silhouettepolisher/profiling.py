@@ -0,0 +1,193 @@
+'''
+This module contain an opt-in instrumentation of the silhouettepolisher
+operations. When it's enabled, each stage of the instrumented operations
+record his wall time, the vertex count of the mesh processed and the number
+of nodes created and deleted during the stage. The records are kept in a ring
+buffer (the oldest are dropped) and can be dumped as json.
+When it's disabled (the default), the stages cost a flag check.
+    from silhouettepolisher import profiling
+    profiling.enable_profiling()
+    ... apply the sculpts ...
+    profiling.dump_profiling_report('/tmp/silhouettepolisher.json')
+'''
+
+import json
+import time
+from collections import deque, OrderedDict
+from functools import wraps
+
+import maya.api.OpenMaya as om2
+from maya import cmds
+
+from silhouettepolisher.constants import PROFILING_BUFFER_SIZE
+
+
+_enabled = False
+_records = deque(maxlen=PROFILING_BUFFER_SIZE)
+# stack of the running instrumented operations names.
+_operations = []
+_node_counts = {'created': 0, 'deleted': 0}
+_callback_ids = []
+
+
+def enable_profiling(enabled=True):
+    '''
+    enable or disable the profiling. The node created and deleted are counted
+    with DG callbacks installed only while the profiling is enabled.
+    '''
+    global _enabled
+    if enabled == _enabled:
+        return
+    _enabled = enabled
+    if enabled:
+        _callback_ids.append(
+            om2.MDGMessage.addNodeAddedCallback(_node_added, 'dependNode'))
+        _callback_ids.append(
+            om2.MDGMessage.addNodeRemovedCallback(_node_removed, 'dependNode'))
+        return
+    om2.MMessage.removeCallbacks(_callback_ids)
+    del _callback_ids[:]
+
+
+def is_profiling_enabled():
+    return _enabled
+
+
+def _node_added(*_):
+    _node_counts['created'] += 1
+
+
+def _node_removed(*_):
+    _node_counts['deleted'] += 1
+
+
+class _NullStage(object):
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *_):
+        return False
+
+
+_NULL_STAGE = _NullStage()
+
+
+class _Stage(object):
+    def __init__(self, operation, name, mesh=None):
+        self.operation = operation
+        self.name = name
+        self.mesh = mesh
+
+    def __enter__(self):
+        self.vertices = count_vertices(self.mesh) if self.mesh else None
+        self.created = _node_counts['created']
+        self.deleted = _node_counts['deleted']
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *_):
+        seconds = time.perf_counter() - self.start
+        _records.append(OrderedDict((
+            ('operation', self.operation),
+            ('stage', self.name),
+            ('seconds', seconds),
+            ('vertices', self.vertices),
+            ('nodes_created', _node_counts['created'] - self.created),
+            ('nodes_deleted', _node_counts['deleted'] - self.deleted),
+            ('timestamp', time.time()))))
+        return False
+
+
+def profile_stage(name, mesh=None):
+    '''
+    return a context manager recording the stage of the running operation.
+    :name string: the stage name
+    :mesh string: the mesh processed, used to record the vertex count
+    '''
+    if not _enabled:
+        return _NULL_STAGE
+    operation = _operations[-1] if _operations else None
+    return _Stage(operation, name, mesh)
+
+
+def profiled(operation):
+    '''
+    this decorator record the decorated function as an operation, the stages
+    ran inside are recorded with the operation name. The whole operation is
+    recorded as the stage "total".
+    '''
+    def decorator(func):
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            if not _enabled:
+                return func(*args, **kwargs)
+            _operations.append(operation)
+            try:
+                with _Stage(operation, 'total'):
+                    return func(*args, **kwargs)
+            finally:
+                _operations.pop()
+        return wrapper
+    return decorator
+
+
+def count_vertices(mesh):
+    if not cmds.objExists(mesh):
+        return None
+    return cmds.polyEvaluate(mesh, vertex=True)
+
+
+def get_profiling_records():
+    '''
+    return the recorded stages, from the oldest to the newest.
+    '''
+    return list(_records)
+
+
+def clear_profiling_records():
+    _records.clear()
+
+
+def summarize_profiling_records(records=None):
+    '''
+    return the records aggregated per operation and stage as a list of dict:
+    operation, stage, count, total, mean and max seconds, max vertices, nodes
+    created and deleted.
+    '''
+    records = get_profiling_records() if records is None else records
+    summary = OrderedDict()
+    for record in records:
+        key = record['operation'], record['stage']
+        entry = summary.setdefault(key, OrderedDict((
+            ('operation', record['operation']),
+            ('stage', record['stage']),
+            ('count', 0),
+            ('total', 0.0),
+            ('mean', 0.0),
+            ('max', 0.0),
+            ('vertices', None),
+            ('nodes_created', 0),
+            ('nodes_deleted', 0))))
+        entry['count'] += 1
+        entry['total'] += record['seconds']
+        entry['max'] = max(entry['max'], record['seconds'])
+        entry['mean'] = entry['total'] / entry['count']
+        if record['vertices'] is not None:
+            entry['vertices'] = max(entry['vertices'] or 0, record['vertices'])
+        entry['nodes_created'] += record['nodes_created']
+        entry['nodes_deleted'] += record['nodes_deleted']
+    return list(summary.values())
+
+
+def get_profiling_report():
+    return OrderedDict((
+        ('summary', summarize_profiling_records()),
+        ('records', get_profiling_records())))
+
+
+def dump_profiling_report(filepath):
+    '''
+    write the summary and the records as json in the given file.
+    '''
+    with open(filepath, 'w') as f:
+        json.dump(get_profiling_report(), f, indent=2)
@@ -0,0 +1,132 @@
+'''
+This module contain the vertex mapping of the proxy working copies. A proxy
+is a reduced copy of the original mesh keeping a subset of the original
+vertices, it's sculpted instead of the full resolution mesh (see
+setup_proxy_working_copy in core.py).
+The mapping is built on the rest points (the original shape before the
+deformers), it doesn't depend on the pose:
+    - each proxy vertex knows the original vertex it comes from, it's used to
+      pose the proxy.
+    - each original vertex is interpolated from his nearest proxy vertices
+      with inverse distance weights, stored as a sparse matrix
+      (vertices, proxy vertices).
+On apply, the proxy deltas are pushed to the full resolution with one sparse
+product. The mapping is saved in the cache directory, keyed by the topology
+of the original mesh and the reduction, it's reused by the next sessions.
+numpy is required.
+'''
+
+from maya import cmds
+
+from silhouettepolisher.cache import get_topology_cache_filepath
+from silhouettepolisher.constants import PROXY_NEIGHBOURS
+from silhouettepolisher.points import numpy, get_points_array
+from silhouettepolisher.spatial import (
+    UniformGrid, compute_inverse_distance_weights)
+from silhouettepolisher.sparse import CSRMatrix, load_csr_matrix
+from silhouettepolisher.topology import get_topology_hash
+
+
+# {filepath: ProxyMapping}
+_mappings = {}
+
+
+class ProxyMapping(object):
+    '''
+    :matrix CSRMatrix: (vertices, proxy vertices) interpolation weights
+    :proxy_vertices numpy.array: the original vertex of each proxy vertex
+    :proxy_topology string: the topology hash of the proxy
+    :filepath string: the cache file
+    '''
+    def __init__(self, matrix, proxy_vertices, proxy_topology, filepath):
+        self.matrix = matrix
+        self.proxy_vertices = proxy_vertices
+        self.proxy_topology = proxy_topology
+        self.filepath = filepath
+
+    def save(self):
+        self.matrix.save(
+            self.filepath, proxy_vertices=self.proxy_vertices,
+            proxy_topology=numpy.array(self.proxy_topology))
+
+    def compute_deltas(self, proxy_deltas):
+        '''
+        return the (vertices, 3) deltas interpolated from the proxy deltas.
+        '''
+        return self.matrix.dot(proxy_deltas)
+
+
+def get_rest_points(mesh):
+    '''
+    return the points of the original shape of the mesh (the intermediate
+    shape feeding the deformers) or the current points if the mesh isn't
+    deformed.
+    '''
+    shapes = cmds.listRelatives(
+        str(mesh), shapes=True, fullPath=True, type='mesh') or []
+    for shape in shapes:
+        if not cmds.getAttr(shape + '.intermediateObject'):
+            continue
+        if cmds.listConnections(
+                shape + '.inMesh', source=True, destination=False):
+            continue
+        return get_points_array(shape)
+    return get_points_array(str(mesh))
+
+
+def build_proxy_mapping(
+        points, proxy_points, proxy_topology, filepath,
+        neighbours=PROXY_NEIGHBOURS):
+    '''
+    build the mapping of a proxy from the rest points of the original mesh
+    and the rest points of the proxy.
+    '''
+    _, proxy_vertices = UniformGrid(points).query(proxy_points, 1)
+    distances, indices = UniformGrid(proxy_points).query(points, neighbours)
+    matrix = CSRMatrix.from_neighbours(
+        indices, compute_inverse_distance_weights(distances),
+        len(proxy_points))
+    return ProxyMapping(
+        matrix, proxy_vertices[:, 0], proxy_topology, filepath)
+
+
+def get_proxy_mapping_filepath(mesh, percentage):
+    return get_topology_cache_filepath(
+        'proxy', get_topology_hash(mesh), percentage)
+
+
+def load_proxy_mapping(filepath):
+    '''
+    return the mapping saved in the file, None if the file doesn't exist.
+    '''
+    mapping = _mappings.get(filepath)
+    if mapping is not None:
+        return mapping
+    try:
+        matrix, arrays = load_csr_matrix(filepath)
+    except (IOError, OSError):
+        return None
+    mapping = ProxyMapping(
+        matrix, arrays['proxy_vertices'], str(arrays['proxy_topology']),
+        filepath)
+    _mappings[filepath] = mapping
+    return mapping
+
+
+def get_proxy_mapping(mesh, proxy, rest_points, percentage):
+    '''
+    return the mapping between the mesh and his proxy, it's loaded from the
+    cache if the proxy topology matches, otherwise it's built and saved.
+    :rest_points numpy.array: the rest points of the mesh, the proxy must
+    still be at rest
+    '''
+    filepath = get_proxy_mapping_filepath(mesh, percentage)
+    proxy_topology = get_topology_hash(proxy)
+    mapping = load_proxy_mapping(filepath)
+    if mapping is not None and mapping.proxy_topology == proxy_topology:
+        return mapping
+    mapping = build_proxy_mapping(
+        rest_points, get_points_array(proxy), proxy_topology, filepath)
+    mapping.save()
+    _mappings[filepath] = mapping
+    return mapping
@@ -0,0 +1,336 @@
+'''
+This module contain an in memory index of the silhouette polisher nodes:
+for each original mesh, its working copy, its display copy and its ordered
+corrective blendshapes.
+The index is built once by scanning the scene, then it's kept up to date by
+OpenMaya callbacks (connections made/broken on the message attributes, nodes
+removed). The lookups don't have to list the connections or the history.
+The nodes are stored as MObjectHandle, the index survives the renames. The
+handles are bucketed by hashCode (which isn't unique) and compared with ==.
+'''
+
+import maya.api.OpenMaya as om2
+from maya import cmds
+
+from silhouettepolisher.constants import (
+    WORKING_MESH_ATTR, DISPLAY_MESH_ATTR, CORRECTIVE_BLENDSHAPE_ATTR)
+
+
+INDEXED_ATTRIBUTES = (
+    WORKING_MESH_ATTR, DISPLAY_MESH_ATTR, CORRECTIVE_BLENDSHAPE_ATTR)
+# the connections changing the deformation history, the correctives order has
+# to be sorted again (e.g. reorderDeformers).
+HISTORY_ATTRIBUTES = ('inputGeometry', 'inMesh')
+# scene messages after which the index is rebuilt.
+SCENE_MESSAGES = (
+    'kAfterNew', 'kAfterOpen', 'kAfterImport', 'kAfterCreateReference',
+    'kAfterLoadReference', 'kAfterUnloadReference', 'kAfterRemoveReference')
+# scene messages before which the index is invalidated, the callbacks don't
+# update it during the load.
+SCENE_LOADING_MESSAGES = ('kBeforeNew', 'kBeforeOpen', 'kBeforeImport')
+
+# the callbacks installed before a module reload are removed.
+if globals().get('_scene_index') is not None:
+    uninstall_scene_index()
+_scene_index = None
+
+
+def get_scene_index():
+    '''
+    return the scene index and install it at the first call.
+    '''
+    global _scene_index
+    if _scene_index is None:
+        _scene_index = SceneIndex()
+        _scene_index.install()
+    return _scene_index
+
+
+def uninstall_scene_index():
+    global _scene_index
+    if _scene_index is not None:
+        _scene_index.uninstall()
+    _scene_index = None
+
+
+def get_node_object(node):
+    '''
+    return the MObject of a node name or None if the node doesn't exist
+    '''
+    selection_list = om2.MSelectionList()
+    try:
+        selection_list.add(node)
+    except RuntimeError:
+        return None
+    return selection_list.getDependNode(0)
+
+
+def get_node_name(handle):
+    '''
+    return the node name of an MObjectHandle or None if the node is dead
+    '''
+    if not handle.isValid() or not handle.isAlive():
+        return None
+    mobject = handle.object()
+    if mobject.hasFn(om2.MFn.kDagNode):
+        return om2.MFnDagNode(mobject).partialPathName()
+    return om2.MFnDependencyNode(mobject).name()
+
+
+class MeshEntry(object):
+    '''
+    the indexed data of an original mesh.
+    '''
+    def __init__(self, handle):
+        self.handle = handle
+        self.working_copy = None
+        self.display_copy = None
+        self.correctives = []
+        # the correctives are sorted in history order at the first query
+        # after a change.
+        self.sorted = True
+
+
+def find_handle(handles, handle):
+    '''
+    return the index of the handle in the list or -1, the handles are
+    compared with == (the hashCode can be shared by several nodes).
+    '''
+    for i, other in enumerate(handles):
+        if other == handle:
+            return i
+    return -1
+
+
+class SceneIndex(object):
+    def __init__(self):
+        self._entries = {}  # {original hash: [MeshEntry]}
+        # {indexed node hash: [(node handle, original handle)]}
+        self._originals = {}
+        self._callbacks = []
+        self._dirty = True
+
+    def install(self):
+        self._callbacks.append(
+            om2.MDGMessage.addConnectionCallback(self._connection_changed))
+        self._callbacks.append(
+            om2.MDGMessage.addNodeAddedCallback(
+                self._node_added, 'dependNode'))
+        self._callbacks.append(
+            om2.MDGMessage.addNodeRemovedCallback(
+                self._node_removed, 'dependNode'))
+        for message in SCENE_MESSAGES:
+            self._callbacks.append(
+                om2.MSceneMessage.addCallback(
+                    getattr(om2.MSceneMessage, message), self._scene_changed))
+        for message in SCENE_LOADING_MESSAGES:
+            self._callbacks.append(
+                om2.MSceneMessage.addCallback(
+                    getattr(om2.MSceneMessage, message), self._scene_loading))
+
+    def uninstall(self):
+        if self._callbacks:
+            om2.MMessage.removeCallbacks(self._callbacks)
+        self._callbacks = []
+        self.clear()
+
+    def clear(self):
+        self._entries.clear()
+        self._originals.clear()
+        self._dirty = True
+
+    def rebuild(self):
+        '''
+        scan the scene to build the index from scratch.
+        '''
+        self._entries.clear()
+        self._originals.clear()
+        for attribute in INDEXED_ATTRIBUTES:
+            plugs = cmds.ls('*.' + attribute, recursive=True) or []
+            for plug in plugs:
+                node = plug.rsplit('.', 1)[0]
+                sources = cmds.listConnections(
+                    plug, source=True, destination=False) or []
+                if not sources:
+                    continue
+                self._register(
+                    get_node_object(sources[0]), get_node_object(node),
+                    attribute)
+        self._dirty = False
+
+    def get_working_copy(self, mesh):
+        entry = self._get_entry(mesh)
+        if not entry or not entry.working_copy:
+            return None
+        return get_node_name(entry.working_copy)
+
+    def get_display_copy(self, mesh):
+        entry = self._get_entry(mesh)
+        if not entry or not entry.display_copy:
+            return None
+        return get_node_name(entry.display_copy)
+
+    def has_working_copy(self, mesh):
+        entry = self._get_entry(mesh)
+        return bool(entry and (entry.working_copy or entry.display_copy))
+
+    def get_meshes_with_working_copy(self):
+        '''
+        return the original meshes having a working copy
+        '''
+        if self._dirty:
+            self.rebuild()
+        return [
+            get_node_name(entry.handle) for entry in self._iter_entries()
+            if entry.working_copy]
+
+    def get_corrected_meshes(self):
+        '''
+        return the original meshes having at least one corrective blendshape
+        '''
+        if self._dirty:
+            self.rebuild()
+        return [
+            get_node_name(entry.handle) for entry in self._iter_entries()
+            if entry.correctives]
+
+    def get_corrective_blendshapes(self, mesh):
+        '''
+        return the corrective blendshapes of the mesh in history order
+        '''
+        entry = self._get_entry(mesh)
+        if not entry:
+            return []
+        if not entry.sorted:
+            self._sort_correctives(entry)
+        return [get_node_name(handle) for handle in entry.correctives]
+
+    def get_original_mesh(self, node):
+        '''
+        return the original mesh of a working copy, display copy or corrective
+        blendshape.
+        '''
+        if self._dirty:
+            self.rebuild()
+        mobject = get_node_object(node)
+        if mobject is None:
+            return None
+        original = self._find_original(om2.MObjectHandle(mobject))
+        entry = self._find_entry(original) if original else None
+        return get_node_name(entry.handle) if entry else None
+
+    def _iter_entries(self):
+        for entries in self._entries.values():
+            for entry in entries:
+                yield entry
+
+    def _find_entry(self, handle):
+        for entry in self._entries.get(handle.hashCode(), []):
+            if entry.handle == handle:
+                return entry
+        return None
+
+    def _find_original(self, handle):
+        for node, original in self._originals.get(handle.hashCode(), []):
+            if node == handle:
+                return original
+        return None
+
+    def _get_entry(self, mesh):
+        if self._dirty:
+            self.rebuild()
+        mobject = get_node_object(mesh)
+        if mobject is None:
+            return None
+        return self._find_entry(om2.MObjectHandle(mobject))
+
+    def _sort_correctives(self, entry):
+        mesh = get_node_name(entry.handle)
+        shapes = cmds.listRelatives(
+            mesh, shapes=True, noIntermediate=True, fullPath=True,
+            type='mesh') or [mesh]
+        history = cmds.ls(
+            cmds.listHistory(shapes[0] + '.inMesh') or [], type='blendShape')
+        history = [
+            om2.MObjectHandle(get_node_object(node)) for node in history]
+        # a corrective out of the history isn't returned (it's not deforming
+        # this mesh anymore).
+        order = [(find_handle(history, h), h) for h in entry.correctives]
+        entry.correctives = [h for i, h in sorted(
+            (o for o in order if o[0] >= 0), key=lambda o: o[0])]
+        entry.sorted = True
+
+    def _register(self, original, node, attribute):
+        if original is None or node is None:
+            return
+        original_handle = om2.MObjectHandle(original)
+        node_handle = om2.MObjectHandle(node)
+        entry = self._find_entry(original_handle)
+        if entry is None:
+            entry = MeshEntry(original_handle)
+            self._entries.setdefault(
+                original_handle.hashCode(), []).append(entry)
+        if attribute == WORKING_MESH_ATTR:
+            entry.working_copy = node_handle
+        elif attribute == DISPLAY_MESH_ATTR:
+            entry.display_copy = node_handle
+        elif attribute == CORRECTIVE_BLENDSHAPE_ATTR:
+            if find_handle(entry.correctives, node_handle) < 0:
+                entry.correctives.append(node_handle)
+                entry.sorted = False
+        originals = self._originals.setdefault(node_handle.hashCode(), [])
+        originals[:] = [o for o in originals if o[0] != node_handle]
+        originals.append((node_handle, original_handle))
+
+    def _unregister(self, node):
+        node_handle = om2.MObjectHandle(node)
+        node_hash = node_handle.hashCode()
+        entries = self._entries.get(node_hash, [])
+        entries[:] = [e for e in entries if e.handle != node_handle]
+        original = self._find_original(node_handle)
+        originals = self._originals.get(node_hash, [])
+        originals[:] = [o for o in originals if o[0] != node_handle]
+        entry = self._find_entry(original) if original else None
+        if entry is None:
+            return
+        if entry.working_copy == node_handle:
+            entry.working_copy = None
+        if entry.display_copy == node_handle:
+            entry.display_copy = None
+        entry.correctives = [
+            h for h in entry.correctives if h != node_handle]
+
+    def _connection_changed(self, source_plug, destination_plug, made, *_):
+        if self._dirty:
+            return
+        attribute = om2.MFnAttribute(destination_plug.attribute()).name
+        if attribute in HISTORY_ATTRIBUTES:
+            for entry in self._iter_entries():
+                entry.sorted = False
+            return
+        if attribute not in INDEXED_ATTRIBUTES:
+            return
+        if made:
+            self._register(
+                source_plug.node(), destination_plug.node(), attribute)
+        else:
+            self._unregister(destination_plug.node())
+
+    def _node_added(self, node, *_):
+        if self._dirty:
+            return
+        # a node restored by an undo or a duplicated indexed node, the
+        # connections may be restored without callback, the index is rebuilt.
+        fn_node = om2.MFnDependencyNode(node)
+        if any(fn_node.hasAttribute(a) for a in INDEXED_ATTRIBUTES):
+            self._dirty = True
+
+    def _node_removed(self, node, *_):
+        if not self._dirty:
+            self._unregister(node)
+
+    def _scene_loading(self, *_):
+        self._dirty = True
+
+    def _scene_changed(self, *_):
+        self.clear()
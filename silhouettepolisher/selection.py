@@ -22,6 +22,17 @@ def generic_method_creating_a_deformer_from_selection():
     return
 careful, the used order is really important. A bad wrapper managment can
 create issue.
+Each of those decorators query (and most of them change) the maya selection.
+For big selections, the resolved_selection decorator does the same job in one
+pass: the selection is queried once, filtered and checked in memory by the
+given steps, and the resolved nodes are passed to the function:
+@resolved_selection(
+    ls_filter(type=('mesh', 'transform')),
+    shapes_to_transforms,
+    contains_at_least(2, 'transform'))
+def generic_method_creating_a_deformer_from_selection(nodes):
+    # all your process ...
+    return
 '''
 
 from functools import wraps
@@ -159,3 +170,147 @@ def selection_contains_exactly(number, node_type):
             return func(*args, **kwargs)
         return wrapper
     return decorator
+
+
+class InvalidSelection(Exception):
+    '''
+    raised by a resolved_selection step when the selection doesn't match
+    the requirements. The message is displayed as maya warning.
+    '''
+
+
+def resolved_selection(*steps, **options):
+    '''
+    this decorator query the selection once, resolve it through the given
+    steps and pass the resulting long names list as first argument of the
+    decorated function. The maya selection is only changed if select=True
+    is given. A caller can skip the selection query by passing nodes=[...]
+    (an empty list is an empty selection).
+    A step is a function taking the nodes list and a dict {node: nodetype}
+    shared between the steps, and returning the new nodes list. The
+    resolution stops as soon as a step returns an empty list: cmds.ls([])
+    lists the whole scene, the steps never receive an empty list.
+    '''
+    select = options.pop('select', False)
+    assert not options  # unknown option
+
+    def decorator(func):
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            nodes = kwargs.pop('nodes', None)
+            if nodes is None:
+                nodes = cmds.ls(selection=True, long=True)
+            elif nodes:
+                nodes = cmds.ls(nodes, long=True)
+            if not nodes:
+                return cmds.warning('Select at least one node')
+            nodetypes = {}
+            try:
+                for step in steps:
+                    nodes = step(nodes, nodetypes)
+                    if not nodes:
+                        raise InvalidSelection(
+                            'The selection doesn\'t contain any valid node')
+            except InvalidSelection as e:
+                return cmds.warning(str(e))
+            if select:
+                cmds.select(nodes)
+            return func(nodes, *args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def get_nodetypes(nodes, nodetypes):
+    '''
+    fill the nodetypes cache with the missing nodes with a single cmds.ls call
+    and return the node types in the nodes order.
+    '''
+    missing = [node for node in nodes if node not in nodetypes]
+    # cmds.ls([]) would list the whole scene.
+    if missing:
+        result = cmds.ls(missing, showType=True, long=True)
+        nodetypes.update(zip(result[::2], result[1::2]))
+    return [nodetypes.get(node) for node in nodes]
+
+
+def ls_filter(**ls_kwargs):
+    '''
+    resolver step, equivalent to filter_selection
+    '''
+    def step(nodes, nodetypes):
+        if not nodes:
+            return []
+        return cmds.ls(nodes, long=True, **ls_kwargs)
+    return step
+
+
+def shapes_to_transforms(nodes, nodetypes):
+    '''
+    resolver step, equivalent to select_shape_transforms. The duplicated
+    transforms are removed.
+    '''
+    result = []
+    for node, nodetype in zip(nodes, get_nodetypes(nodes, nodetypes)):
+        if nodetype != 'transform':
+            node = node.rsplit('|', 1)[0]
+            nodetypes[node] = 'transform'
+        if node not in result:
+            result.append(node)
+    return result
+
+
+def transforms_with_children_types(*types):
+    '''
+    resolver step, equivalent to filter_transforms_by_children_types
+    '''
+    def step(nodes, nodetypes):
+        transforms = [
+            node for node, nodetype in zip(
+                nodes, get_nodetypes(nodes, nodetypes))
+            if nodetype == 'transform']
+        if not transforms:
+            return nodes
+        children = cmds.listRelatives(
+            transforms, children=True, noIntermediate=True, fullPath=True,
+            type=types) or []
+        valid_transforms = set(child.rsplit('|', 1)[0] for child in children)
+        return [
+            node for node in nodes
+            if nodetypes[node] != 'transform' or node in valid_transforms]
+    return step
+
+
+def contains_at_least(number, node_type):
+    '''
+    resolver step, equivalent to selection_contains_at_least. The types
+    are counted from the nodetypes cache (exact type, not inherited).
+    '''
+    assert isinstance(node_type, str)  # node_type argument must be a string
+    assert isinstance(number, int)  # number argument must be an int
+
+    def step(nodes, nodetypes):
+        count = get_nodetypes(nodes, nodetypes).count(node_type)
+        if count < number:
+            raise InvalidSelection(
+                'The selection must contains at least {} nodes {} '
+                'and it contains {}'.format(number, node_type, count))
+        return nodes
+    return step
+
+
+def contains_exactly(number, node_type):
+    '''
+    resolver step, equivalent to selection_contains_exactly. The types
+    are counted from the nodetypes cache (exact type, not inherited).
+    '''
+    assert isinstance(node_type, str)  # node_type argument must be a string
+    assert isinstance(number, int)  # number argument must be an int
+
+    def step(nodes, nodetypes):
+        count = get_nodetypes(nodes, nodetypes).count(node_type)
+        if count != number:
+            raise InvalidSelection(
+                'The selection must contains exactly {} node(s) {} '
+                'and it contains {}'.format(number, node_type, count))
+        return nodes
+    return step
@@ -0,0 +1,191 @@
+'''
+This module contain the smoothing of the working copies in the delta space:
+the deltas (working copy - display copy) are smoothed instead of the points,
+the pose under the correction isn't touched. Each iteration moves the deltas
+toward the average of their neighbours (uniform laplacian). The relax mode
+alternates a shrinking and an inflating step (taubin) to smooth the
+correction without reducing its amplitude.
+The adjacency is a sparse matrix built from the faces and cached in the cache
+directory by topology hash, and in memory by mesh and vertex/face counts (the
+topology isn't hashed again at each smoothing). Only the vertices moved by
+the sculpt and the rings reached by the iterations are processed, a localized
+correction on a dense mesh costs a fraction of the full mesh.
+numpy is required.
+'''
+
+import os
+
+from maya import cmds
+
+from silhouettepolisher.cache import get_topology_cache_filepath
+from silhouettepolisher.constants import (
+    WORKING_MESH_ATTR, SMOOTH_ITERATIONS, SMOOTH_STRENGTH)
+from silhouettepolisher.core import (
+    get_connected, has_attr, mesh_has_working_copy, ensure_display_copies)
+from silhouettepolisher.points import (
+    numpy, get_points_array, set_points_array)
+from silhouettepolisher.profiling import profiled, profile_stage
+from silhouettepolisher.sceneindex import get_scene_index
+from silhouettepolisher.selection import (
+    resolved_selection, ls_filter, shapes_to_transforms, contains_at_least)
+from silhouettepolisher.sparse import CSRMatrix, load_csr_matrix
+from silhouettepolisher.topology import get_fn_mesh, get_topology_hash
+
+
+# the inflating factor of the relax steps, a bit stronger than the shrinking
+# step to not shrink the low frequencies.
+RELAX_FACTOR = -1.06
+# above this ratio of the vertices reached, the whole mesh is smoothed.
+FULL_MESH_RATIO = 0.5
+
+# {filepath: CSRMatrix}
+_matrices = {}
+# {(mesh path, vertex count, face count): CSRMatrix}
+_meshes_matrices = {}
+
+
+def build_adjacency_matrix(counts, connects, vertex_count):
+    '''
+    return the (vertices, vertices) matrix averaging the neighbours of each
+    vertex (the vertices sharing an edge, each one weighted by 1 / valence).
+    :counts numpy.array: the vertex count of each face
+    :connects numpy.array: the vertices of the faces
+    '''
+    counts = numpy.asarray(counts, dtype=numpy.int64)
+    connects = numpy.asarray(connects, dtype=numpy.int64)
+    # each face vertex is linked to the next one, the last to the first.
+    starts = numpy.cumsum(counts) - counts
+    following = numpy.arange(len(connects)) + 1
+    following[starts + counts - 1] = starts
+    keys = numpy.unique(numpy.concatenate((
+        connects * vertex_count + connects[following],
+        connects[following] * vertex_count + connects)))
+    rows, columns = numpy.divmod(keys, vertex_count)
+    valences = numpy.bincount(rows, minlength=vertex_count)
+    indptr = numpy.zeros(vertex_count + 1, dtype=numpy.int64)
+    numpy.cumsum(valences, out=indptr[1:])
+    return CSRMatrix(
+        indptr, columns, 1.0 / valences[rows], (vertex_count, vertex_count))
+
+
+def get_adjacency_matrix(mesh):
+    '''
+    return the adjacency matrix of the mesh, it's loaded from the cache or
+    built from the faces and saved. A mesh already smoothed with the same
+    vertex and face counts reuses his matrix without hashing the topology.
+    '''
+    fn_mesh = get_fn_mesh(mesh)
+    key = (fn_mesh.fullPathName(), fn_mesh.numVertices, fn_mesh.numPolygons)
+    matrix = _meshes_matrices.get(key)
+    if matrix is not None:
+        return matrix
+    filepath = get_topology_cache_filepath(
+        'adjacency', get_topology_hash(mesh))
+    matrix = _matrices.get(filepath)
+    if matrix is None and os.path.exists(filepath):
+        matrix, _ = load_csr_matrix(filepath)
+    if matrix is None:
+        with profile_stage('adjacency', mesh):
+            counts, connects = fn_mesh.getVertices()
+            matrix = build_adjacency_matrix(
+                counts, connects, fn_mesh.numVertices)
+        matrix.save(filepath)
+    _matrices[filepath] = matrix
+    _meshes_matrices[key] = matrix
+    return matrix
+
+
+def get_smoothing_region(matrix, vertices, iterations):
+    '''
+    return the sorted vertices reached from the given vertices in the
+    number of iterations (the rings around them).
+    '''
+    reached = numpy.zeros(matrix.shape[0], dtype=bool)
+    reached[vertices] = True
+    front = numpy.asarray(vertices, dtype=numpy.int64)
+    for _ in range(iterations):
+        neighbours = matrix.take_rows(front).indices
+        front = numpy.unique(neighbours[~reached[neighbours]])
+        if not len(front):
+            break
+        reached[front] = True
+    return numpy.flatnonzero(reached)
+
+
+def smooth_deltas(
+        deltas, matrix, iterations=SMOOTH_ITERATIONS,
+        strength=SMOOTH_STRENGTH, relax=False):
+    '''
+    return the (vertices, 3) deltas smoothed through the adjacency matrix.
+    The vertices without neighbours keep their delta.
+    '''
+    deltas = numpy.array(deltas, dtype=numpy.float64)
+    moved = numpy.flatnonzero(numpy.any(deltas != 0, axis=1))
+    if not len(moved) or not iterations:
+        return deltas
+    region = None
+    if len(moved) <= FULL_MESH_RATIO * matrix.shape[0]:
+        region = get_smoothing_region(matrix, moved, iterations)
+    if region is None or len(region) > FULL_MESH_RATIO * matrix.shape[0]:
+        region = slice(None)
+        rows = matrix
+    else:
+        rows = matrix.take_rows(region)
+    isolated = numpy.flatnonzero(numpy.diff(rows.indptr) == 0)
+    for i in range(iterations):
+        factor = strength * RELAX_FACTOR if relax and i % 2 else strength
+        averages = rows.dot(deltas)
+        values = deltas[region]
+        averages[isolated] = values[isolated]
+        values += factor * (averages - values)
+        deltas[region] = values
+    return deltas
+
+
+@profiled('smooth_working_copy')
+def smooth_working_copy(
+        working_copy, iterations=SMOOTH_ITERATIONS, strength=SMOOTH_STRENGTH,
+        relax=False):
+    '''
+    smooth the deltas sculpted on the working copy and write back the
+    result on the working copy. The deltas are relative to the display copy
+    (the pose of the setup frame), it's created if it doesn't exist yet.
+    '''
+    if numpy is None:
+        raise RuntimeError('numpy is required by the smoothing')
+    working_copy = str(working_copy)
+    original_mesh = get_connected(working_copy + '.' + WORKING_MESH_ATTR)[0]
+    ensure_display_copies([original_mesh])
+    base = get_scene_index().get_display_copy(original_mesh)
+    if base is None:
+        raise RuntimeError(
+            'the display copy of {} not found'.format(original_mesh))
+    matrix = get_adjacency_matrix(working_copy)
+    base_points = get_points_array(base)
+    with profile_stage('smooth', working_copy):
+        deltas = smooth_deltas(
+            get_points_array(working_copy) - base_points, matrix,
+            iterations, strength, relax)
+    with profile_stage('set points', working_copy):
+        set_points_array(working_copy, base_points + deltas)
+
+
+@resolved_selection(
+    ls_filter(type=('mesh', 'transform'), objectsOnly=True),
+    shapes_to_transforms,
+    contains_at_least(1, 'transform'))
+def smooth_selected_working_copys(
+        nodes, iterations=SMOOTH_ITERATIONS, strength=SMOOTH_STRENGTH,
+        relax=False):
+    '''
+    smooth the selected working copies or the working copies of the selected
+    meshes.
+    '''
+    scene_index = get_scene_index()
+    for node in nodes:
+        if mesh_has_working_copy(node):
+            node = scene_index.get_working_copy(node)
+        elif not has_attr(node, WORKING_MESH_ATTR):
+            continue
+        smooth_working_copy(node, iterations, strength, relax)
+    cmds.select(nodes)
@@ -0,0 +1,94 @@
+'''
+This module contain a minimal compressed sparse row matrix on numpy arrays,
+used to push the per vertex deltas through a precomputed vertex mapping
+(proxy, transfer) or a mesh adjacency (smoothing). scipy isn't shipped with
+maya, only the product, the rows extraction and the disk serialization are
+implemented.
+numpy is required.
+'''
+
+from silhouettepolisher.points import numpy
+
+
+class CSRMatrix(object):
+    '''
+    :indptr numpy.array: (rows + 1,) the rows start in indices and data
+    :indices numpy.array: the column of each value
+    :data numpy.array: the values
+    :shape tuple: (rows, columns)
+    '''
+    def __init__(self, indptr, indices, data, shape):
+        self.indptr = numpy.asarray(indptr, dtype=numpy.int64)
+        self.indices = numpy.asarray(indices, dtype=numpy.int64)
+        self.data = numpy.asarray(data, dtype=numpy.float64)
+        self.shape = tuple(int(size) for size in shape)
+
+    @classmethod
+    def from_neighbours(cls, indices, weights, columns):
+        '''
+        build a matrix from fixed width (rows, k) neighbours indices and
+        weights. The negative indices and the zero weights are dropped.
+        '''
+        indices = numpy.asarray(indices)
+        weights = numpy.asarray(weights, dtype=numpy.float64)
+        kept = (indices >= 0) & (weights != 0)
+        indptr = numpy.zeros(len(indices) + 1, dtype=numpy.int64)
+        numpy.cumsum(kept.sum(axis=1), out=indptr[1:])
+        return cls(
+            indptr, indices[kept], weights[kept], (len(indices), columns))
+
+    @property
+    def nnz(self):
+        return len(self.data)
+
+    def dot(self, array):
+        '''
+        return the product of the matrix by a (columns,) or (columns, n)
+        array.
+        '''
+        array = numpy.asarray(array, dtype=numpy.float64)
+        products = numpy.take(array, self.indices, axis=0)
+        products *= self.data.reshape((-1,) + (1,) * (array.ndim - 1))
+        result = numpy.zeros(
+            (self.shape[0],) + array.shape[1:], dtype=numpy.float64)
+        # the values of the rows are contiguous, each non empty row is the
+        # sum of the products between his start and the next row start.
+        rows = numpy.flatnonzero(numpy.diff(self.indptr))
+        if len(rows):
+            result[rows] = numpy.add.reduceat(
+                products, self.indptr[rows], axis=0)
+        return result
+
+    def take_rows(self, rows):
+        '''
+        return the (len(rows), columns) matrix of the given rows.
+        '''
+        rows = numpy.asarray(rows, dtype=numpy.int64)
+        counts = self.indptr[rows + 1] - self.indptr[rows]
+        indptr = numpy.zeros(len(rows) + 1, dtype=numpy.int64)
+        numpy.cumsum(counts, out=indptr[1:])
+        positions = numpy.repeat(self.indptr[rows] - indptr[:-1], counts)
+        positions += numpy.arange(indptr[-1])
+        return CSRMatrix(
+            indptr, self.indices[positions], self.data[positions],
+            (len(rows), self.shape[1]))
+
+    def save(self, filepath, **arrays):
+        '''
+        save the matrix as .npz, the extra arrays are saved along.
+        '''
+        numpy.savez(
+            filepath, indptr=self.indptr, indices=self.indices,
+            data=self.data, shape=numpy.array(self.shape), **arrays)
+
+
+def load_csr_matrix(filepath):
+    '''
+    return the matrix saved by CSRMatrix.save and a dict of the extra arrays.
+    '''
+    with numpy.load(filepath) as content:
+        arrays = {name: content[name] for name in content.files}
+    matrix = CSRMatrix(
+        arrays.pop('indptr'), arrays.pop('indices'), arrays.pop('data'),
+        arrays.pop('shape'))
+    return matrix, arrays
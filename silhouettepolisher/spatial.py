@@ -0,0 +1,227 @@
+'''
+This module contain a uniform grid spatial index to find the nearest points
+of a point cloud. The points are bucketed in cubic cells sorted by cell key,
+a query visits the cells ring by ring around the query cell until the k
+nearest points found are closer than the next ring.
+Everything is vectorized over the queries (processed by chunks to bound the
+memory), there's no python loop per point. It's used to build the vertex
+correspondences between meshes (proxy, transfer, symmetry).
+numpy is required.
+'''
+
+from silhouettepolisher.points import numpy
+
+
+# average number of points per occupied cell.
+POINTS_PER_CELL = 2.0
+QUERY_CHUNK_SIZE = 65536
+# above this cells count, the cells are found by a binary search instead of
+# a dense lookup table.
+MAX_DENSE_CELLS = 1 << 24
+# distance under which a query is considered on a point.
+EXACT_DISTANCE = 1e-9
+
+
+def get_ring_offsets(ring, dimensions=None):
+    '''
+    return the (n, 3) cells offsets at the chebyshev distance ring. If the
+    grid dimensions are given, the offsets larger than the grid on an axis
+    are skipped (they can't reach any cell, a flat or linear grid has only a
+    few offsets per ring).
+    '''
+    if ring == 0:
+        return numpy.zeros((1, 3), dtype=numpy.int64)
+    limits = [ring] * 3 if dimensions is None else [
+        min(ring, int(dimension) - 1) for dimension in dimensions]
+    axes = [numpy.arange(-limit, limit + 1) for limit in limits]
+    offsets = numpy.stack(
+        numpy.meshgrid(*axes, indexing='ij'), -1).reshape(-1, 3)
+    return offsets[numpy.abs(offsets).max(axis=1) == ring]
+
+
+def compute_inverse_distance_weights(distances):
+    '''
+    return the normalized inverse square distance weights of (n, k) sorted
+    distances. The queries on a point get all the weight.
+    '''
+    weights = 1.0 / numpy.maximum(distances, EXACT_DISTANCE) ** 2
+    weights /= weights.sum(axis=1)[:, None]
+    exact = distances[:, 0] <= EXACT_DISTANCE
+    weights[exact] = 0.0
+    weights[exact, 0] = 1.0
+    return weights
+
+
+class UniformGrid(object):
+    '''
+    :points numpy.array: the (n, 3) indexed points
+    :cell_size float: the cells size, by default the size is estimated to
+    have POINTS_PER_CELL points per cell on a surface.
+    '''
+    def __init__(self, points, cell_size=None):
+        self.points = numpy.asarray(points, dtype=numpy.float64)
+        self.minimum = self.points.min(axis=0)
+        self.maximum = self.points.max(axis=0)
+        self.cell_size = cell_size or self._estimate_cell_size()
+        coordinates = self._get_coordinates(self.points)
+        self.dimensions = coordinates.max(axis=0) + 1
+        keys = self._get_keys(coordinates)
+        self.order = numpy.argsort(keys, kind='stable')
+        self.keys, self.starts, self.counts = numpy.unique(
+            keys[self.order], return_index=True, return_counts=True)
+        self.table = None
+        if self.dimensions.prod() <= MAX_DENSE_CELLS:
+            self.table = numpy.full(
+                self.dimensions.prod(), -1, dtype=numpy.int32)
+            self.table[self.keys] = numpy.arange(len(self.keys))
+
+    def _estimate_cell_size(self):
+        extent = self.maximum - self.minimum
+        # the meshes are surfaces, the area of the bounding box is a better
+        # estimation of the occupied space than his volume.
+        area = 2.0 * (
+            extent[0] * extent[1] + extent[1] * extent[2] +
+            extent[2] * extent[0])
+        if area <= 0:
+            return float(extent.max()) / len(self.points) or 1.0
+        return float(numpy.sqrt(area * POINTS_PER_CELL / len(self.points)))
+
+    def _get_coordinates(self, points):
+        return numpy.floor(
+            (points - self.minimum) / self.cell_size).astype(numpy.int64)
+
+    def _get_keys(self, coordinates):
+        x, y, z = coordinates.T
+        return (x * self.dimensions[1] + y) * self.dimensions[2] + z
+
+    def query(self, points, k=1, max_distance=None):
+        '''
+        return the k nearest indexed points of each point as a tuple of
+        (n, k) arrays (distances, indices) sorted by distance.
+        :max_distance float: the search stops at this distance, the missing
+        neighbours have an infinite distance and the index -1 (the nearest
+        points found further than max_distance can be returned too).
+        '''
+        points = numpy.asarray(points, dtype=numpy.float64).reshape(-1, 3)
+        k = min(k, len(self.points))
+        distances = numpy.empty((len(points), k), dtype=numpy.float64)
+        indices = numpy.empty((len(points), k), dtype=numpy.int64)
+        for start in range(0, len(points), QUERY_CHUNK_SIZE):
+            end = start + QUERY_CHUNK_SIZE
+            distances[start:end], indices[start:end] = self._query_chunk(
+                points[start:end], k, max_distance)
+        return numpy.sqrt(distances), indices
+
+    def _query_chunk(self, points, k, max_distance=None):
+        '''
+        return the squared distances and indices of the k nearest points.
+        '''
+        count = len(points)
+        best_distances = numpy.full((count, k), numpy.inf)
+        best_indices = numpy.full((count, k), -1, dtype=numpy.int64)
+        # the queries outside of the grid start from the nearest cell, their
+        # distance to the grid is removed from the ring radius.
+        clamped = numpy.clip(points, self.minimum, self.maximum)
+        outside = numpy.sqrt(((points - clamped) ** 2).sum(axis=1))
+        coordinates = numpy.minimum(
+            self._get_coordinates(clamped), self.dimensions - 1)
+        pending = numpy.arange(count)
+        if max_distance is not None:
+            pending = pending[outside <= max_distance]
+        ring = 0
+        while len(pending):
+            rows, candidates = self._get_ring_candidates(
+                coordinates[pending], ring)
+            rows = pending[rows]
+            vectors = self.points[candidates] - points[rows]
+            squared = numpy.einsum('ij,ij->i', vectors, vectors)
+            self._merge(
+                best_distances, best_indices, rows, candidates, squared, k)
+            # the next rings are at least at ring * cell_size.
+            radius = numpy.maximum(
+                ring * self.cell_size - outside[pending], 0.0)
+            done = best_distances[pending, -1] <= radius ** 2
+            if max_distance is not None:
+                # nothing closer than max_distance in the next rings.
+                done |= radius > max_distance
+            ring += 1
+            if ring > self.dimensions.max():
+                break
+            pending = pending[~done]
+        return best_distances, best_indices
+
+    def _get_ring_candidates(self, coordinates, ring):
+        '''
+        return the (query row, point index) pairs of the points in the cells
+        of the ring around the queries cells.
+        '''
+        all_rows, all_candidates = [], []
+        for offset in get_ring_offsets(ring, self.dimensions):
+            cells = coordinates + offset
+            valid = numpy.all(
+                (cells >= 0) & (cells < self.dimensions), axis=1)
+            rows = numpy.flatnonzero(valid)
+            rows, positions = self._find_cells(rows, cells[rows])
+            counts = self.counts[positions]
+            if not counts.sum():
+                continue
+            # expand each (row, cell) to the points of the cell.
+            repeated_rows = numpy.repeat(rows, counts)
+            first = numpy.repeat(self.starts[positions], counts)
+            steps = numpy.arange(counts.sum()) - numpy.repeat(
+                numpy.cumsum(counts) - counts, counts)
+            all_rows.append(repeated_rows)
+            all_candidates.append(self.order[first + steps])
+        if not all_rows:
+            empty = numpy.zeros(0, dtype=numpy.int64)
+            return empty, empty
+        return numpy.concatenate(all_rows), numpy.concatenate(all_candidates)
+
+    def _find_cells(self, rows, cells):
+        '''
+        return the rows and the cells positions of the non empty cells.
+        '''
+        keys = self._get_keys(cells)
+        if self.table is not None:
+            positions = self.table[keys]
+            found = positions >= 0
+        else:
+            positions = numpy.searchsorted(self.keys, keys)
+            positions = numpy.minimum(positions, len(self.keys) - 1)
+            found = self.keys[positions] == keys
+        return rows[found], positions[found]
+
+    @staticmethod
+    def _merge(best_distances, best_indices, rows, candidates, squared, k):
+        '''
+        merge the candidates in the k best of their rows, in place. The
+        candidates are scattered in a padded (rows, k + candidates) matrix
+        after the current best, the k smallest of each row are partitioned.
+        '''
+        if not len(rows):
+            return
+        order = numpy.argsort(rows, kind='stable')
+        rows, candidates, squared = (
+            rows[order], candidates[order], squared[order])
+        counts = numpy.bincount(rows, minlength=len(best_distances))
+        touched = numpy.flatnonzero(counts)
+        counts = counts[touched]
+        slots = numpy.repeat(numpy.arange(len(touched)), counts)
+        columns = k + numpy.arange(len(rows)) - numpy.repeat(
+            numpy.cumsum(counts) - counts, counts)
+
+        width = k + counts.max()
+        distances = numpy.full((len(touched), width), numpy.inf)
+        indices = numpy.full((len(touched), width), -1, dtype=numpy.int64)
+        distances[:, :k] = best_distances[touched]
+        indices[:, :k] = best_indices[touched]
+        distances[slots, columns] = squared
+        indices[slots, columns] = candidates
+
+        kept = numpy.argpartition(distances, k - 1, axis=1)[:, :k]
+        distances = numpy.take_along_axis(distances, kept, axis=1)
+        indices = numpy.take_along_axis(indices, kept, axis=1)
+        order = numpy.argsort(distances, axis=1)
+        best_distances[touched] = numpy.take_along_axis(
+            distances, order, axis=1)
+        best_indices[touched] = numpy.take_along_axis(indices, order, axis=1)
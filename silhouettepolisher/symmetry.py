@@ -0,0 +1,156 @@
+'''
+This module contain the mirroring of the corrective targets. The symmetry
+map gives for each vertex the vertex on the other side of the mirror plane
+(the plane of the axis passing by the object origin). It's found on the rest
+points with the uniform grid index: each vertex is reflected and matched with
+the nearest vertex, a small asymmetry of the mesh is tolerated up to the
+tolerance. The vertices without any match don't receive any delta.
+The map is saved in the cache directory, keyed by the topology hash, the
+axis and the tolerance. Once the map exists, mirroring a target is one
+permutation of the deltas and one sign flip.
+    from silhouettepolisher import symmetry
+    symmetry.mirror_corrective_target('corrective_blendshape', 0, axis='x')
+numpy is required.
+'''
+
+import os
+import re
+
+from maya import cmds
+
+from silhouettepolisher.cache import get_topology_cache_filepath
+from silhouettepolisher.constants import (
+    SPARSE_TARGET_EPSILON, SYMMETRY_TOLERANCE)
+from silhouettepolisher.core import (
+    add_target_on_corrective_blendshape, get_next_target_index,
+    get_target_points, get_weight_aliases, has_target_geometry)
+from silhouettepolisher.points import numpy
+from silhouettepolisher.profiling import profiled, profile_stage
+from silhouettepolisher.proxy import get_rest_points
+from silhouettepolisher.sceneindex import get_scene_index
+from silhouettepolisher.spatial import UniformGrid
+from silhouettepolisher.topology import get_topology_hash
+
+
+AXES = 'xyz'
+# (left, right) names swapped in the mirrored target names.
+SIDE_TOKENS = (
+    ('left', 'right'), ('Left', 'Right'), ('LEFT', 'RIGHT'), ('lf', 'rt'),
+    ('L', 'R'), ('l', 'r'))
+
+# {filepath: numpy.array}
+_maps = {}
+
+
+def build_symmetry_map(points, axis='x', tolerance=SYMMETRY_TOLERANCE):
+    '''
+    return the (vertices,) array of the symmetric vertex of each vertex, -1
+    if there's no vertex closer than the tolerance from its reflection.
+    '''
+    reflected = numpy.array(points, dtype=numpy.float64)
+    reflected[:, AXES.index(axis)] *= -1
+    # the reflections without symmetric vertex stop searching at the
+    # tolerance instead of visiting the whole grid.
+    distances, indices = UniformGrid(points).query(
+        reflected, 1, max_distance=tolerance)
+    symmetry_map = indices[:, 0]
+    symmetry_map[distances[:, 0] > tolerance] = -1
+    return symmetry_map
+
+
+def get_symmetry_map(mesh, axis='x', tolerance=SYMMETRY_TOLERANCE):
+    '''
+    return the symmetry map of the mesh, it's loaded from the cache or built
+    from the rest points and saved.
+    '''
+    filepath = get_topology_cache_filepath(
+        'symmetry', get_topology_hash(mesh), axis, tolerance)
+    symmetry_map = _maps.get(filepath)
+    if symmetry_map is None and os.path.exists(filepath):
+        with numpy.load(filepath) as content:
+            symmetry_map = content['symmetry_map']
+    if symmetry_map is None:
+        with profile_stage('symmetry map', mesh):
+            symmetry_map = build_symmetry_map(
+                get_rest_points(mesh), axis, tolerance)
+        numpy.savez(filepath, symmetry_map=symmetry_map)
+    _maps[filepath] = symmetry_map
+    return symmetry_map
+
+
+def mirror_deltas(deltas, symmetry_map, axis='x'):
+    '''
+    return the mirrored (vertices, 3) deltas: each vertex takes the delta of
+    his symmetric vertex with the axis component flipped.
+    '''
+    mirrored = numpy.zeros_like(deltas)
+    matched = symmetry_map >= 0
+    mirrored[matched] = deltas[symmetry_map[matched]]
+    mirrored[:, AXES.index(axis)] *= -1
+    return mirrored
+
+
+def get_mirrored_name(name):
+    '''
+    return the name with the side tokens swapped (left <-> right, L <-> R...)
+    or suffixed by "_mirrored" if it doesn't contain any side.
+    '''
+    swaps = {}
+    for left, right in SIDE_TOKENS:
+        swaps[left], swaps[right] = right, left
+    # the words are swapped at the start of a camel case word or between
+    # underscores, the single letters only between underscores or digits.
+    words = [token for token in swaps if len(token) > 1]
+    letters = [token for token in swaps if len(token) == 1]
+    pattern = r'(?<![A-Za-z])(?:({})(?![a-z])|({})(?![A-Za-z]))'.format(
+        '|'.join(words), '|'.join(letters))
+    mirrored = re.sub(pattern, lambda match: swaps[match.group(0)], name)
+    return mirrored if mirrored != name else name + '_mirrored'
+
+
+@profiled('mirror_corrective_target')
+def mirror_corrective_target(
+        blendshape, target_index, axis='x', tolerance=SYMMETRY_TOLERANCE,
+        name=None, values=None, epsilon=SPARSE_TARGET_EPSILON):
+    '''
+    mirror a target of a corrective blendshape and add the result as a new
+    sparse target on the same blendshape.
+    :blendshape string: the corrective (see get_targets_list_from_mesh)
+    :target_index int: the target to mirror
+    :axis string: x, y or z, the normal of the mirror plane
+    :name string: the new target name, the mirrored name by default
+    :values list: the animation template of the new target
+    return the weight plug of the new target, None if the target is still
+    connected to a geometry.
+    '''
+    if numpy is None:
+        raise RuntimeError('numpy is required by the mirroring')
+    blendshape = str(blendshape)
+    mesh = get_scene_index().get_original_mesh(blendshape)
+    if mesh is None:
+        raise ValueError(
+            '{} is not a corrective blendshape'.format(blendshape))
+    if has_target_geometry(blendshape, target_index):
+        cmds.warning(
+            '{}.weight[{}] is connected to a geometry, apply it before '
+            'mirroring'.format(blendshape, target_index))
+        return None
+
+    symmetry_map = get_symmetry_map(mesh, axis, tolerance)
+    indices, deltas = get_target_points(blendshape, target_index)
+    with profile_stage('mirror', mesh):
+        dense = numpy.zeros((len(symmetry_map), 3))
+        dense[indices] = deltas
+        dense = mirror_deltas(dense, symmetry_map, axis)
+        indices = numpy.flatnonzero(
+            numpy.einsum('ij,ij->i', dense, dense) > epsilon * epsilon)
+
+    if name is None:
+        alias = get_weight_aliases(blendshape).get(
+            'weight[{}]'.format(target_index), 'target')
+        name = get_mirrored_name(alias)
+    index = get_next_target_index(blendshape)
+    add_target_on_corrective_blendshape(
+        blendshape=blendshape, target=name, base=mesh, values=values,
+        sparse=True, precomputed=(indices, dense[indices]))
+    return '{}.weight[{}]'.format(blendshape, index)
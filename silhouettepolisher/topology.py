@@ -0,0 +1,38 @@
+'''
+This module contain the mesh topology helpers. The topology hash identify a
+vertex order and a face connectivity, not a shape: two meshes with the same
+hash can share the per vertex data (deltas, mappings) whatever their points.
+It's used to check the libraries and to key the caches saved on the disk.
+'''
+
+import hashlib
+from array import array
+
+import maya.api.OpenMaya as om2
+
+
+def get_fn_mesh(mesh):
+    '''
+    return an OpenMaya 2 MFnMesh of the mesh
+    :mesh string: a mesh shape or its transform
+    '''
+    selection_list = om2.MSelectionList()
+    selection_list.add(str(mesh))
+    dagpath = selection_list.getDagPath(0)
+    if dagpath.hasFn(om2.MFn.kTransform):
+        dagpath.extendToShape()
+    return om2.MFnMesh(dagpath)
+
+
+def get_topology_hash(mesh):
+    '''
+    return a sha1 hexdigest of the vertex count, the vertex count per face
+    and the face vertices of the mesh.
+    '''
+    fn_mesh = get_fn_mesh(mesh)
+    counts, connects = fn_mesh.getVertices()
+    digest = hashlib.sha1()
+    digest.update(str(fn_mesh.numVertices).encode('ascii'))
+    digest.update(array('i', counts).tobytes())
+    digest.update(array('i', connects).tobytes())
+    return digest.hexdigest()
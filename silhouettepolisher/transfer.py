@@ -0,0 +1,154 @@
+'''
+This module contain the transfer of the corrective targets between meshes
+with different topologies (LODs, cloth proxies...). Each destination vertex
+is matched with his nearest source vertices on the rest shapes (the meshes
+must overlap at rest) and receives their deltas weighted by inverse
+distance, neighbours=1 gives a nearest point transfer.
+The correspondence is a sparse matrix (destination vertices, source
+vertices) saved in the cache directory and keyed by both topology hashes, a
+repeated transfer costs one sparse product.
+    from silhouettepolisher import transfer
+    transfer.transfer_corrective_targets('body_hero', 'body_lod1')
+numpy is required.
+'''
+
+import os
+
+from maya import cmds
+
+from silhouettepolisher.animation import set_linear_keys, get_keys
+from silhouettepolisher.cache import get_topology_cache_filepath
+from silhouettepolisher.constants import (
+    SPARSE_TARGET_EPSILON, TRANSFER_NEIGHBOURS)
+from silhouettepolisher.core import (
+    get_corrective_blendshapes, get_target_points, has_target_geometry,
+    get_weight_aliases, add_sparse_corrective_target)
+from silhouettepolisher.points import numpy
+from silhouettepolisher.profiling import profiled, profile_stage
+from silhouettepolisher.proxy import get_rest_points
+from silhouettepolisher.sceneindex import get_scene_index
+from silhouettepolisher.spatial import (
+    UniformGrid, compute_inverse_distance_weights)
+from silhouettepolisher.sparse import CSRMatrix, load_csr_matrix
+from silhouettepolisher.topology import get_topology_hash
+
+
+# {filepath: CSRMatrix}
+_matrices = {}
+
+
+def build_transfer_matrix(
+        source_points, destination_points, neighbours=TRANSFER_NEIGHBOURS,
+        max_distance=None):
+    '''
+    return the (destination vertices, source vertices) interpolation matrix.
+    The destination vertices farther than max_distance from the source don't
+    receive any delta.
+    '''
+    distances, indices = UniformGrid(source_points).query(
+        destination_points, neighbours)
+    weights = compute_inverse_distance_weights(distances)
+    if max_distance is not None:
+        weights[distances[:, 0] > max_distance] = 0.0
+    return CSRMatrix.from_neighbours(indices, weights, len(source_points))
+
+
+def get_transfer_matrix(
+        source, destination, neighbours=TRANSFER_NEIGHBOURS,
+        max_distance=None):
+    '''
+    return the transfer matrix from the source mesh to the destination mesh,
+    it's loaded from the cache or built from the rest points and saved.
+    '''
+    filepath = get_topology_cache_filepath(
+        'transfer', get_topology_hash(source), get_topology_hash(destination),
+        neighbours, max_distance)
+    matrix = _matrices.get(filepath)
+    if matrix is None and os.path.exists(filepath):
+        matrix, _ = load_csr_matrix(filepath)
+    if matrix is None:
+        with profile_stage('correspondence'):
+            matrix = build_transfer_matrix(
+                get_rest_points(source), get_rest_points(destination),
+                neighbours, max_distance)
+        matrix.save(filepath)
+    _matrices[filepath] = matrix
+    return matrix
+
+
+def transfer_corrective_target(
+        blendshape, target_index, mesh, destination_blendshape=None,
+        neighbours=TRANSFER_NEIGHBOURS, max_distance=None,
+        epsilon=SPARSE_TARGET_EPSILON):
+    '''
+    transfer a target of a corrective blendshape on the corrective of
+    another mesh as a sparse target. The weight value and keys are copied.
+    :blendshape string: the source corrective
+    :target_index int: the source target
+    :mesh string: the destination mesh
+    :destination_blendshape string: the destination corrective, the first
+    one of the mesh by default (created if needed)
+    return the weight plug of the new target.
+    '''
+    blendshape = str(blendshape)
+    source = get_scene_index().get_original_mesh(blendshape)
+    if source is None:
+        raise ValueError(
+            '{} is not a corrective blendshape'.format(blendshape))
+    matrix = get_transfer_matrix(source, mesh, neighbours, max_distance)
+    indices, deltas = get_target_points(blendshape, target_index)
+    with profile_stage('transfer'):
+        source_deltas = numpy.zeros((matrix.shape[1], 3))
+        source_deltas[indices] = deltas
+        deltas = matrix.dot(source_deltas)
+        indices = numpy.flatnonzero(
+            numpy.einsum('ij,ij->i', deltas, deltas) > epsilon * epsilon)
+
+    source_plug = '{}.weight[{}]'.format(blendshape, target_index)
+    name = get_weight_aliases(blendshape).get(
+        'weight[{}]'.format(target_index),
+        '{}_{}'.format(blendshape, target_index))
+    weight_plug = add_sparse_corrective_target(
+        mesh, name, indices, deltas[indices], destination_blendshape)
+    keys = get_keys(source_plug)
+    if keys:
+        set_linear_keys(weight_plug, dict(keys))
+    else:
+        cmds.setAttr(weight_plug, cmds.getAttr(source_plug))
+    return weight_plug
+
+
+@profiled('transfer_corrective_targets')
+def transfer_corrective_targets(
+        source, mesh, neighbours=TRANSFER_NEIGHBOURS, max_distance=None,
+        epsilon=SPARSE_TARGET_EPSILON):
+    '''
+    transfer all the targets of the corrective blendshapes of the source
+    mesh on the first corrective of the destination mesh. The targets still
+    connected to a geometry are skipped.
+    return the weight plugs of the new targets.
+    '''
+    if numpy is None:
+        raise RuntimeError('numpy is required by the transfer')
+    weight_plugs = []
+    destination_blendshape = None
+    cmds.undoInfo(openChunk=True, chunkName='transfer_corrective_targets')
+    try:
+        for blendshape in get_corrective_blendshapes(source):
+            indices = cmds.getAttr(
+                blendshape + '.inputTarget[0].inputTargetGroup',
+                multiIndices=True) or []
+            for index in indices:
+                if has_target_geometry(blendshape, index):
+                    cmds.warning(
+                        '{}.weight[{}] is connected to a geometry, '
+                        'skipped'.format(blendshape, index))
+                    continue
+                weight_plug = transfer_corrective_target(
+                    blendshape, index, mesh, destination_blendshape,
+                    neighbours, max_distance, epsilon)
+                destination_blendshape = weight_plug.split('.')[0]
+                weight_plugs.append(weight_plug)
+    finally:
+        cmds.undoInfo(closeChunk=True)
+    return weight_plugs
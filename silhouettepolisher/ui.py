@@ -9,12 +9,18 @@ except ImportError:
     from PySide6.QtGui import QAction
 import maya.cmds as cmds
 
-from silhouettepolisher.blendshape import (
-    create_working_copy_on_selection, delete_selected_working_copys,
+from silhouettepolisher.core import (
+    create_working_copy_on_selection, create_proxy_working_copy_on_selection,
+    delete_selected_working_copys,
     set_working_copys_transparency, apply_selected_working_copys,
     create_blendshape_corrective_for_selected_working_copys,
     get_working_copys_transparency, get_targets_list_from_selection,
     setup_edit_target_working_copy)
+from silhouettepolisher.smoothing import smooth_selected_working_copys
+from silhouettepolisher.symmetry import mirror_corrective_target
+from silhouettepolisher.profiling import (
+    enable_profiling, is_profiling_enabled, summarize_profiling_records,
+    clear_profiling_records, dump_profiling_report)
 
 
 WINDOWTITLE = "Silhouette Polisher"
@@ -44,21 +50,57 @@ class SilhouettePolisherWindow(QtWidgets.QWidget):
         self._create_working_copy_button.released.connect(
             self._call_create_working_copy)
 
+        self._create_proxy_working_copy_button = QtWidgets.QPushButton()
+        self._create_proxy_working_copy_button.setText('Proxy Sculpt')
+        self._create_proxy_working_copy_button.setToolTip(
+            'Sculpt a reduced copy, the deltas are interpolated to the full '
+            'resolution mesh on apply.')
+        self._create_proxy_working_copy_button.released.connect(
+            self._call_create_proxy_working_copy)
+
         self._edit_target_button = QtWidgets.QPushButton()
         self._edit_target_button.setText('Edit Target')
         self._edit_target_button.clicked.connect(self._call_edit_target)
 
+        self._mirror_target_button = QtWidgets.QPushButton()
+        self._mirror_target_button.setText('Mirror Target')
+        self._mirror_target_button.setToolTip(
+            'Add the target mirrored on the X axis as a new target.')
+        self._mirror_target_button.clicked.connect(self._call_mirror_target)
+
         self._create_edit_layout = QtWidgets.QHBoxLayout()
         self._create_edit_layout.setContentsMargins(0, 0, 0, 0)
         self._create_edit_layout.setSpacing(4)
         self._create_edit_layout.addWidget(self._create_working_copy_button)
+        self._create_edit_layout.addWidget(
+            self._create_proxy_working_copy_button)
         self._create_edit_layout.addWidget(self._edit_target_button)
+        self._create_edit_layout.addWidget(self._mirror_target_button)
 
         self._delete_working_copy_on_mesh_button = QtWidgets.QPushButton()
         self._delete_working_copy_on_mesh_button.setText('Cancel Sculpt')
         self._delete_working_copy_on_mesh_button.released.connect(
             self._call_delete_working_copy)
 
+        self._smooth_button = QtWidgets.QPushButton()
+        self._smooth_button.setText('Smooth Deltas')
+        self._smooth_button.setToolTip(
+            'Smooth the sculpted deltas, the pose under them is untouched.')
+        self._smooth_button.released.connect(
+            partial(smooth_selected_working_copys, relax=False))
+        self._relax_button = QtWidgets.QPushButton()
+        self._relax_button.setText('Relax Deltas')
+        self._relax_button.setToolTip(
+            'Smooth the sculpted deltas without reducing their amplitude.')
+        self._relax_button.released.connect(
+            partial(smooth_selected_working_copys, relax=True))
+
+        self._smooth_layout = QtWidgets.QHBoxLayout()
+        self._smooth_layout.setContentsMargins(0, 0, 0, 0)
+        self._smooth_layout.setSpacing(4)
+        self._smooth_layout.addWidget(self._smooth_button)
+        self._smooth_layout.addWidget(self._relax_button)
+
         self._slider_after_label = QtWidgets.QLabel('after')
         self._display_slider = QtWidgets.QSlider(QtCore.Qt.Horizontal)
         self._display_slider.setRange(0, 100)
@@ -87,6 +129,11 @@ class SilhouettePolisherWindow(QtWidgets.QWidget):
         self._apply_on_new_blendshape_button.released.connect(
             self._call_apply_on_new_blendshape)
 
+        self._profiling_report_button = QtWidgets.QPushButton()
+        self._profiling_report_button.setText('Timings report')
+        self._profiling_report_button.released.connect(
+            self._call_profiling_report)
+
         self._animation_template_buttons = self._create_animation_template_buttons()
         self._animation_template_layout = self._create_animation_template_layout()
 
@@ -94,12 +141,14 @@ class SilhouettePolisherWindow(QtWidgets.QWidget):
         self._layout.setSpacing(4)
         self._layout.addLayout(self._create_edit_layout)
         self._layout.addWidget(self._delete_working_copy_on_mesh_button)
+        self._layout.addLayout(self._smooth_layout)
         self._layout.addLayout(self._slider_layout)
         self._layout.addWidget(self._animation_template_editor)
         self._layout.addLayout(self._animation_template_layout)
         self._layout.addSpacing(4)
         self._layout.addWidget(self._apply_button)
         self._layout.addWidget(self._apply_on_new_blendshape_button)
+        self._layout.addWidget(self._profiling_report_button)
 
     def _create_animation_template_buttons(self):
         buttons = []
@@ -130,6 +179,10 @@ class SilhouettePolisherWindow(QtWidgets.QWidget):
         create_working_copy_on_selection()
         set_working_copys_transparency(self._display_slider.value() / 100.0)
 
+    def _call_create_proxy_working_copy(self):
+        create_proxy_working_copy_on_selection()
+        set_working_copys_transparency(self._display_slider.value() / 100.0)
+
     def _call_delete_working_copy(self):
         delete_selected_working_copys()
 
@@ -150,13 +203,34 @@ class SilhouettePolisherWindow(QtWidgets.QWidget):
         menu.exec_(QtGui.QCursor().pos())
         set_working_copys_transparency(self._display_slider.value() / 100.0)
 
+    def _call_mirror_target(self):
+        mesh, targets_per_blendshapes = get_targets_list_from_selection()
+        values = self._animation_template_editor.values()
+
+        def mirror(blendshape, target_index):
+            mirror_corrective_target(blendshape, target_index, values=values)
+
+        menu = EditTargetMenu(mesh, targets_per_blendshapes, self, mirror)
+        menu.exec_(QtGui.QCursor().pos())
+
     def _call_set_template_values(self, value):
         self._animation_template_editor.set_values(KEY_TEMPLATES[value])
 
+    def _call_profiling_report(self):
+        dialog = ProfilingReportDialog(self)
+        dialog.exec_()
+
 
 class EditTargetMenu(QtWidgets.QMenu):
-    def __init__(self, mesh, targets_per_blendshapes, parent=None):
+    '''
+    this menu list the targets of the correctives, the function is called
+    with the blendshape and the target index of the triggered target. By
+    default it sets up an edit working copy.
+    '''
+    def __init__(
+            self, mesh, targets_per_blendshapes, parent=None, function=None):
         super(EditTargetMenu, self).__init__(parent)
+        function = function or partial(setup_edit_target_working_copy, mesh)
         if targets_per_blendshapes is None:
             action = QAction('No blendshape available', parent)
             action.setEnabled(False)
@@ -164,17 +238,87 @@ class EditTargetMenu(QtWidgets.QMenu):
             return
 
         for blendshape, targets in targets_per_blendshapes:
-            menu = QtWidgets.QMenu(blendshape.name(), self)
-            for index, target in enumerate(targets):
+            menu = QtWidgets.QMenu(blendshape, self)
+            # the targets indices aren't contiguous if a target was removed.
+            indices = cmds.getAttr(
+                blendshape + '.weight', multiIndices=True) or []
+            for index, target in zip(indices, targets):
                 action = QAction(target, parent)
                 action.triggered.connect(
-                    partial(
-                        setup_edit_target_working_copy,
-                        mesh, blendshape, index))
+                    partial(function, blendshape, index))
                 menu.addAction(action)
             self.addMenu(menu)
 
 
+class ProfilingReportDialog(QtWidgets.QDialog):
+    """
+    this dialog display the timings recorded per operation and stage.
+    The recording is enabled from here (see profiling.py).
+    """
+    HEADERS = (
+        'operation', 'stage', 'count', 'total', 'mean', 'max', 'vertices',
+        'nodes_created', 'nodes_deleted')
+
+    def __init__(self, parent=None):
+        super(ProfilingReportDialog, self).__init__(parent)
+        self.setWindowTitle(WINDOWTITLE + ' - Timings')
+
+        self._enable_checkbox = QtWidgets.QCheckBox('Record timings')
+        self._enable_checkbox.setChecked(is_profiling_enabled())
+        self._enable_checkbox.toggled.connect(self._call_enable)
+
+        self._tree = QtWidgets.QTreeWidget()
+        self._tree.setHeaderLabels(
+            [header.replace('_', ' ') for header in self.HEADERS])
+        self._tree.setRootIsDecorated(False)
+
+        self._refresh_button = QtWidgets.QPushButton('Refresh')
+        self._refresh_button.released.connect(self.refresh)
+        self._clear_button = QtWidgets.QPushButton('Clear')
+        self._clear_button.released.connect(self._call_clear)
+        self._save_button = QtWidgets.QPushButton('Save json')
+        self._save_button.released.connect(self._call_save)
+
+        self._buttons_layout = QtWidgets.QHBoxLayout()
+        self._buttons_layout.setContentsMargins(0, 0, 0, 0)
+        self._buttons_layout.addWidget(self._refresh_button)
+        self._buttons_layout.addWidget(self._clear_button)
+        self._buttons_layout.addWidget(self._save_button)
+
+        self._layout = QtWidgets.QVBoxLayout(self)
+        self._layout.addWidget(self._enable_checkbox)
+        self._layout.addWidget(self._tree)
+        self._layout.addLayout(self._buttons_layout)
+        self.resize(700, 300)
+        self.refresh()
+
+    def refresh(self):
+        self._tree.clear()
+        for entry in summarize_profiling_records():
+            values = []
+            for header in self.HEADERS:
+                value = entry[header]
+                if isinstance(value, float):
+                    value = '{:.4f}'.format(value)
+                values.append('' if value is None else str(value))
+            self._tree.addTopLevelItem(QtWidgets.QTreeWidgetItem(values))
+        for column in range(len(self.HEADERS)):
+            self._tree.resizeColumnToContents(column)
+
+    def _call_enable(self, state):
+        enable_profiling(state)
+
+    def _call_clear(self):
+        clear_profiling_records()
+        self.refresh()
+
+    def _call_save(self):
+        filepath, _ = QtWidgets.QFileDialog.getSaveFileName(
+            self, 'Save timings report', '', 'Json (*.json)')
+        if filepath:
+            dump_profiling_report(filepath)
+
+
 class AnimationTemplateEditor(QtWidgets.QWidget):
     """
     this is a simple interactive widget to draw an simple animation curve